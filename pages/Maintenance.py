@@ -1,9 +1,139 @@
+import datetime as _dt
+
 import streamlit as st
-from src.config import APP_TITLE
+
+from src import db_maintenance, gc_orphans
+from src.app_state import drive_folder_id, init_app_state, push_db
+from src.config import APP_TITLE, GC_BATCH, GC_GRACE_HOURS, MAINT_FREELIST_MAX_MB, MAINT_OPTIMIZE_HOURS, MAINT_WAL_MAX_MB
+from src.query_plans import explain_hot_queries, plan_problems
 
 st.set_page_config(page_title=f"{APP_TITLE} • Maintenance", page_icon="🧰", layout="centered")
 st.link_button("⬅️ Tilbage til forside", "/")
 
+state = init_app_state()
+drive = state["drive"]
+
 st.title("🧰 Maintenance")
-st.caption("Placeholder-side. Her kan du lave vedligeholdelseslog, service-intervaller, osv.")
-st.info("Kommer snart 🙂")
+st.caption("Databasen, forespørgselsplaner og oprydning af filer.")
+
+# -----------------------------
+# System: database
+# -----------------------------
+st.divider()
+st.subheader("🛠 System")
+
+with st.expander("🔎 Forespørgselsplaner (indeks-tjek)", expanded=False):
+    st.caption("Alle faste forespørgsler skal bruge et indeks: ingen fuld tabel-scanning og ingen temp B-tree.")
+    if st.button("Tjek forespørgselsplaner", key="qp_check"):
+        plans = explain_hot_queries()
+        bad = {name: plan_problems(plan) for name, plan in plans.items()}
+        n_bad = sum(1 for lines in bad.values() if lines)
+        if n_bad:
+            st.error(f"{n_bad} forespørgsel(er) bruger ikke et indeks.")
+        else:
+            st.success(f"Alle {len(plans)} forespørgsler bruger indeks ✅")
+        for name, plan in plans.items():
+            icon = "⚠️" if bad[name] else "✅"
+            st.markdown(f"{icon} **{name}**")
+            st.code("\n".join(plan), language="text")
+
+
+def _fmt_bytes(n: int) -> str:
+    n = float(n)
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+with st.expander("🧹 DB-vedligeholdelse (WAL, frie sider, optimize)", expanded=False):
+    st.caption(
+        f"Kører i baggrunden: checkpoint når WAL > {MAINT_WAL_MAX_MB:g} MB, "
+        f"incremental vacuum når frie sider > {MAINT_FREELIST_MAX_MB:g} MB, "
+        f"PRAGMA optimize hver {MAINT_OPTIMIZE_HOURS:g}. time."
+    )
+    if st.button("Kør vedligeholdelse nu", key="maint_run_now"):
+        res = db_maintenance.run_once(force=True)
+        if res["last_error"]:
+            st.warning(f"Ikke helt færdig: {res['last_error']}")
+        else:
+            st.success("Vedligeholdelse kørt ✅")
+
+    info = db_maintenance.db_info()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("DB-fil", _fmt_bytes(info["db_bytes"]))
+    c2.metric("WAL-fil", _fmt_bytes(info["wal_bytes"]))
+    c3.metric("Frie sider", _fmt_bytes(info["freelist_bytes"]))
+
+    m = db_maintenance.stats()
+    last_run = _dt.datetime.fromtimestamp(m["last_run"]).strftime("%H:%M:%S") if m["last_run"] else "aldrig"
+    st.markdown(
+        f"Baggrundsjob: {'kører' if m['running'] else 'slået fra'} • sidste runde: {last_run}\n\n"
+        f"Checkpoints: {m['checkpoints']} • vacuum: {m['vacuums']} fuld / {m['incremental_vacuums']} incremental "
+        f"({m['pages_freed']} sider frigivet) • optimize: {m['optimizes']}"
+    )
+    if m["last_error"]:
+        st.caption(f"Sidste fejl: {m['last_error']}")
+
+
+_GC_KIND_LABELS = {
+    gc_orphans.KIND_PHOTO: "Lokalt foto",
+    gc_orphans.KIND_CACHE: "Cache-foto",
+    gc_orphans.KIND_TMP: "tmp-fil",
+    gc_orphans.KIND_DRIVE: "Drive-foto",
+    gc_orphans.KIND_RECIPE_ITEM: "Opskriftsvare uden opskrift",
+    gc_orphans.KIND_MEAL: "Menudag uden opskrift",
+}
+
+with st.expander("🗑️ Oprydning (forældreløse fotos og rækker)", expanded=False):
+    st.caption(
+        f"Fotos uden memory (lokalt, cache og Drive), tmp-filer og opskriftsvarer/menudage uden opskrift. "
+        f"Filer yngre end {GC_GRACE_HOURS:g} timer røres ikke; højst {GC_BATCH} sletninger pr. kørsel."
+    )
+    ss = st.session_state
+    if st.button("Find (tør kørsel)", key="gc_dry_run"):
+        ss["gc_report"] = ss["gc_shown"] = gc_orphans.collect(drive, drive_folder_id(), dry_run=True)
+        ss["gc_confirm"] = False
+
+    rep = ss.get("gc_report")
+    if rep is not None:
+        if rep.removed:
+            st.success(f"Fjernet {rep.removed} • frigivet {_fmt_bytes(rep.freed_bytes)} • {rep.remaining} tilbage")
+            sync_error = ss.pop("gc_sync_error", None)
+            if sync_error:
+                st.warning(f"Ryddet lokalt, men kunne ikke sync DB til Drive: {sync_error}")
+        elif not rep.orphans:
+            st.success("Intet at rydde op ✅")
+        else:
+            total = sum(o.size for o in rep.orphans)
+            st.info(f"{len(rep.orphans)} fund ({_fmt_bytes(total)}).")
+        for reason in rep.skipped:
+            st.caption(f"Sprunget over – {reason}")
+        if not rep.removed:
+            for o in rep.orphans[:50]:
+                size = f" • {_fmt_bytes(o.size)}" if o.size else ""
+                st.markdown(f"- {_GC_KIND_LABELS.get(o.kind, o.kind)}: `{o.name}`{size}")
+            if len(rep.orphans) > 50:
+                st.caption(f"… og {len(rep.orphans) - 50} mere")
+
+    # Deleting needs a dry run shown in this session and confirmed; only its finds are deleted
+    shown = ss.get("gc_shown")
+    if shown is not None and shown.orphans:
+        confirm = st.checkbox(
+            f"Jeg har set listen og vil slette de {len(shown.orphans)} fund (højst {GC_BATCH} nu)", key="gc_confirm"
+        )
+        if st.button("Ryd op", key="gc_run", type="primary", disabled=not confirm):
+            rep = gc_orphans.collect(drive, drive_folder_id(), dry_run=False, confirmed=shown.orphans)
+            ss["gc_report"] = rep
+            ss.pop("gc_shown", None)  # the next clean-up needs a new dry run
+            if any(o.kind in (gc_orphans.KIND_RECIPE_ITEM, gc_orphans.KIND_MEAL) for o in rep.orphans) and rep.removed:
+                try:
+                    push_db(drive)
+                except Exception as e:
+                    ss["gc_sync_error"] = str(e)
+            st.rerun()
+
+    g = gc_orphans.stats()
+    if g["last_error"]:
+        st.caption(f"Sidste fejl: {g['last_error']}")
@@ -2,13 +2,11 @@
 import os
 import streamlit as st
 
-from src.app_state import init_app_state
-from src.config import APP_TITLE, DB_PATH, DB_DRIVE_NAME, PHOTOS_CACHE_DIR, ALLOWED_EXTS
-from src.storage import save_photo_locally, add_memory, fetch_recent, delete_memory
+from src.app_state import drive_folder_id, init_app_state, push_db
+from src.config import APP_TITLE, PHOTOS_CACHE_DIR, ALLOWED_EXTS
+from src.storage import save_photo_locally, add_memory, fetch_page, fetch_tag_counts, search_memories, delete_memory
 from src.drive_media import upload_uploadedfile_to_drive, download_drive_file_to_cache, delete_drive_file
 
-import drive_sync  # <-- vigtigt (robust)
-
 
 st.set_page_config(page_title=f"{APP_TITLE} • Memories", page_icon="🏠", layout="centered")
 st.link_button("⬅️ Tilbage til forside", "/")
@@ -25,6 +23,8 @@ st.title("🏠 Memories")
 st.caption("Remember once. Find later.")
 
 with st.expander("Drive sync status", expanded=False):
+    if state["tenant"].name:
+        st.caption(f"Husstand: {state['tenant'].name}")
     if drive is None:
         st.warning(f"Drive sync disabled (could not connect): {drive_error}")
     else:
@@ -34,6 +34,11 @@ with st.expander("Drive sync status", expanded=False):
 # -----------------------------
 # Add memory
 # -----------------------------
+def reset_pages():
+    # Added/deleted a memory: start from the first page again
+    st.session_state.pop("mem_loaded", None)
+
+
 st.divider()
 st.subheader("➕ Add a memory")
 
@@ -75,17 +80,18 @@ with st.form("add_memory_form", clear_on_submit=True):
             photo_drive_name = None
             if drive is not None:
                 try:
-                    photo_drive_id, photo_drive_name = upload_uploadedfile_to_drive(drive, drive_sync.FOLDER_ID, uploaded)
+                    photo_drive_id, photo_drive_name = upload_uploadedfile_to_drive(drive, drive_folder_id(), uploaded)
                 except Exception as e:
                     st.warning(f"Saved locally, but failed to upload photo to Drive: {e}")
 
             # 3) Gem DB-row
             add_memory(text=text, tags=tags, photo_path=photo_path, photo_drive_id=photo_drive_id, photo_drive_name=photo_drive_name)
+            reset_pages()
 
             # 4) Sync DB til Drive
             if drive is not None:
                 try:
-                    drive_sync.upload_or_update(drive, drive_sync.FOLDER_ID, DB_PATH, DB_DRIVE_NAME)
+                    push_db(drive)
                 except Exception as e:
                     st.warning(f"Saved locally, but failed to sync DB to Drive: {e}")
 
@@ -127,11 +133,74 @@ def cleanup_photos(photo_path, photo_drive_id, photo_drive_name):
 st.divider()
 st.subheader("🗂 Recent memories")
 
-rows = fetch_recent(limit=30)
+query = st.text_input("🔎 Søg", key="mem_search", placeholder="Søg i tekst og tags, fx lampe", label_visibility="collapsed").strip()
+
+PAGE_SIZE = 30
+
+tag_counts = dict(fetch_tag_counts())
+selected_tags = []
+match_all = True
+if tag_counts:
+    selected_tags = st.pills(
+        "Tags",
+        options=list(tag_counts),
+        selection_mode="multi",
+        format_func=lambda t: f"{t} ({tag_counts.get(t, 0)})",
+        key="mem_tags",
+        disabled=bool(query),
+        label_visibility="collapsed",
+    ) or []
+    if len(selected_tags) > 1:
+        match_all = st.segmented_control(
+            "Match",
+            options=["Alle tags", "Mindst ét"],
+            default="Alle tags",
+            key="mem_tags_mode",
+            label_visibility="collapsed",
+        ) != "Mindst ét"
+
+
+def load_pages():
+    # The loaded rows and the cursor after them live in the session, so a rerun reads nothing
+    # and "Indlæs flere" reads one page. Another household or filter starts from page one.
+    more = st.session_state.pop("mem_more", False)
+    key = (state["tenant"].id, tuple(selected_tags), match_all)
+    loaded = st.session_state.get("mem_loaded")
+    if loaded is None or loaded["key"] != key:
+        rows, cursor = fetch_page(None, PAGE_SIZE, tags=selected_tags, match_all=match_all)
+        loaded = st.session_state["mem_loaded"] = {"key": key, "rows": rows, "cursor": cursor}
+    elif more and loaded["cursor"] is not None:
+        rows, cursor = fetch_page(loaded["cursor"], PAGE_SIZE, tags=selected_tags, match_all=match_all)
+        loaded["rows"] = loaded["rows"] + rows
+        loaded["cursor"] = cursor
+    return loaded["rows"], loaded["cursor"]
+
+
+def request_more():
+    # Runs before the page script, i.e. before init_app_state() has activated the household:
+    # only ask for the page here, load_pages() reads it
+    st.session_state["mem_more"] = True
+
+
+# Search rows carry the text/tags with the matched words in **bold** as two extra columns
+more_cursor = None
+if query:
+    rows = search_memories(query, limit=PAGE_SIZE)
+else:
+    rows, more_cursor = load_pages()
 if not rows:
-    st.info("No memories yet. Add your first one above 👆")
+    if query:
+        st.info("Ingen memories matcher søgningen.")
+    elif selected_tags:
+        st.info("Ingen memories med de valgte tags.")
+    else:
+        st.info("No memories yet. Add your first one above 👆")
 else:
-    for _id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name in rows:
+    if query:
+        st.caption(f"{len(rows)} resultat(er), bedste match først")
+    for row in rows:
+        _id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name = row[:7]
+        text_md, tags_md = (row[7], row[8]) if query else (f"**{text}**", tags)
         with st.container(border=True):
 
             # Top line: timestamp + delete
@@ -155,10 +224,11 @@ else:
                         if st.button("Ja, slet", key=f"del_yes_{_id}"):
                             cleanup_photos(photo_path, photo_drive_id, photo_drive_name)
                             delete_memory(_id)
+                            reset_pages()
 
                             if drive is not None:
                                 try:
-                                    drive_sync.upload_or_update(drive, drive_sync.FOLDER_ID, DB_PATH, DB_DRIVE_NAME)
+                                    push_db(drive)
                                 except Exception as e:
                                     st.warning(f"Slettet lokalt, men kunne ikke sync DB til Drive: {e}")
 
@@ -195,6 +265,9 @@ else:
                     st.warning("Photo not found.")
 
             with cols[1]:
-                st.write(f"**{text}**")
+                st.markdown(text_md)
                 if tags:
-                    st.caption(f"Tags: {tags}")
+                    st.caption(f"Tags: {tags_md}")
+
+if more_cursor is not None:
+    st.button("Indlæs flere", key="mem_load_more", on_click=request_more, width="stretch")
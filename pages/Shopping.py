@@ -3,41 +3,46 @@
 import datetime as _dt
 import streamlit as st
 
-from src.app_state import init_app_state
-from src.config import APP_TITLE, DB_PATH, DB_DRIVE_NAME
+from src.app_state import init_app_state, push_db
+from src.config import APP_TITLE
+from src.ingredient_import import parse_ingredients
+from src.meal_planner import suggest_week
 from src.storage_shopping import (
     init_shopping_tables,
     # shopping / pantry / standards
-    fetch_shopping,
-    fetch_pantry,
-    fetch_standards,
+    load_shopping_snapshot,
     upsert_standard,
-    delete_standard,
     add_shopping,
     delete_shopping,
-    pop_shopping,
+    buy_item,
     pantry_add_or_merge,
     pantry_consume,
+    consume_and_rebuy,
     pantry_move_category,
     set_shopping_standard,
     set_pantry_standard,
+    set_standard_rule,
+    add_missing_standards,
+    STD_HOME,
+    STD_HOME_AND_LISTED,
+    STD_LISTED,
+    STD_MISSING,
     # recipes
     add_recipe,
     delete_recipe,
-    fetch_recipes,
-    fetch_recipe_items,
     delete_recipe_item,
     set_recipe_done,
     recipe_add_or_merge,
+    recipe_add_many,
     update_recipe_item_qty,
     add_shopping_from_recipe,
     # meal plan
     set_meal_for_date,
+    set_meals,
     clear_meal_for_date,
-    fetch_meal_plan,
+    cook_meal,
     generate_shopping_from_mealplan,
 )
-import drive_sync
 
 st.set_page_config(page_title=f"{APP_TITLE} • Shopping", page_icon="🛒", layout="centered")
 st.link_button("⬅️ Tilbage til forside", "/", width="stretch")
@@ -59,6 +64,8 @@ ss.setdefault("autosync", True)
 ss.setdefault("pantry_prompt_uid", None)
 
 with st.expander("Drive sync status", expanded=False):
+    if state["tenant"].name:
+        st.caption(f"Husstand: {state['tenant'].name}")
     if drive is None:
         st.warning(f"Drive sync disabled (could not connect): {drive_error}")
     else:
@@ -69,7 +76,7 @@ with st.expander("Drive sync status", expanded=False):
     ss["autosync"] = st.checkbox("Auto-sync til Drive", value=ss["autosync"])
     if st.button("Sync nu", type="tertiary", width="content"):
         try:
-            drive_sync.upload_or_update(drive, drive_sync.FOLDER_ID, DB_PATH, DB_DRIVE_NAME)
+            push_db(drive)
             st.success("Synced ✅")
         except Exception as e:
             st.warning(f"Kunne ikke sync'e: {e}")
@@ -79,7 +86,7 @@ def sync_db():
     if drive is None or not ss.get("autosync", True):
         return
     try:
-        drive_sync.upload_or_update(drive, drive_sync.FOLDER_ID, DB_PATH, DB_DRIVE_NAME)
+        push_db(drive)
     except Exception as e:
         st.warning(f"Saved locally, but failed to sync DB to Drive: {e}")
 
@@ -101,13 +108,6 @@ def _fmt_qty(q: float) -> str:
     return str(int(q)) if q.is_integer() else str(q)
 
 
-def _sorted_categories(rows, idx_cat: int):
-    def key(c: str):
-        return ("zzzz" if c == "Ukategoriseret" else c.lower())
-
-    return sorted({(r[idx_cat] or "Ukategoriseret") for r in rows}, key=key)
-
-
 def _monday(d: _dt.date) -> _dt.date:
     return d - _dt.timedelta(days=d.weekday())
 
@@ -116,6 +116,30 @@ def _iso(d: _dt.date) -> str:
     return d.isoformat()
 
 
+def _show_week(monday: _dt.date) -> None:
+    # Button callback: runs before the rerun, so the week picker may still be changed
+    st.session_state["menu_week_start_input"] = monday
+
+
+def _choose_done_recipe(uid: str) -> None:
+    # Button callback: set the picker before it is drawn
+    st.session_state["done_choice"] = uid
+
+
+def _meal_label(meal) -> str:
+    label = meal.title or meal.recipe_name
+    return f"{label} ×{_fmt_qty(meal.servings)}" if meal.servings != 1 else label
+
+
+def _cook_message(res) -> str:
+    msg = f"Trukket {res.used} vare(r) fra hjemme."
+    if res.shortfalls:
+        msg += " Manglede: " + ", ".join(f"{_fmt_qty(q)} × {t}" for t, q in res.shortfalls) + "."
+    if res.rebought:
+        msg += f" {res.rebought} standardvare(r) sat på listen."
+    return msg
+
+
 def _clean_cat(cat: str) -> str:
     cat = (cat or "").strip()
     if not cat:
@@ -125,6 +149,34 @@ def _clean_cat(cat: str) -> str:
     return cat
 
 
+_STD_STATUS_LABELS = {
+    STD_HOME_AND_LISTED: "✅ Hjemme • 🛒 På liste",
+    STD_HOME: "✅ Hjemme",
+    STD_LISTED: "🛒 På liste",
+    STD_MISSING: "⚠️ Mangler",
+}
+
+
+def _due_note(days: float) -> str:
+    days = round(days)
+    if days < 0:
+        return f"{-days} dag(e) over tid"
+    return "i dag" if days == 0 else f"om {days} dag(e)"
+
+
+def _rule_note(rule) -> str:
+    # rule = (min_qty, auto_rebuy) of a StandardStatus row
+    if not rule:
+        return ""
+    min_qty, auto = rule
+    parts = []
+    if min_qty:
+        parts.append(f"min. {_fmt_qty(min_qty)}")
+    if auto:
+        parts.append("auto")
+    return " • 🔁 " + ", ".join(parts) if parts else ""
+
+
 def _name_match(text: str, q: str) -> bool:
     q = (q or "").strip().lower()
     if not q:
@@ -147,15 +199,23 @@ ss.setdefault(
     ],
 )
 
+# Ugemenu's week comes from its widget state (set before this rerun), so its menu is in the snapshot too
+today = _dt.date.today()
+week_start = _monday(ss.get("menu_week_start_input") or today)
+overview_weeks = int(ss.get("menu_overview_weeks", 4))
+cal_to = week_start + _dt.timedelta(days=7 * max(overview_weeks, 1) - 1)
+
+# All tabs render on every rerun -> load their data once, from one consistent read
+snap = load_shopping_snapshot(_iso(today), _iso(week_start), _iso(cal_to))
+
 tab_shop, tab_pantry, tab_menu, tab_recipes = st.tabs(["Indkøbsliste", "Hjemme", "Ugemenu", "Opskrifter"])
 
 # -----------------------------
 # TAB: Indkøbsliste
 # -----------------------------
 with tab_shop:
-    # Fetch once per rerun (speed)
-    shopping_rows = fetch_shopping()  # (uid,text,qty,cat,is_std)
-    draft_recipes = fetch_recipes(done=0)  # (uid,name,is_done)
+    shopping = snap.shopping  # rows grouped by category, display order
+    draft_recipes = snap.recipes_draft  # (uid,name,is_done)
 
     draft_options = [""] + [uid for uid, _, _ in draft_recipes]
     draft_name = {uid: name for uid, name, _ in draft_recipes}
@@ -197,22 +257,19 @@ with tab_shop:
                 is_std = 1 if ss.get("new_item_std") else 0
                 recipe_uid = ss.get("new_item_recipe_uid") or ""
 
-                add_shopping(text=text, qty=qty, category=cat, is_standard=is_std)
+                add_shopping(text=text, qty=qty, category=cat)
                 if recipe_uid:
-                    recipe_add_or_merge(recipe_uid, text, qty, cat, is_standard=is_std)
+                    recipe_add_or_merge(recipe_uid, text, qty, cat)
                 if is_std:
                     upsert_standard(text=text, category=cat, default_qty=qty)
 
                 sync_db()
                 st.rerun()
 
-    if not shopping_rows:
+    if not shopping.rows:
         st.info("Listen er tom.")
     else:
-        for cat in _sorted_categories(shopping_rows, idx_cat=3):
-            group = [r for r in shopping_rows if (r[3] or "Ukategoriseret") == cat]
-            if not group:
-                continue
+        for cat, group in shopping.groups:
             with st.container(border=True):
                 st.caption(cat)
                 for uid, text, qty, _cat, is_std in group:
@@ -221,22 +278,12 @@ with tab_shop:
 
                         star_label = "⭐" if is_std else "☆"
                         if st.button(star_label, key=f"shop_star_{uid}", type="tertiary", width="content"):
-                            new_std = 0 if is_std else 1
-                            info = set_shopping_standard(uid, new_std)
-                            if info:
-                                t, c, q = info
-                                if new_std == 1:
-                                    upsert_standard(t, c, q)
-                                else:
-                                    delete_standard(t)
+                            set_shopping_standard(uid, 0 if is_std else 1)
                             sync_db()
                             st.rerun()
 
                         if st.button("Købt", key=f"shop_b_{uid}", type="secondary", width="content"):
-                            popped = pop_shopping(uid)
-                            if popped:
-                                t, q, c, popped_std = popped
-                                pantry_add_or_merge(t, q, c, is_standard=popped_std)
+                            buy_item(uid)
                             sync_db()
                             st.rerun()
 
@@ -245,18 +292,32 @@ with tab_shop:
                             sync_db()
                             st.rerun()
 
+    # --- Forslag: from the purchase history summary (item_stats), not the full log ---
+    suggestions = snap.suggestions
+    if suggestions:
+        with st.expander(f"💡 Skal nok købes snart ({len(suggestions)})", expanded=False):
+            for sug in suggestions:
+                note = f"ca. hver {round(sug.interval_days)}. dag • {_due_note(sug.due_in_days)}"
+                if sug.home_qty:
+                    note += f" • hjemme: {_fmt_qty(sug.home_qty)}"
+                if sug.runouts:
+                    note += f" • løbet tør {sug.runouts} gang(e)"
+                usual_qty = round(sug.usual_qty, 1)
+                left, right = st.columns([4, 1], vertical_alignment="center")
+                with left:
+                    st.markdown(f"**{sug.text}** ({_fmt_qty(usual_qty)})\n:small[{sug.category} • {note}]")
+                with right:
+                    if st.button("Tilføj", key=f"sug_add_{sug.text_key}", width="content"):
+                        add_shopping(text=sug.text, qty=usual_qty, category=sug.category)
+                        sync_db()
+                        st.rerun()
+
 # -----------------------------
 # TAB: Hjemme
 # -----------------------------
 with tab_pantry:
-    # Fetch once (speed)
-    pantry_rows = fetch_pantry()  # (uid,text,qty,cat,is_std)
-    shopping_rows_now = fetch_shopping()  # for standard status (needed only here)
-    standards = fetch_standards()
-
-    pantry_by_uid = {uid: (text, qty, cat, is_std) for uid, text, qty, cat, is_std in pantry_rows}
-    pantry_textkeys = {t.strip().lower() for (_, t, _, _, _) in pantry_rows} if pantry_rows else set()
-    shopping_textkeys = {t.strip().lower() for (_, t, _, _, _) in shopping_rows_now} if shopping_rows_now else set()
+    pantry = snap.pantry  # rows grouped by category + uid/text lookups
+    dashboard = snap.standards  # StandardStatus rows (rules + at home / on the list / missing)
 
     st.caption("Tilføj direkte til det du har derhjemme (rester til fryseren osv.)")
 
@@ -280,18 +341,18 @@ with tab_pantry:
                 qty = _parse_qty(ss.get("pantry_new_qty"))
                 cat = _clean_cat(ss.get("pantry_new_cat") or "Ukategoriseret")
                 is_std = 1 if ss.get("pantry_new_std") else 0
-                pantry_add_or_merge(text, qty, cat, is_standard=is_std)
+                pantry_add_or_merge(text, qty, cat)
                 if is_std:
                     upsert_standard(text=text, category=cat, default_qty=qty)
                 sync_db()
                 st.rerun()
 
-    # --- Prompt when clicking "Brugt" (lookup from pantry_by_uid, no DB call) ---
+    # --- Prompt when clicking "Brugt" (lookup from pantry.by_uid, no DB call) ---
     prompt_uid = ss.get("pantry_prompt_uid")
     if prompt_uid:
-        info = pantry_by_uid.get(prompt_uid)
+        info = pantry.by_uid.get(prompt_uid)
         if info:
-            p_text, p_qty, p_cat, p_std = info
+            _p_uid, p_text, p_qty, p_cat, p_std = info
             default_key = f"used_qty_{prompt_uid}"
             if default_key not in ss:
                 ss[default_key] = _fmt_qty(p_qty)
@@ -310,12 +371,7 @@ with tab_pantry:
                     qty_used = _parse_qty(ss.get(default_key))
 
                     if yes:
-                        res = pantry_consume(prompt_uid, qty_used)
-                        if res:
-                            t, c, is_std = res
-                            add_shopping(text=t, qty=qty_used, category=c, is_standard=is_std)
-                            if is_std:
-                                upsert_standard(t, c, qty_used)
+                        consume_and_rebuy(prompt_uid, qty_used, rebuy=True)
                         sync_db()
                         ss["pantry_prompt_uid"] = None
                         st.rerun()
@@ -329,13 +385,10 @@ with tab_pantry:
         else:
             ss["pantry_prompt_uid"] = None
 
-    if not pantry_rows:
+    if not pantry.rows:
         st.info("Ingen varer registreret derhjemme endnu.")
     else:
-        for cat in _sorted_categories(pantry_rows, idx_cat=3):
-            group = [r for r in pantry_rows if (r[3] or "Ukategoriseret") == cat]
-            if not group:
-                continue
+        for cat, group in pantry.groups:
             with st.container(border=True):
                 st.caption(cat)
                 for uid, text, qty, _cat, is_std in group:
@@ -344,14 +397,7 @@ with tab_pantry:
 
                         star_label = "⭐" if is_std else "☆"
                         if st.button(star_label, key=f"pantry_star_{uid}", type="tertiary", width="content"):
-                            new_std = 0 if is_std else 1
-                            info2 = set_pantry_standard(uid, new_std)
-                            if info2:
-                                t, c, q = info2
-                                if new_std == 1:
-                                    upsert_standard(t, c, q)
-                                else:
-                                    delete_standard(t)
+                            set_pantry_standard(uid, 0 if is_std else 1)
                             sync_db()
                             st.rerun()
 
@@ -367,59 +413,88 @@ with tab_pantry:
                             ss[f"used_qty_{uid}"] = _fmt_qty(qty)
                             st.rerun()
 
-    # --- Standardvarer: quick add (uses pre-fetched sets, no extra DB calls) ---
-    if standards:
-        missing = []
-        present = []
-        for text, cat, default_qty in standards:
-            k = (text or "").strip().lower()
-            in_home = k in pantry_textkeys
-            in_shop = k in shopping_textkeys
-
-            if in_home and in_shop:
-                status = "✅ Hjemme • 🛒 På liste"
-            elif in_home:
-                status = "✅ Hjemme"
-            elif in_shop:
-                status = "🛒 På liste"
-            else:
-                status = "⚠️ Mangler"
+    # --- Standardvarer: status from one query (at home / on the list / missing) ---
+    if dashboard:
+        missing = [row for row in dashboard if row.status == STD_MISSING]
+        present = [row for row in dashboard if row.status != STD_MISSING]
 
-            row = (text, cat, default_qty, k, in_shop, status)
-            (missing if status == "⚠️ Mangler" else present).append(row)
+        def _std_caption(row) -> str:
+            status = _STD_STATUS_LABELS[row.status]
+            if row.pantry_qty:
+                status += f" ({_fmt_qty(row.pantry_qty)})"
+            return f"{row.category} • {status}{_rule_note((row.min_qty, row.auto_rebuy))}"
 
         st.divider()
         with st.container(border=True):
             st.subheader("⭐ Standardvarer")
 
             if missing:
-                st.markdown("**⚠️ Mangler**")
-                for text, cat, default_qty, k, in_shop, status in missing:
+                head_l, head_r = st.columns([4, 1], vertical_alignment="center")
+                with head_l:
+                    st.markdown("**⚠️ Mangler**")
+                with head_r:
+                    if st.button("Tilføj alle", key="std_add_all_missing", type="primary", width="content"):
+                        add_missing_standards()
+                        sync_db()
+                        st.rerun()
+                for row in missing:
                     left, right = st.columns([4, 1], vertical_alignment="center")
                     with left:
-                        st.markdown(f"**{text}**\n:small[{cat} • {status}]")
+                        st.markdown(f"**{row.text}**\n:small[{_std_caption(row)}]")
                     with right:
-                        if st.button("Tilføj", key=f"std_add_missing_{k}", width="content"):
-                            add_shopping(text=text, qty=default_qty, category=cat, is_standard=1)
+                        if st.button("Tilføj", key=f"std_add_missing_{row.text_key}", width="content"):
+                            add_shopping(text=row.text, qty=row.default_qty, category=row.category)
                             sync_db()
                             st.rerun()
                 st.markdown("---")
 
             st.markdown("**Resten**")
-            for text, cat, default_qty, k, in_shop, status in present:
+            for row in present:
                 left, right = st.columns([4, 1], vertical_alignment="center")
                 with left:
-                    st.markdown(f"**{text}**\n:small[{cat} • {status}]")
+                    st.markdown(f"**{row.text}**\n:small[{_std_caption(row)}]")
                 with right:
-                    disabled = in_shop
+                    disabled = row.status in (STD_LISTED, STD_HOME_AND_LISTED)
                     if st.button(
                         "Tilføj",
-                        key=f"std_add_present_{k}",
+                        key=f"std_add_present_{row.text_key}",
                         disabled=disabled,
                         help="Tilføj direkte til indkøbslisten" if not disabled else "Allerede på indkøbslisten",
                         width="content",
                     ):
-                        add_shopping(text=text, qty=default_qty, category=cat, is_standard=1)
+                        add_shopping(text=row.text, qty=row.default_qty, category=row.category)
+                        sync_db()
+                        st.rerun()
+
+            with st.expander("🔁 Genkøbsregler"):
+                st.caption(
+                    "Sæt automatisk varen på indkøbslisten, når der er under et minimum hjemme "
+                    "eller når den er brugt op (med standardmængden, hvis den ikke allerede står der)."
+                )
+                std_by_key = {row.text_key: row for row in dashboard}
+                rule_key = st.selectbox(
+                    "Standardvare",
+                    list(std_by_key),
+                    format_func=lambda k: std_by_key[k].text,
+                    key="std_rule_key",
+                )
+                cur_min, cur_auto = std_by_key[rule_key].min_qty, std_by_key[rule_key].auto_rebuy
+                with st.form(f"std_rule_form_{rule_key}", border=False):
+                    c1, c2, c3 = st.columns([0.4, 0.35, 0.25], vertical_alignment="bottom")
+                    with c1:
+                        min_text = st.text_input(
+                            "Minimum hjemme",
+                            value=_fmt_qty(cur_min) if cur_min else "",
+                            placeholder="Intet minimum",
+                        )
+                    with c2:
+                        auto = st.checkbox("Når den er brugt op", value=bool(cur_auto))
+                    with c3:
+                        save_rule = st.form_submit_button("Gem")
+
+                    if save_rule:
+                        min_qty = _parse_qty(min_text) if (min_text or "").strip() else None
+                        set_standard_rule(std_by_key[rule_key].text, min_qty, 1 if auto else 0)
                         sync_db()
                         st.rerun()
 
@@ -427,28 +502,36 @@ with tab_pantry:
 # TAB: Ugemenu (kun færdige opskrifter)
 # -----------------------------
 with tab_menu:
-    # Fetch once (speed)
-    today = _dt.date.today()
-    week_start = st.date_input("Vælg uge (mandag)", value=_monday(today), key="menu_week_start_input")
-    week_start = _monday(week_start)
+    st.date_input("Vælg uge (mandag)", value=_monday(today), key="menu_week_start_input")
     week_dates = [week_start + _dt.timedelta(days=i) for i in range(7)]
     week_from = _iso(week_dates[0])
     week_to = _iso(week_dates[-1])
 
-    done_recipes = fetch_recipes(done=1)  # (uid,name,is_done)
+    done_recipes = snap.recipes_done  # (uid,name,is_done)
     recipe_name_by_uid = {uid: name for uid, name, _ in done_recipes}
     recipe_uids = [""] + [uid for uid, _, _ in done_recipes]
 
-    plan_rows = fetch_meal_plan(week_from, week_to)
-    plan_by_date = {d: (ruid, title, servings, note) for (d, ruid, title, servings, note) in plan_rows}
+    # The edited week and the overview, from the snapshot (recipe names joined in)
+    plan_by_date = {m.day_date: m for m in snap.meal_calendar}
+    for m in plan_by_date.values():
+        if m.recipe_uid and m.recipe_uid not in recipe_name_by_uid and m.recipe_name:
+            # Planned before the recipe was moved back to drafts: keep showing its name
+            recipe_name_by_uid[m.recipe_uid] = m.recipe_name
+            recipe_uids.append(m.recipe_uid)
 
     st.subheader("📅 Ugemenu")
     st.caption("Ugemenu bruger kun **færdige opskrifter**.")
 
+    cook_rebuy = st.checkbox("Sæt brugte standardvarer på listen når en ret er lavet", value=False, key="mp_cook_rebuy")
+    cook_msg = ss.pop("mp_cook_msg", None)
+    if cook_msg:
+        (st.warning if "Manglede" in cook_msg else st.success)(cook_msg)
+
     with st.container(border=True):
         for d in week_dates:
             d_str = _iso(d)
-            ruid, title, servings, note = plan_by_date.get(d_str, (None, "", 1.0, ""))
+            meal = plan_by_date.get(d_str)
+            ruid, title, servings, note = (meal.recipe_uid, meal.title, meal.servings, meal.note) if meal else (None, "", 1.0, "")
 
             row_cols = st.columns([1.25, 2.4, 1.1, 0.8], vertical_alignment="center")
             with row_cols[0]:
@@ -483,7 +566,7 @@ with tab_menu:
                 placeholder="Note (valgfri)…",
             )
 
-            bcols = st.columns([1, 1, 6], vertical_alignment="center")
+            bcols = st.columns([1, 1, 1, 5], vertical_alignment="center")
             with bcols[0]:
                 if st.button("Gem", key=f"mp_save_{d_str}", type="secondary", width="content"):
                     s = _parse_qty(ss.get(f"mp_serv_{d_str}"))
@@ -507,6 +590,79 @@ with tab_menu:
                     sync_db()
                     st.rerun()
 
+            with bcols[2]:
+                if meal and meal.cooked:
+                    st.caption("✅ Lavet")
+                elif ruid and st.button("🍳 Lavet", key=f"mp_cook_{d_str}", type="tertiary", width="content"):
+                    res = cook_meal(d_str, rebuy_standards=cook_rebuy)
+                    ss["mp_cook_msg"] = _cook_message(res)
+                    sync_db()
+                    st.rerun()
+
+    with st.expander("🤖 Foreslå menu", expanded=False):
+        st.caption("Vælger færdige opskrifter til de valgte dage, så der skal købes mindst muligt.")
+        open_days = [_iso(d) for d in week_dates if _iso(d) not in plan_by_date]
+        fill_days = st.multiselect(
+            "Dage der skal udfyldes",
+            options=[_iso(d) for d in week_dates],
+            default=open_days,
+            format_func=lambda d: _dt.date.fromisoformat(d).strftime("%a %d/%m"),
+            key=f"mp_fill_days_{week_from}",
+        )
+        use_home = st.checkbox("Brug det der er hjemme", value=True, key="mp_suggest_home")
+        ss.setdefault("mp_suggest_seed", 0)
+
+        if st.button("Foreslå", type="secondary", key="mp_suggest_btn", disabled=not fill_days):
+            # Planned days that are not being refilled count towards the week's need (x servings);
+            # the days being filled use the servings in their "Antal" field
+            keep = [
+                (m.recipe_uid, m.servings)
+                for d, m in plan_by_date.items()
+                if week_from <= d <= week_to and d not in fill_days
+            ]
+            days = tuple(sorted(fill_days))
+            servings = tuple(_parse_qty(ss.get(f"mp_serv_{d}")) for d in days)
+            ss["mp_suggest_seed"] += 1
+            plan = suggest_week(len(days), fixed=keep, servings=servings, use_pantry=use_home, seed=ss["mp_suggest_seed"])
+            ss["mp_proposal"] = (week_from, days, servings, plan)
+
+        proposal = ss.get("mp_proposal")
+        if proposal and proposal[0] == week_from:
+            _wk, days, servings, plan = proposal
+            if not plan.picks:
+                st.info("Ingen færdige opskrifter at foreslå.")
+            else:
+                for d, ruid, s in zip(days, plan.picks, servings):
+                    label = recipe_name_by_uid.get(ruid, ruid) + (f" ×{_fmt_qty(s)}" if s != 1 else "")
+                    st.markdown(f"**{_dt.date.fromisoformat(d).strftime('%a %d/%m')}** · {label}")
+                st.caption(f"{plan.items_to_buy} vare(r) skal købes for ugen • {plan.evaluated} uger vurderet")
+                if st.button("✅ Brug forslaget", type="primary", key="mp_apply_btn"):
+                    set_meals(
+                        (d, ruid, recipe_name_by_uid.get(ruid, ""), s, "")
+                        for d, ruid, s in zip(days, plan.picks, servings)
+                    )
+                    ss.pop("mp_proposal", None)
+                    sync_db()
+                    st.rerun()
+
+    with st.expander("🗓️ Oversigt (flere uger)", expanded=False):
+        st.number_input("Antal uger", min_value=1, max_value=12, value=overview_weeks, step=1, key="menu_overview_weeks")
+        for w in range(overview_weeks):
+            monday = week_start + _dt.timedelta(days=7 * w)
+            head = st.columns([3, 1], vertical_alignment="center")
+            with head[0]:
+                st.markdown(f"**Uge {monday.isocalendar()[1]}** · {monday.strftime('%d/%m')}")
+            with head[1]:
+                if w > 0:
+                    st.button("Redigér", key=f"mp_week_{_iso(monday)}", type="tertiary", on_click=_show_week, args=(monday,))
+            day_cols = st.columns(7)
+            for i, col in enumerate(day_cols):
+                d = monday + _dt.timedelta(days=i)
+                meal = plan_by_date.get(_iso(d))
+                with col:
+                    st.caption(d.strftime("%a %d/%m"))
+                    st.markdown(_meal_label(meal) if meal else "—")
+
     st.divider()
     left, right = st.columns([2, 1], vertical_alignment="center")
     with left:
@@ -514,13 +670,22 @@ with tab_menu:
     with right:
         if st.button("🛒 Generér indkøbsliste", type="primary", width="stretch"):
             summary = generate_shopping_from_mealplan(week_from, week_to, check_pantry_first=check_home)
-            sync_db()
-            st.success(
-                f"Tilføjet {summary.get('added',0)} vare(r). "
-                f"Samlet: {summary.get('merged_items',0)}. "
-                f"Springet over (hjemme-match): {summary.get('skipped_home',0)}."
-            )
-            st.rerun()
+            changes = sum(summary.get(k, 0) for k in ("added", "increased", "decreased", "removed", "merged_manual"))
+            if summary.get("written", 0):
+                sync_db()  # also when only the sources moved (e.g. swapped days)
+            if changes == 0:
+                st.info("Indkøbslisten er allerede opdateret med ugens menu.")
+            else:
+                st.success(
+                    f"Tilføjet {summary.get('added',0)}, "
+                    f"øget {summary.get('increased',0)}, "
+                    f"mindsket {summary.get('decreased',0)}, "
+                    f"fjernet {summary.get('removed',0)} vare(r). "
+                    f"Lagt oven i varer der allerede stod på listen: {summary.get('merged_manual',0)}. "
+                    f"Springet over (hjemme): {summary.get('skipped_home',0)}. "
+                    f"Delvist hjemme: {summary.get('reduced_home',0)}."
+                )
+                st.rerun()
 
 # -----------------------------
 # TAB: Opskrifter (kladder + færdige)
@@ -529,9 +694,8 @@ with tab_recipes:
     st.subheader("📚 Opskrifter")
     tab_drafts, tab_done = st.tabs(["📝 Ikke færdige", "✅ Færdige"])
 
-    # Fetch once for this tab rerun (speed)
-    all_shopping_for_picker = fetch_shopping()
-    all_pantry_for_picker = fetch_pantry()
+    all_shopping_for_picker = snap.shopping.rows
+    all_pantry_for_picker = snap.pantry.rows
 
     # -----------------------------
     # Drafts
@@ -552,7 +716,7 @@ with tab_recipes:
                     sync_db()
                     st.rerun()
 
-        drafts = fetch_recipes(done=0)
+        drafts = snap.recipes_draft
         if not drafts:
             st.info("Ingen kladder endnu.")
         else:
@@ -594,16 +758,57 @@ with tab_recipes:
                         key="draft_add_pick_uid",
                     )
 
-                    _uid, p_text, p_qty, p_cat, p_std = opt_map[picked_uid]
+                    _uid, p_text, p_qty, p_cat, _p_std = opt_map[picked_uid]
                     qty_str = st.text_input("Antal (valgfrit)", key="draft_add_qty_override", value=_fmt_qty(p_qty))
 
                     if st.button("Tilføj til opskrift", type="primary", width="stretch", key="draft_add_btn"):
                         q_add = _parse_qty(qty_str)
-                        recipe_add_or_merge(chosen, p_text, q_add, p_cat, is_standard=int(p_std or 0))
+                        recipe_add_or_merge(chosen, p_text, q_add, p_cat)
                         sync_db()
                         st.rerun()
 
-            items = fetch_recipe_items(chosen)
+            with st.expander("📋 Indsæt ingrediensliste", expanded=False):
+                st.caption("Én ingrediens pr. linje, fx “2 dl mælk” eller “3 løg”. Du kan rette før de tilføjes.")
+                pasted = st.text_area(
+                    "Ingredienser",
+                    key=f"draft_paste_{chosen}",
+                    height=150,
+                    label_visibility="collapsed",
+                    placeholder="2 dl mælk\n3 løg, hakkede\n½ tsk salt",
+                )
+                if st.button("Forhåndsvis", type="secondary", key="draft_paste_preview_btn", disabled=not (pasted or "").strip()):
+                    ss["draft_paste_preview"] = (chosen, parse_ingredients(pasted))
+
+                preview = ss.get("draft_paste_preview")
+                if preview and preview[0] == chosen:
+                    parsed = preview[1]
+                    if not parsed:
+                        st.info("Fandt ingen ingredienser i teksten.")
+                    else:
+                        cat_options = list(ss["shopping_categories"])
+                        cat_options += sorted({p.category for p in parsed} - set(cat_options))
+                        edited = st.data_editor(
+                            [{"Vare": p.text, "Antal": p.qty, "Mål": p.measure, "Kategori": p.category} for p in parsed],
+                            column_config={
+                                "Antal": st.column_config.NumberColumn(min_value=0.0, step=0.5),
+                                "Mål": st.column_config.TextColumn(disabled=True),
+                                "Kategori": st.column_config.SelectboxColumn(options=cat_options, required=True),
+                            },
+                            hide_index=True,
+                            num_rows="dynamic",
+                            key=f"draft_paste_editor_{chosen}",
+                        )
+                        if st.button(f"Tilføj {len(edited)} ingrediens(er)", type="primary", key="draft_paste_add_btn", width="stretch"):
+                            recipe_add_many(
+                                chosen,
+                                ((row.get("Vare") or "", float(row.get("Antal") or 1), _clean_cat(row.get("Kategori"))) for row in edited),
+                            )
+                            ss.pop("draft_paste_preview", None)
+                            ss.pop(f"draft_paste_{chosen}", None)
+                            sync_db()
+                            st.rerun()
+
+            items = snap.recipe_items.get(chosen, ())
 
             a1, a2, a3 = st.columns([1, 1, 3], vertical_alignment="center")
             with a1:
@@ -650,12 +855,28 @@ with tab_recipes:
     # Finished
     # -----------------------------
     with tab_done:
-        done = fetch_recipes(done=1)
+        done = snap.recipes_done
         if not done:
             st.info("Ingen færdige opskrifter endnu.")
         else:
             ruids = [uid for uid, _, _ in done]
             rnames = {uid: name for uid, name, _ in done}
+
+            cookable = snap.cookable
+            if cookable:
+                with st.expander("🍳 Kan laves nu", expanded=False):
+                    st.caption("Færdige opskrifter efter hvor meget af ingredienserne der er hjemme.")
+                    for rec in cookable:
+                        left, right = st.columns([4, 1], vertical_alignment="center")
+                        with left:
+                            note = "alt er hjemme" if not rec.missing else "mangler: " + ", ".join(rec.missing)
+                            st.markdown(f"**{rec.name}** · {rec.have}/{rec.total}\n:small[{note}]")
+                        with right:
+                            st.button(
+                                "Vælg", key=f"cook_pick_{rec.uid}", type="tertiary", width="content",
+                                on_click=_choose_done_recipe, args=(rec.uid,),
+                            )
+
             chosen = st.selectbox("Vælg færdig opskrift", options=ruids, format_func=lambda u: rnames.get(u, u), key="done_choice")
 
             c1, c2, c3 = st.columns([1.2, 1.2, 2.6], vertical_alignment="center")
@@ -671,7 +892,7 @@ with tab_recipes:
                     st.success(f"Tilføjet {summary.get('added',0)} vare(r). Sprunget over (hjemme): {summary.get('skipped_home',0)}.")
                     st.rerun()
 
-            items = fetch_recipe_items(chosen)
+            items = snap.recipe_items.get(chosen, ())
             st.divider()
 
             a1, a2 = st.columns([1, 3], vertical_alignment="center")
@@ -1,8 +1,12 @@
 import os
+from typing import Optional
+
 import streamlit as st
 
-from .config import DB_PATH, DB_DRIVE_NAME, PHOTOS_DIR, PHOTOS_CACHE_DIR
+from .config import DB_DRIVE_NAME, PHOTOS_DIR, PHOTOS_CACHE_DIR
+from . import db_maintenance, multiworker, read_replica, tenancy
 from .storage import init_db
+from .storage_shopping import reset_connection
 
 
 def ensure_dirs() -> None:
@@ -35,37 +39,120 @@ def get_drive():
         return None, e
 
 
+def _login(tenant_id: Optional[str]) -> None:
+    """Bed om husstandens nøgle (og id, hvis URL'en ikke har det) og stop siden."""
+    ss = st.session_state
+    st.title("🔒 Log ind")
+    with st.form("tenant_login"):
+        tid = st.text_input("Husstand", value=tenant_id or "", disabled=bool(tenant_id))
+        key = st.text_input("Nøgle", type="password")
+        submitted = st.form_submit_button("Log ind")
+    if submitted:
+        tenant = tenancy.get(tenant_id or tid.strip())
+        if tenant is not None and tenancy.check_key(tenant, key):
+            ss["tenant_unlocked"].add(tenant.id)
+            ss["tenant_id"] = tenant.id
+            st.rerun()
+        st.error("Forkert husstand eller nøgle.")
+    st.stop()
+
+
+def _resolve_tenant() -> tenancy.Tenant:
+    """
+    Husstanden for sessionen: ?tenant=<id> i URL'en, ellers den sessionen sidst brugte.
+    En husstand med nøgle skal låses op med nøglen én gang pr. session (_login);
+    ukendte id'er afvises. Uden husstandsfil er der kun standard-husstanden (ingen nøgle).
+    """
+    ss = st.session_state
+    unlocked = ss.setdefault("tenant_unlocked", set())  # ids whose key was given in this session
+    param = st.query_params.get("tenant")
+    tenant = tenancy.get(param or ss.get("tenant_id"))
+    if param and tenant is None:
+        st.error("Ukendt husstand.")
+        st.stop()
+    if tenant is None:
+        tenant = tenancy.default()
+        if tenant.key_sha256 is not None:
+            _login(None)  # several households: ask which one
+    if tenant.key_sha256 is not None and tenant.id not in unlocked:
+        _login(tenant.id)
+    ss["tenant_id"] = tenant.id
+    return tenant
+
+
+def _folder_of(tenant: tenancy.Tenant) -> str:
+    from drive_sync import FOLDER_ID
+    return tenant.folder_id or FOLDER_ID
+
+
+def drive_folder_id() -> str:
+    """Drive-mappen for den aktive husstand."""
+    return _folder_of(tenancy.current())
+
+
 def init_app_state():
     """
     Kaldes på hver side.
     Performance-fix:
       - Download DB fra Drive KUN én gang pr session (ikke ved hver rerun).
+    Husstande: den aktive husstand sættes her (src/tenancy.py); DB-modulerne følger den.
     """
+    tenant = _resolve_tenant()
+    tenancy.activate(tenant)
     ensure_dirs()
 
     drive, drive_error = get_drive()
 
-    # kun én gang pr session
+    # kun én gang pr session (og pr. husstand)
     ss = st.session_state
-    if "drive_db_checked" not in ss:
-        ss["drive_db_checked"] = False
+    checked_key = f"drive_db_checked:{tenant.id}"
+    if checked_key not in ss:
+        ss[checked_key] = False
 
     downloaded_db = False
-    if drive is not None and not ss["drive_db_checked"]:
+    if multiworker.enabled():
+        # Flere processer: sync-lederen henter og uploader alle husstande; de andre venter på
+        # lederens hent før de åbner DB'en
+        if not ss[checked_key]:
+            try:
+                downloaded_db = multiworker.ensure_synced(drive, _folder_of)
+            except Exception:
+                downloaded_db = False
+            finally:
+                ss[checked_key] = True
+    elif drive is not None and not ss[checked_key]:
         try:
-            from drive_sync import download_if_exists, FOLDER_ID
-            downloaded_db = download_if_exists(drive, FOLDER_ID, DB_DRIVE_NAME, DB_PATH)
+            from drive_sync import download_if_exists
+            downloaded_db = download_if_exists(drive, drive_folder_id(), DB_DRIVE_NAME, tenant.db_path)
         except Exception:
             downloaded_db = False
         finally:
-            ss["drive_db_checked"] = True  # uanset succes
+            ss[checked_key] = True  # uanset succes
+        if downloaded_db:
+            # Ny DB-fil på disk -> åbn forbindelsen igen og glem cachede læsninger
+            reset_connection()
+            read_replica.invalidate()
+            db_maintenance.invalidate()
     else:
         downloaded_db = False
 
     init_db()
+    db_maintenance.start()
 
     return {
         "drive": drive,
         "drive_error": drive_error,
         "downloaded_db": downloaded_db,
+        "tenant": tenant,
     }
+
+
+def push_db(drive) -> None:
+    """
+    Upload den aktive husstands DB til Drive efter en ændring.
+    I multi-worker mode gør sync-lederen det selv (src/multiworker.py), så her sker intet.
+    """
+    if drive is None or multiworker.enabled():
+        return
+    from drive_sync import upload_or_update
+    upload_or_update(drive, drive_folder_id(), tenancy.db_path(), DB_DRIVE_NAME)
@@ -5,7 +5,30 @@ APP_TITLE = "Knudsen Home App"
 DB_PATH = os.path.join("data", "memories.db")
 DB_DRIVE_NAME = "memories.db"
 
+# Flere husstande (src/tenancy.py): JSON-fil med husstande; tom = én husstand på DB_PATH
+TENANTS_FILE = os.environ.get("HOMEAPP_TENANTS_FILE", "").strip()
+TENANTS_DIR = os.path.join("data", "tenants")
+TENANT_POOL_MAX = int(os.environ.get("HOMEAPP_TENANT_POOL_MAX", "8"))  # husstande med åbne forbindelser
+
+# Læs fra en in-memory kopi af DB'en (skrivninger går stadig til filen)
+READ_REPLICA = os.environ.get("HOMEAPP_READ_REPLICA", "").strip().lower() in ("1", "true", "yes")
+
+# Vedligeholdelse af DB-filen i baggrunden (src/db_maintenance.py); interval 0 = slået fra
+MAINT_INTERVAL_SEC = int(os.environ.get("HOMEAPP_MAINT_INTERVAL_SEC", "60"))
+MAINT_WAL_MAX_MB = float(os.environ.get("HOMEAPP_MAINT_WAL_MAX_MB", "4"))
+MAINT_FREELIST_MAX_MB = float(os.environ.get("HOMEAPP_MAINT_FREELIST_MAX_MB", "1"))
+MAINT_OPTIMIZE_HOURS = float(os.environ.get("HOMEAPP_MAINT_OPTIMIZE_HOURS", "6"))
+
+# Flere Streamlit-processer om samme DB (src/multiworker.py): én sync-leder uploader til Drive
+MULTI_WORKER = os.environ.get("HOMEAPP_MULTI_WORKER", "").strip().lower() in ("1", "true", "yes")
+MULTI_WORKER_PUSH_SEC = float(os.environ.get("HOMEAPP_MULTI_WORKER_PUSH_SEC", "10"))
+MULTI_WORKER_PULL_WAIT_SEC = float(os.environ.get("HOMEAPP_MULTI_WORKER_PULL_WAIT_SEC", "30"))  # vent på lederens hent
+
 PHOTOS_DIR = "photos"
 PHOTOS_CACHE_DIR = "photos_cache"
 
+# Oprydning af forældreløse fotos/rækker (src/gc_orphans.py)
+GC_GRACE_HOURS = float(os.environ.get("HOMEAPP_GC_GRACE_HOURS", "24"))  # yngre filer røres ikke (gem i gang)
+GC_BATCH = int(os.environ.get("HOMEAPP_GC_BATCH", "200"))  # højst så mange sletninger pr. kørsel
+
 ALLOWED_EXTS = [".jpg", ".jpeg", ".png", ".webp"]
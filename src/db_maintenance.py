@@ -0,0 +1,189 @@
+# src/db_maintenance.py
+# -*- coding: utf-8 -*-
+"""
+Baggrundsvedligeholdelse af DB-filen (tråd med sin egen forbindelse).
+
+Hvert MAINT_INTERVAL_SEC sekund:
+  - wal_checkpoint(TRUNCATE) når -wal filen er større end MAINT_WAL_MAX_MB
+  - incremental_vacuum når de frie sider fylder mere end MAINT_FREELIST_MAX_MB
+    (første gang omlægges DB'en til auto_vacuum=INCREMENTAL med én VACUUM;
+    derefter bygges søgeindekset memories_fts forfra, se storage.rebuild_fts)
+  - PRAGMA optimize hver MAINT_OPTIMIZE_HOURS time
+
+Startes fra app_state (start() er idempotent). MAINT_INTERVAL_SEC=0 slår tråden fra;
+run_once(force=True) kan stadig kaldes manuelt (Maintenance-siden).
+Tråden vedligeholder de husstande der har været aktive (start() registrerer den aktive);
+deres forbindelser ligger i en LRUPool (src/tenancy.py).
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from src import storage, tenancy
+from src.config import (
+    MAINT_FREELIST_MAX_MB,
+    MAINT_INTERVAL_SEC,
+    MAINT_OPTIMIZE_HOURS,
+    MAINT_WAL_MAX_MB,
+)
+
+_AUTO_VACUUM_INCREMENTAL = 2
+
+_LOCK = threading.Lock()
+_THREAD: Optional[threading.Thread] = None
+_STOP = threading.Event()
+_LAST_OPTIMIZE: Dict[str, float] = {}  # db path -> time.time()
+_STATS: Dict[str, object] = {
+    "runs": 0,
+    "checkpoints": 0,
+    "vacuums": 0,           # full VACUUM (conversion to auto_vacuum=INCREMENTAL)
+    "fts_rebuilds": 0,
+    "incremental_vacuums": 0,
+    "pages_freed": 0,
+    "optimizes": 0,
+    "last_run": None,       # time.time()
+    "last_error": None,
+}
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    con.execute("PRAGMA busy_timeout=5000;")  # wait for the app's short write transactions
+    return con
+
+
+def _close(con: sqlite3.Connection) -> None:
+    with _LOCK:
+        try:
+            con.close()
+        except sqlite3.Error:
+            pass
+
+
+_CONNS: "tenancy.LRUPool[sqlite3.Connection]" = tenancy.LRUPool(_connect, _close)
+
+
+def invalidate() -> None:
+    """Luk den aktive husstands forbindelse (DB-filen er udskiftet, fx hentet fra Drive)."""
+    _CONNS.pop(tenancy.db_path())
+
+
+def _wal_bytes(path: str) -> int:
+    try:
+        return os.path.getsize(path + "-wal")
+    except OSError:
+        return 0
+
+
+def _pragma(con: sqlite3.Connection, name: str) -> int:
+    return int(con.execute(f"PRAGMA {name}").fetchone()[0])
+
+
+def db_info() -> Dict[str, int]:
+    """Størrelser for den aktive husstands DB til Maintenance-siden (bytes / antal sider)."""
+    path = tenancy.db_path()
+    con = _CONNS.get(path)
+    with _LOCK:
+        page_size = _pragma(con, "page_size")
+        return {
+            "db_bytes": _pragma(con, "page_count") * page_size,
+            "wal_bytes": _wal_bytes(path),
+            "freelist_pages": _pragma(con, "freelist_count"),
+            "freelist_bytes": _pragma(con, "freelist_count") * page_size,
+            "page_size": page_size,
+            "auto_vacuum": _pragma(con, "auto_vacuum"),
+        }
+
+
+def _checkpoint(con: sqlite3.Connection) -> None:
+    busy, _log, _done = con.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    if busy:
+        # A reader still needs the WAL; try again next round
+        _STATS["last_error"] = "wal_checkpoint: busy"
+    else:
+        _STATS["checkpoints"] += 1
+
+
+def _reclaim_free_pages(con: sqlite3.Connection) -> None:
+    before = _pragma(con, "freelist_count")
+    if _pragma(con, "auto_vacuum") == _AUTO_VACUUM_INCREMENTAL:
+        # Frees one page per VM step; execute() stops after the first one, executescript() runs to the end
+        con.executescript("PRAGMA incremental_vacuum;")
+        _STATS["incremental_vacuums"] += 1
+    else:
+        # auto_vacuum can only be switched by rebuilding the file; this VACUUM also frees everything
+        con.execute(f"PRAGMA auto_vacuum={_AUTO_VACUUM_INCREMENTAL}")
+        con.execute("VACUUM")
+        _STATS["vacuums"] += 1
+        # VACUUM may renumber memories' rowids, which the external-content FTS index points at
+        if storage.rebuild_fts(con):
+            _STATS["fts_rebuilds"] += 1
+    _STATS["pages_freed"] += max(before - _pragma(con, "freelist_count"), 0)
+
+
+def run_once(force: bool = False, path: Optional[str] = None) -> Dict[str, object]:
+    """
+    Én vedligeholdelsesrunde for `path` (standard: den aktive husstands DB).
+    force=True kører alle trin uanset tærskler. Returnerer stats().
+    """
+    path = path or tenancy.db_path()
+    _maintain(path, _CONNS.get(path), force)
+    return stats()
+
+
+def _maintain(path: str, con: sqlite3.Connection, force: bool) -> None:
+    with _LOCK:
+        _STATS["runs"] += 1
+        _STATS["last_run"] = time.time()
+        _STATS["last_error"] = None
+        try:
+            page_size = _pragma(con, "page_size")
+            if force or _pragma(con, "freelist_count") * page_size > MAINT_FREELIST_MAX_MB * 1024 * 1024:
+                _reclaim_free_pages(con)
+            # After the vacuum: it writes through the WAL too
+            if force or _wal_bytes(path) > MAINT_WAL_MAX_MB * 1024 * 1024:
+                _checkpoint(con)
+            if force or time.time() - _LAST_OPTIMIZE.get(path, 0.0) > MAINT_OPTIMIZE_HOURS * 3600:
+                con.execute("PRAGMA optimize")
+                _LAST_OPTIMIZE[path] = time.time()
+                _STATS["optimizes"] += 1
+        except sqlite3.Error as e:
+            # Busy/locked: the app was writing; the next round tries again
+            _STATS["last_error"] = str(e)
+
+
+def _loop() -> None:
+    while not _STOP.wait(MAINT_INTERVAL_SEC):
+        for path in _CONNS.keys():
+            con = _CONNS.peek(path)  # peek: the job itself must not keep a household "recently used"
+            if con is not None:
+                _maintain(path, con, force=False)
+
+
+def start() -> bool:
+    """
+    Start baggrundstråden (én pr. proces) og tag den aktive husstand med i runderne.
+    Returnerer True hvis den kører.
+    """
+    global _THREAD
+    if MAINT_INTERVAL_SEC <= 0:
+        return False
+    _CONNS.get(tenancy.db_path())
+    with _LOCK:
+        if _THREAD is None or not _THREAD.is_alive():
+            _STOP.clear()
+            _THREAD = threading.Thread(target=_loop, name="db-maintenance", daemon=True)
+            _THREAD.start()
+    return True
+
+
+def stop() -> None:
+    _STOP.set()
+
+
+def stats() -> Dict[str, object]:
+    out = dict(_STATS)
+    out["running"] = _THREAD is not None and _THREAD.is_alive()
+    return out
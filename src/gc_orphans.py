@@ -0,0 +1,317 @@
+# src/gc_orphans.py
+# -*- coding: utf-8 -*-
+"""
+Oprydning af forældreløse filer og rækker (Maintenance-siden).
+
+Referencer bygges fra DB'en (memories.photo_path / photo_drive_id) og sammenlignes med:
+  - photos/        lokale fotos uden memories-række (fx gem der fejlede efter save_photo_locally)
+  - photos_cache/  cache-filer for Drive-fotos der ikke længere findes, og tmp_-filer
+                   efterladt af upload_uploadedfile_to_drive
+  - Drive-mappen   fotos uden memories-række (fx sletninger på Drive der fejlede);
+                   kun billedfiler, DB-filen røres aldrig
+  - recipe_items / meal_plan rækker der peger på en opskrift der ikke findes
+
+photos/ og photos_cache/ deles af alle husstande, så referencerne læses fra alle husstandes
+DB'er; mangler en af dem på denne maskine, springes de lokale mapper over. Drive-mappen
+sammenlignes med de husstande der bruger samme mappe.
+
+Sikkerhed:
+  - filer yngre end GC_GRACE_HOURS røres ikke (et gem kan være i gang)
+  - dry_run=True (standard) finder og rapporterer kun
+  - der slettes kun fund fra en tør kørsel brugeren har set og bekræftet (confirmed), og
+    som stadig findes ved sletningen
+  - lige før hver sletning tjekkes referencerne igen (et gem siden fundet kan bruge filen nu);
+    rækker tjekkes igen i slette-transaktionen
+  - højst GC_BATCH sletninger pr. kørsel (ældste først); resten tages ved næste kørsel
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src import tenancy
+from src.config import ALLOWED_EXTS, DB_DRIVE_NAME, GC_BATCH, GC_GRACE_HOURS, PHOTOS_CACHE_DIR, PHOTOS_DIR
+from src.drive_media import delete_drive_file
+from src.storage_shopping import delete_dangling_recipe_refs, fetch_dangling_recipe_refs
+
+KIND_PHOTO = "photo"            # photos/
+KIND_CACHE = "cache"            # photos_cache/<drive id>.<ext>
+KIND_TMP = "tmp"                # photos_cache/tmp_*
+KIND_DRIVE = "drive"            # Drive folder
+KIND_RECIPE_ITEM = "recipe_item"
+KIND_MEAL = "meal_plan"
+
+_FILE_KINDS = (KIND_PHOTO, KIND_CACHE, KIND_TMP)
+
+_LOCK = threading.Lock()  # one run at a time
+_STATS: Dict[str, object] = {
+    "runs": 0,
+    "removed": 0,
+    "freed_bytes": 0,
+    "last_run": None,       # time.time()
+    "last_error": None,
+}
+
+
+class Orphan(NamedTuple):
+    kind: str           # KIND_*
+    ref: str            # file path, Drive file id or row uid
+    name: str           # shown on the page
+    size: int           # bytes (0 for rows)
+    age_hours: float
+
+
+class GCReport(NamedTuple):
+    orphans: Tuple[Orphan, ...]     # everything found, oldest first
+    removed: int                    # 0 on dry runs
+    freed_bytes: int
+    remaining: int                  # left for the next run
+    skipped: Tuple[str, ...]        # why a source was not checked
+
+
+class _Refs(NamedTuple):
+    paths: Set[str]                 # normalised photo_path
+    drive_ids: Set[str]
+    local_complete: bool            # every household's DB was read
+    missing: Tuple[str, ...]        # households whose DB is not on this host
+
+
+def _tenant_refs(db_path: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    if not os.path.exists(db_path):
+        return None
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("SELECT photo_path, photo_drive_id FROM memories").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # no memories table yet = no photos
+    finally:
+        con.close()
+    return {os.path.normpath(p) for p, _ in rows if p}, {d for _, d in rows if d}
+
+
+def _references() -> Tuple[_Refs, Dict[str, Set[str]]]:
+    """Referencer fra alle husstande + Drive-id'er pr. Drive-mappe (None = standardmappen)."""
+    paths: Set[str] = set()
+    drive_ids: Set[str] = set()
+    by_folder: Dict[Optional[str], Set[str]] = {}
+    missing: List[str] = []
+    for t in tenancy.tenants().values():
+        refs = _tenant_refs(t.db_path)
+        if refs is None:
+            missing.append(t.id)
+            continue
+        paths |= refs[0]
+        drive_ids |= refs[1]
+        by_folder.setdefault(t.folder_id, set()).update(refs[1])
+    return _Refs(paths, drive_ids, not missing, tuple(missing)), by_folder
+
+
+def _age_hours(mtime: float, now: float) -> float:
+    return max(now - mtime, 0.0) / 3600
+
+
+def _scan_dir(path: str):
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                if e.is_file(follow_symlinks=False):
+                    yield e
+    except FileNotFoundError:
+        return
+
+
+def _local_orphans(refs: _Refs, now: float, grace_hours: float) -> List[Orphan]:
+    out: List[Orphan] = []
+    for e in _scan_dir(PHOTOS_DIR):
+        if os.path.normpath(os.path.join(PHOTOS_DIR, e.name)) not in refs.paths:
+            st = e.stat()
+            out.append(Orphan(KIND_PHOTO, e.path, e.name, st.st_size, _age_hours(st.st_mtime, now)))
+    for e in _scan_dir(PHOTOS_CACHE_DIR):
+        if e.name.startswith("tmp_"):
+            kind = KIND_TMP
+        elif os.path.splitext(e.name)[0] not in refs.drive_ids:
+            kind = KIND_CACHE
+        else:
+            continue
+        st = e.stat()
+        out.append(Orphan(kind, e.path, e.name, st.st_size, _age_hours(st.st_mtime, now)))
+    return [o for o in out if o.age_hours >= grace_hours]
+
+
+def _drive_time(value: str) -> float:
+    # "2024-05-01T12:34:56.789Z"
+    try:
+        return datetime.fromisoformat((value or "").replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()  # unknown age: treated as new (kept)
+
+
+def _drive_orphans(drive, folder_id: str, referenced: Set[str], now: float, grace_hours: float) -> List[Orphan]:
+    q = f"'{folder_id}' in parents and trashed=false"
+    out: List[Orphan] = []
+    for f in drive.ListFile({"q": q}).GetList():
+        title = f.get("title") or ""
+        if title == DB_DRIVE_NAME or os.path.splitext(title)[1].lower() not in ALLOWED_EXTS:
+            continue
+        if f["id"] in referenced:
+            continue
+        age = _age_hours(_drive_time(f.get("createdDate")), now)
+        if age >= grace_hours:
+            out.append(Orphan(KIND_DRIVE, f["id"], title, int(f.get("fileSize") or 0), age))
+    return out
+
+
+def _row_orphans() -> List[Orphan]:
+    items, meals = fetch_dangling_recipe_refs()
+    return [Orphan(KIND_RECIPE_ITEM, uid, text, 0, 0.0) for uid, text in items] + [
+        Orphan(KIND_MEAL, uid, day, 0, 0.0) for uid, day in meals
+    ]
+
+
+def find_orphans(
+    drive=None, folder_id: Optional[str] = None, grace_hours: float = GC_GRACE_HOURS
+) -> Tuple[List[Orphan], List[str]]:
+    """
+    Find forældreløse filer/rækker for den aktive husstand (og de delte fotomapper).
+    drive/folder_id: uden dem tjekkes Drive-mappen ikke.
+    Returnerer (fund ældste først, grunde til at en kilde blev sprunget over).
+    """
+    now = time.time()
+    refs, by_folder = _references()
+    skipped: List[str] = []
+    found = _row_orphans()
+
+    if refs.local_complete:
+        found += _local_orphans(refs, now, grace_hours)
+    else:
+        skipped.append("Lokale fotomapper: DB mangler på denne maskine for " + ", ".join(refs.missing))
+
+    if drive is not None and folder_id:
+        own = tenancy.current().folder_id
+        sharing = [t.id for t in tenancy.tenants().values() if t.folder_id == own]
+        if any(tid in refs.missing for tid in sharing):
+            skipped.append("Drive-mappen: DB mangler for en husstand der bruger samme mappe")
+        else:
+            try:
+                found += _drive_orphans(drive, folder_id, by_folder.get(own, set()), now, grace_hours)
+            except Exception as e:  # network/Drive errors: report, the rest still runs
+                skipped.append(f"Drive-mappen: {e}")
+    elif drive is None:
+        skipped.append("Drive-mappen: ikke forbundet")
+
+    found.sort(key=lambda o: -o.age_hours)
+    return found, skipped
+
+
+def _open_tenant_dbs() -> Optional[List[sqlite3.Connection]]:
+    # None if a household's DB is gone: then no file can be shown to be unused
+    cons: List[sqlite3.Connection] = []
+    for t in tenancy.tenants().values():
+        if not os.path.exists(t.db_path):
+            for con in cons:
+                con.close()
+            return None
+        cons.append(sqlite3.connect(t.db_path))
+    return cons
+
+
+def _still_orphan(cons: List[sqlite3.Connection], o: Orphan, grace_hours: float) -> bool:
+    """Tjek igen lige før sletningen: filen kan være skrevet eller refereret siden fundet."""
+    if o.kind in _FILE_KINDS:
+        try:
+            mtime = os.stat(o.ref).st_mtime
+        except FileNotFoundError:
+            return False
+        if _age_hours(mtime, time.time()) < grace_hours:
+            return False
+    if o.kind == KIND_TMP:
+        return True
+    if o.kind == KIND_PHOTO:
+        target = os.path.normpath(o.ref)
+        sql, arg = "SELECT photo_path FROM memories WHERE instr(photo_path, ?) > 0", o.name
+    else:  # cache files are named after their Drive id
+        target = o.ref if o.kind == KIND_DRIVE else os.path.splitext(o.name)[0]
+        sql, arg = "SELECT photo_drive_id FROM memories WHERE photo_drive_id = ?", target
+    for con in cons:
+        try:
+            rows = con.execute(sql, (arg,)).fetchall()
+        except sqlite3.OperationalError:
+            continue  # no memories table yet
+        if any((os.path.normpath(v) if o.kind == KIND_PHOTO else v) == target for (v,) in rows):
+            return False
+    return True
+
+
+def _remove(drive, batch: List[Orphan], grace_hours: float) -> Tuple[int, int, List[str]]:
+    removed = freed = 0
+    errors: List[str] = []
+    files = [o for o in batch if o.kind in _FILE_KINDS or o.kind == KIND_DRIVE]
+    cons = _open_tenant_dbs() if files else []
+    if cons is None:
+        errors.append("en husstands DB mangler; ingen filer slettet")
+        files = []
+    try:
+        for o in files:
+            if not _still_orphan(cons, o, grace_hours):
+                continue
+            if o.kind in _FILE_KINDS:
+                try:
+                    os.remove(o.ref)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    errors.append(f"{o.name}: {e}")
+                    continue
+            elif not delete_drive_file(drive, o.ref):
+                errors.append(f"{o.name}: kunne ikke slette på Drive")
+                continue
+            removed += 1
+            freed += o.size
+    finally:
+        for con in cons or ():
+            con.close()
+
+    rows = [o for o in batch if o.kind in (KIND_RECIPE_ITEM, KIND_MEAL)]
+    if rows:
+        removed += delete_dangling_recipe_refs(
+            [o.ref for o in rows if o.kind == KIND_RECIPE_ITEM],
+            [o.ref for o in rows if o.kind == KIND_MEAL],
+        )
+    return removed, freed, errors
+
+
+def collect(
+    drive=None,
+    folder_id: Optional[str] = None,
+    dry_run: bool = True,
+    limit: int = GC_BATCH,
+    grace_hours: float = GC_GRACE_HOURS,
+    confirmed: Iterable[Orphan] = (),
+) -> GCReport:
+    """
+    Én oprydningsrunde. dry_run=True rapporterer kun; ellers slettes højst `limit` fund (ældste først),
+    og kun dem der også er i `confirmed` (den tørre kørsel brugeren har set og bekræftet).
+    Rækker der ryddes ændrer DB'en: kalderen sync'er den til Drive bagefter.
+    """
+    with _LOCK:
+        _STATS["runs"] += 1
+        _STATS["last_run"] = time.time()
+        _STATS["last_error"] = None
+        found, skipped = find_orphans(drive, folder_id, grace_hours)
+        if dry_run:
+            return GCReport(tuple(found), 0, 0, len(found), tuple(skipped))
+
+        shown = {(o.kind, o.ref) for o in confirmed}
+        batch = [o for o in found if (o.kind, o.ref) in shown][: max(limit, 0)]
+        removed, freed, errors = _remove(drive, batch, grace_hours)
+        _STATS["removed"] += removed
+        _STATS["freed_bytes"] += freed
+        if errors:
+            _STATS["last_error"] = "; ".join(errors[:3])
+        return GCReport(tuple(found), removed, freed, len(found) - removed, tuple(skipped))
+
+
+def stats() -> Dict[str, object]:
+    return dict(_STATS)
@@ -0,0 +1,109 @@
+# src/ingredient_import.py
+# -*- coding: utf-8 -*-
+"""
+Indsæt en ingrediensliste (kopieret fra en opskrift) i en kladde.
+
+Én linje pr. ingrediens, fx
+    2 dl mælk
+    3 løg, hakkede
+    ½ tsk salt
+    1 1/2 kg kartofler
+    - 2-3 fed hvidløg
+    salt og peber
+Antal: heltal, decimaler (2,5 / 2.5), brøker (1/2, ½, 1½, 1 1/2) og intervaller (2-3 -> 3).
+Tællende enheder (stk, fed, dåse, pakke, ...) giver antallet; måleenheder (g, dl, tsk, ...)
+giver 1, fordi varerne tælles i indkøbsenheder (én pakke mel, ikke 500 g). Målet vises i
+forhåndsvisningen. Linjer uden antal giver 1; overskrifter ("Dej:") springes over.
+Tekst efter komma og i parentes er tilberedning ("hakkede") og tages ikke med.
+
+Kategori gættes ud fra standardvarer og købshistorik (storage_shopping.guess_categories).
+"""
+import re
+from typing import List, NamedTuple, Optional
+
+from src.storage_shopping import guess_categories
+
+_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅕": 0.2, "⅛": 0.125}
+
+# Counted in purchase units: the number is the quantity
+_COUNT_UNITS = {
+    "stk", "fed", "dåse", "dåser", "ds", "pk", "pakke", "pakker", "bundt", "bdt",
+    "glas", "pose", "poser", "skive", "skiver", "flaske", "flasker", "bakke", "bakker",
+}
+# Measured: the quantity becomes 1 (one purchase), the measure is only shown
+_MEASURE_UNITS = {
+    "g", "gr", "gram", "kg", "mg", "l", "liter", "dl", "cl", "ml",
+    "tsk", "spsk", "knsp", "kop", "kopper", "håndfuld", "drys", "nip",
+}
+
+_NUM = r"\d+(?:[.,]\d+)?"
+_FRAC = r"\d+\s*/\s*\d+"
+_UNI = "[" + "".join(_FRACTIONS) + "]"
+# "1 1/2", "1½", "1/2", "½", "2,5", "2-3" (the upper bound is used)
+_QTY = re.compile(
+    rf"^(?:ca\.?\s*)?(?P<qty>(?:\d+\s+{_FRAC}|\d*\s*{_UNI}|{_FRAC}|{_NUM})(?:\s*[-–]\s*(?:{_FRAC}|{_NUM}))?)\s*"
+)
+_BULLET = re.compile(r"^\s*(?:[-*•·]|\d+[.)](?=\s))\s*")
+_NOTE = re.compile(r"\s*\([^)]*\)|\s*,.*$")
+
+
+class ParsedIngredient(NamedTuple):
+    line: str
+    text: str
+    qty: float
+    measure: str    # "2 dl" for measured units, "" otherwise
+    category: str
+
+
+def _to_number(s: str) -> float:
+    s = s.strip().replace(",", ".")
+    total = 0.0
+    for part in s.split():
+        if "/" in part:
+            num, den = part.split("/", 1)
+            total += float(num) / float(den) if float(den) else 0.0
+        elif part[-1] in _FRACTIONS:
+            total += (float(part[:-1]) if part[:-1] else 0.0) + _FRACTIONS[part[-1]]
+        else:
+            total += float(part)
+    return total
+
+
+def _parse_qty(s: str) -> float:
+    # "2-3" -> 3: buy enough for the upper bound
+    s = re.sub(r"\s*/\s*", "/", s)
+    return _to_number(re.split(r"\s*[-–]\s*", s)[-1])
+
+
+def parse_line(line: str) -> Optional[ParsedIngredient]:
+    """Én linje -> ParsedIngredient (kategori endnu ikke gættet), eller None for tomme linjer/overskrifter."""
+    raw = (line or "").strip()
+    s = _BULLET.sub("", raw).strip()
+    if not s or s.endswith(":"):
+        return None
+
+    qty, measure = 1.0, ""
+    m = _QTY.match(s)
+    if m:
+        amount = _parse_qty(m.group("qty"))
+        rest = s[m.end():]
+        unit, _, after = rest.partition(" ")
+        unit_key = unit.lower().rstrip(".")
+        if unit_key in _COUNT_UNITS and after.strip():
+            qty, s = amount, after
+        elif unit_key in _MEASURE_UNITS and after.strip():
+            measure, s = f"{m.group('qty').strip()} {unit.rstrip('.')}", after
+        else:
+            qty, s = amount, rest
+
+    text = _NOTE.sub("", s).strip()
+    if not text:
+        return None
+    return ParsedIngredient(raw, text, qty if qty > 0 else 1.0, measure, "Ukategoriseret")
+
+
+def parse_ingredients(pasted: str) -> List[ParsedIngredient]:
+    """Hele den indsatte tekst -> ingredienser med gættet kategori (ét DB-opslag for alle)."""
+    items = [p for p in (parse_line(line) for line in (pasted or "").splitlines()) if p]
+    guessed = guess_categories([p.text for p in items])
+    return [p._replace(category=guessed.get(p.text, p.category)) for p in items]
@@ -0,0 +1,110 @@
+# src/loadtest.py
+# -*- coding: utf-8 -*-
+"""
+Belastningstest af multi-worker mode: N processer læser og skriver samme DB samtidig.
+
+    python -m src.loadtest                      # 1, 2 og 4 processer, 5 sek. hver
+    python -m src.loadtest --workers 1 2 4 8 --seconds 10 --write-ratio 0.1
+
+Kører i en midlertidig mappe (rører ikke data/). Hver proces kører en blanding af
+load_shopping_snapshot() (læsning) og add_shopping()+delete_shopping() (skrivning);
+skrivninger fra én proces gør de andres cachede læsninger ugyldige via data_version.
+Udskriver operationer/sek. og skalering i forhold til én proces.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+_SEED_ROWS = 200
+
+
+def _prepare(workdir: str) -> None:
+    # DB_PATH is relative ("data/memories.db") and config reads the environment at import
+    os.chdir(workdir)
+    os.environ["HOMEAPP_MULTI_WORKER"] = "1"
+    os.environ["HOMEAPP_MAINT_INTERVAL_SEC"] = "0"
+    os.makedirs("data", exist_ok=True)
+
+
+def _seed(workdir: str) -> None:
+    _prepare(workdir)
+    from src import storage_shopping as s
+
+    s.init_shopping_tables()
+    with s.unit_of_work("shopping_items", "pantry_items") as cur:
+        for i in range(_SEED_ROWS):
+            s._add_shopping(cur, f"Vare {i}", 1 + i % 3, f"Kategori {i % 12}")
+            s._pantry_merge(cur, f"Hjemme {i}", 1, f"Kategori {i % 12}")
+
+
+def _worker(workdir: str, seconds: float, write_ratio: float, start_at: float, out) -> None:
+    _prepare(workdir)
+    from src import storage_shopping as s
+
+    s.init_shopping_tables()
+    rnd = random.Random(os.getpid())
+    reads = writes = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        if rnd.random() < write_ratio:
+            s.add_shopping(f"Test {os.getpid()}", 1, "Test")
+            snap = s.load_shopping_snapshot()
+            for row in snap.shopping.rows:
+                if row.text == f"Test {os.getpid()}":
+                    s.delete_shopping(row.uid)
+            writes += 1
+        else:
+            s.load_shopping_snapshot()
+            reads += 1
+    out.put((reads, writes))
+
+
+def run(workers: int, seconds: float, write_ratio: float, workdir: str) -> Tuple[float, float]:
+    """Returnerer (læsninger/sek., skrivninger/sek.) samlet for alle processer."""
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    start_at = time.time() + 2.0  # let every process import and open the DB first
+    procs = [
+        ctx.Process(target=_worker, args=(workdir, seconds, write_ratio, start_at, out))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    results: List[Tuple[int, int]] = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return (sum(r for r, _ in results) / seconds, sum(w for _, w in results) / seconds)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="homeapp-loadtest-") as workdir:
+        seeder = mp.get_context("spawn").Process(target=_seed, args=(workdir,))
+        seeder.start()
+        seeder.join()
+
+        print(f"{os.cpu_count()} CPU'er, {args.seconds:g} sek. pr. kørsel, skriveandel {args.write_ratio:g}")
+        print(f"{'processer':>9} {'læs/s':>10} {'skriv/s':>10} {'i alt/s':>10} {'skalering':>10}")
+        base = None
+        for n in args.workers:
+            reads, writes = run(n, args.seconds, args.write_ratio, workdir)
+            total = reads + writes
+            base = base or total
+            print(f"{n:>9} {reads:>10.0f} {writes:>10.1f} {total:>10.0f} {total / base:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# src/meal_planner.py
+# -*- coding: utf-8 -*-
+"""
+Automatisk menuforslag: vælg færdige opskrifter til ugens ledige dage, så der skal
+købes så lidt som muligt.
+
+Model (NumPy):
+  A   opskrifter x ingredienser, mængde pr. portion (fra recipe_items, nøgle = text_key)
+  p   mængde hjemme pr. ingrediens (pantry_items; nul-vektor hvis der ikke tjekkes hjemme)
+  f   behov fra de dage der allerede er planlagt (faste dage), x deres antal portioner
+  w   antal portioner pr. ledig dag
+En uge er opskrifter S_1..S_n på de ledige dage (ingen gentagelser, ingen af de faste):
+  mangler(S) = max(f + sum(w_i * A[S_i]) - p, 0)
+og scores leksikografisk: først antal varer der mangler, så den samlede manglende mængde
+(enhederne blandes, så mængden bruges kun til at skille lige antal ad).
+
+Søgning: alle kombinationer hvis der er få nok, ellers `samples` tilfældige uger (i
+tilfældig dagsorden), scoret samlet som én matrixmultiplikation (uger x opskrifter) @ A.
+Den bedste forbedres derefter med bytninger (én dag ad gangen, alle ubrugte opskrifter og
+dagsombytninger på én gang), til ingen bytning hjælper. 4000 uger over 200 opskrifter tager omkring 0,1 sekund.
+"""
+import itertools
+import math
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.storage_shopping import fetch_pantry_totals, fetch_planner_items
+
+_EPS = 1e-9
+_MAX_SWAP_ROUNDS = 50
+
+
+class WeekPlan(NamedTuple):
+    picks: Tuple[str, ...]  # recipe uids for the free days, in day order
+    items_to_buy: int       # ingredients with a shortfall (whole week, fixed days included)
+    qty_to_buy: float       # summed shortfall
+    evaluated: int          # candidate weeks scored
+
+
+def _matrix(rows: Sequence[Tuple[str, str, float]]) -> Tuple[List[str], Dict[str, int], np.ndarray]:
+    # rows = (recipe_uid, text_key, qty); repeated (recipe, key) pairs are summed by np.add.at
+    uids, r_idx = np.unique(np.array([r[0] for r in rows], dtype=object), return_inverse=True)
+    keys, k_idx = np.unique(np.array([r[1] for r in rows], dtype=object), return_inverse=True)
+    a = np.zeros((len(uids), len(keys)))
+    np.add.at(a, (r_idx, k_idx), np.array([r[2] for r in rows], dtype=float))
+    return list(uids), {k: i for i, k in enumerate(keys)}, a
+
+
+def _score(need: np.ndarray, home: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """need: (..., K) -> (antal varer der mangler, manglende mængde), begge (...)."""
+    short = np.maximum(need - home, 0.0)
+    return (short > _EPS).sum(axis=-1), short.sum(axis=-1)
+
+
+def _best(count: np.ndarray, qty: np.ndarray, rng: np.random.Generator) -> int:
+    # Lexicographic (count, qty); ties broken at random so "Nyt forslag" can differ
+    order = np.lexsort((rng.random(count.shape[0]), qty, count))
+    return int(order[0])
+
+
+def _candidates(n_avail: int, n_pick: int, samples: int, rng: np.random.Generator) -> np.ndarray:
+    """(uger, n_pick) indeks i de ledige opskrifter, uden gentagelser inden for en uge."""
+    if math.comb(n_avail, n_pick) <= samples:
+        return np.array(list(itertools.combinations(range(n_avail), n_pick)), dtype=np.intp)
+    # The n_pick smallest of a random row = a uniform random subset
+    return np.argpartition(rng.random((samples, n_avail)), n_pick - 1, axis=1)[:, :n_pick]
+
+
+def _improve(
+    week: np.ndarray, need: np.ndarray, a: np.ndarray, home: np.ndarray, servings: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Byt én opskrift ad gangen til en ubrugt, eller byt to dages opskrifter (dagene kan have
+    forskelligt antal portioner), så længe det gør ugen bedre.
+    """
+    week = week.copy()
+    n = week.size
+    w = servings[:, None]
+    count, qty = _score(need, home)
+    for _ in range(_MAX_SWAP_ROUNDS):
+        unused = np.setdiff1d(np.arange(a.shape[0]), week)
+        days = a[week]
+        # (days, unused, K): the week's need with day i swapped for recipe j
+        swapped = need[None, None, :] + w[:, :, None] * (a[unused][None, :, :] - days[:, None, :])
+        # (days, days, K): the week's need with the recipes of day i and day k exchanged
+        moved = need[None, None, :] + (w - w.T)[:, :, None] * (days[None, :, :] - days[:, None, :])
+        cands = np.concatenate((swapped.reshape(-1, need.size), moved.reshape(-1, need.size)))
+        c, q = _score(cands, home)
+        best = int(np.lexsort((q, c))[0])
+        if (c[best], q[best]) >= (count, qty - _EPS):
+            break
+        need = cands[best]
+        count, qty = c[best], q[best]
+        if best < swapped.shape[0] * swapped.shape[1]:
+            i, j = divmod(best, unused.size)
+            week[i] = unused[j]
+        else:
+            i, k = divmod(best - swapped.shape[0] * swapped.shape[1], n)
+            week[i], week[k] = week[k], week[i]
+    return week, need
+
+
+def suggest_week(
+    free_days: int,
+    fixed: Sequence[Tuple[Optional[str], float]] = (),
+    servings: Sequence[float] = (),
+    use_pantry: bool = True,
+    samples: int = 4000,
+    seed: Optional[int] = None,
+) -> WeekPlan:
+    """
+    Foreslå opskrifter til `free_days` dage.
+    fixed: (opskrift, portioner) der allerede står på ugens andre dage (tæller med i behovet,
+           gentages ikke).
+    servings: portioner pr. ledig dag i dagsorden (mangler der nogen, regnes med 1).
+    use_pantry: træk det der er hjemme fra behovet.
+    Er der færre ledige opskrifter end dage, foreslås så mange som muligt.
+    """
+    rows = fetch_planner_items()
+    if free_days <= 0 or not rows:
+        return WeekPlan((), 0, 0.0, 0)
+    uids, key_index, a = _matrix(rows)
+    rng = np.random.default_rng(seed)
+
+    home = np.zeros(a.shape[1])
+    if use_pantry:
+        for key, qty in fetch_pantry_totals():
+            i = key_index.get(key)
+            if i is not None:
+                home[i] = qty
+
+    row_of = {u: i for i, u in enumerate(uids)}
+    fixed = [(row_of[u], float(s)) for u, s in fixed if u in row_of]
+    fixed_rows = [r for r, _s in fixed]
+    fixed_need = np.array([s for _r, s in fixed]) @ a[fixed_rows] if fixed else np.zeros(a.shape[1])
+    avail = np.setdiff1d(np.arange(len(uids)), fixed_rows)
+    n_pick = min(free_days, avail.size)
+    if n_pick == 0:
+        count, qty = _score(fixed_need, home)
+        return WeekPlan((), int(count), float(qty), 0)
+
+    w = np.ones(n_pick)
+    given = np.asarray(servings[:n_pick], dtype=float)
+    w[: given.size] = given
+
+    a_avail = a[avail]
+    # Column i = day i; combinations come sorted, so shuffle which recipe lands on which day
+    weeks = _candidates(avail.size, n_pick, samples, rng)[:, rng.permutation(n_pick)]
+    chosen = np.zeros((weeks.shape[0], avail.size))
+    np.put_along_axis(chosen, weeks, np.broadcast_to(w, weeks.shape), axis=1)
+    needs = fixed_need + chosen @ a_avail
+    count, qty = _score(needs, home)
+    best = _best(count, qty, rng)
+
+    week, need = _improve(weeks[best], needs[best], a_avail, home, w)
+    count, qty = _score(need, home)
+    picks = tuple(uids[avail[i]] for i in week)
+    return WeekPlan(picks, int(count), float(qty), int(weeks.shape[0]))
@@ -0,0 +1,368 @@
+# src/multiworker.py
+# -*- coding: utf-8 -*-
+"""
+Flere Streamlit-processer på samme maskine (HOMEAPP_MULTI_WORKER=1).
+
+Processerne deler DB-filen i data/ og koordinerer sådan:
+  - skrivere: unit_of_work() tager en fil-lås (flock) om hver transaktion,
+    så processerne venter i kø i stedet for at få "database is locked"
+  - læse-caches: storage_shopping sammenligner PRAGMA data_version (data) og
+    schema_version (kolonne-cachen), så andre processers skrivninger ses uden delt hukommelse
+  - Drive: én proces pr. maskine er sync-leder (flock på data/.sync-leader.lock, holdes
+    så længe processen lever; dør den, overtager den næste der spørger).
+    Lederen henter DB'en fra Drive når Drive-filen er nyere end den lokale (modifiedDate
+    gemmes i .drive-version ved hvert hent og upload, så en anden maskines upload hentes
+    også efter en genstart) og skriver den ind via backup-API'et (ingen filudskiftning
+    under de andre processer). Den uploader et konsistent øjebliksbillede når data er
+    ændret. De andre processer uploader ikke selv.
+  - husstande (src/tenancy.py): en husstands DB tjekkes mod Drive første gang den bruges
+    efter lederens start, ikke alle på én gang. De andre processer lægger en anmodning i
+    data/.pull-requests/ og venter på hent-markøren (.drive-pulled, skrevet af den nuværende
+    leder), før de åbner DB'en, så ingen skriver i en DB der ikke er hentet endnu.
+    Lederens sync-tråd besvarer anmodningerne og uploader de DB'er hvis fil er ændret siden
+    sidste upload/hent (fil-signaturen i .drive-pushed; ændringer fra før en genstart kommer
+    også med). Den holder ingen forbindelser åbne, så hukommelsen ikke vokser med antallet
+    af husstande. Skrive-lås og markører ligger pr. DB-fil, så husstandene ikke venter på
+    hinanden.
+
+Kræver fcntl (Linux/macOS); uden den kører appen som én proces.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, IO, Iterator, Optional
+
+from src import tenancy
+from src.config import DB_DRIVE_NAME, DB_PATH, MULTI_WORKER, MULTI_WORKER_PULL_WAIT_SEC, MULTI_WORKER_PUSH_SEC
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_LEADER_LOCK = os.path.join(os.path.dirname(DB_PATH) or ".", ".sync-leader.lock")  # one per host
+_REQUESTS_DIR = os.path.join(os.path.dirname(DB_PATH) or ".", ".pull-requests")  # <tenant id> = "check it, please"
+_REQUEST_POLL_SEC = 0.25
+_UNCHECKED = " unchecked"  # marker suffix: released without a Drive check (offline/no Drive)
+
+
+def _beside(db_path: str, name: str) -> str:
+    # Per-DB files live next to the DB (data/ or data/tenants/<id>/)
+    return os.path.join(os.path.dirname(db_path) or ".", name)
+
+
+def _writer_lock_path(db_path: str) -> str:
+    return _beside(db_path, ".writer.lock")
+
+
+def _pulled_marker(db_path: str) -> str:
+    # Holds the token of the leader that checked this DB against Drive (see _leader_token),
+    # plus _UNCHECKED if it released the DB without a check
+    return _beside(db_path, ".drive-pulled")
+
+
+def _version_file(db_path: str) -> str:
+    # Drive modifiedDate of the copy the local DB matches (survives restarts, unlike memory)
+    return _beside(db_path, ".drive-version")
+
+
+def _read_text(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _write_text(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read_version(db_path: str) -> Optional[str]:
+    return _read_text(_version_file(db_path)) or None
+
+
+def _write_version(db_path: str, version: Optional[str]) -> None:
+    if version:
+        _write_text(_version_file(db_path), version)
+
+
+def _pushed_file(db_path: str) -> str:
+    # File signature (see _signature) of the DB as last pushed or pulled
+    return _beside(db_path, ".drive-pushed")
+
+
+def _signature(db_path: str) -> str:
+    # Changes with every commit (the DB file or its -wal); read without opening the DB
+    parts = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    return " ".join(parts)
+
+
+def _tmp_copy(db_path: str, kind: str) -> str:
+    return _beside(db_path, f".{kind}-" + os.path.basename(db_path))
+
+
+_LOCK = threading.Lock()
+_FILES: Dict[str, IO] = {}
+_IS_LEADER = False
+_CHECK_LOCK = threading.Lock()  # one Drive check at a time (session thread vs. sync thread)
+_STATS: Dict[str, object] = {"pulls": 0, "pushes": 0, "last_pull_error": None, "last_push_error": None}
+
+FolderOf = Callable[[tenancy.Tenant], str]  # household -> its Drive folder id
+
+
+def _leader_token() -> str:
+    # Unique per leader lifetime: a marker from an earlier boot or leader never matches
+    return f"{_read_text('/proc/sys/kernel/random/boot_id')}:{os.getpid()}"
+
+
+def enabled() -> bool:
+    return MULTI_WORKER and fcntl is not None
+
+
+def _lock_file(path: str) -> IO:
+    with _LOCK:
+        f = _FILES.get(path)
+        if f is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            f = _FILES[path] = open(path, "a+")
+        return f
+
+
+def is_sync_leader() -> bool:
+    """Er denne proces sync-leder? (Altid True uden multi-worker.)"""
+    global _IS_LEADER
+    if not enabled():
+        return True
+    if not _IS_LEADER:
+        f = _lock_file(_LEADER_LOCK)
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        # Tell the other processes which leader their pulled markers must come from
+        f.seek(0)
+        f.truncate()
+        f.write(_leader_token())
+        f.flush()
+        _IS_LEADER = True
+    return _IS_LEADER
+
+
+@contextmanager
+def writer_lock() -> Iterator[None]:
+    """
+    Fil-lås om én skrivetransaktion (på tværs af processer).
+    Tråde i samme proces serialiseres af kalderen (storage_shopping._LOCK):
+    flock er pr. åben fil, så den beskytter ikke tråde mod hinanden.
+    """
+    if not enabled():
+        yield
+        return
+    f = _lock_file(_writer_lock_path(tenancy.db_path()))
+    fcntl.flock(f, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def pull_once(drive, folder_id: str) -> bool:
+    """
+    Leder: hent den aktive husstands DB fra Drive, hvis Drive-filen er ændret siden
+    sidste hent/upload fra denne maskine. Returnerer True hvis DB'en blev hentet.
+    """
+    db_path = tenancy.db_path()
+    if not is_sync_leader():
+        return False
+    from drive_sync import find_file_in_folder
+
+    remote = find_file_in_folder(drive, folder_id, DB_DRIVE_NAME)
+    version = remote["modifiedDate"] if remote else None
+    if not remote or (version == _read_version(db_path) and os.path.exists(db_path)):
+        return False
+    pull_tmp = _tmp_copy(db_path, "pull")
+    remote.GetContentFile(pull_tmp)
+    src = sqlite3.connect(pull_tmp)
+    dst = sqlite3.connect(db_path)
+    try:
+        # Page-for-page copy through SQLite: open connections in other processes
+        # see it as an ordinary commit (data_version/schema_version change)
+        with writer_lock():
+            src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+        os.remove(pull_tmp)
+    _write_version(db_path, version)
+    _write_text(_pushed_file(db_path), _signature(db_path))  # don't push Drive's copy back
+    _STATS["pulls"] += 1
+    return True
+
+
+def push_snapshot(drive, folder_id: str, db_path: str) -> None:
+    """Upload et konsistent øjebliksbillede (inkl. det der stadig ligger i -wal)."""
+    from drive_sync import find_file_in_folder, upload_or_update
+
+    push_tmp = _tmp_copy(db_path, "push")
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(push_tmp)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    upload_or_update(drive, folder_id, push_tmp, DB_DRIVE_NAME)
+    # Our own upload is not "newer on Drive" at the next pull check
+    remote = find_file_in_folder(drive, folder_id, DB_DRIVE_NAME)
+    _write_version(db_path, remote["modifiedDate"] if remote else None)
+    _STATS["pushes"] += 1
+
+
+def _check(drive, folder_of: FolderOf, tenant: tenancy.Tenant) -> bool:
+    """
+    Leder: tjek husstandens DB mod Drive, hvis denne leder ikke har gjort det endnu,
+    og skriv hent-markøren. Returnerer True hvis DB'en blev hentet.
+    """
+    token = _leader_token()
+    marker = _pulled_marker(tenant.db_path)
+    with _CHECK_LOCK, tenancy.using(tenant):
+        if _read_text(marker) == token:
+            return False
+        downloaded = False
+        checked = False
+        if drive is not None:
+            try:
+                downloaded = pull_once(drive, folder_of(tenant))
+                checked = True
+                _STATS["last_pull_error"] = None
+            except Exception as e:  # offline: checked again before anything is pushed
+                _STATS["last_pull_error"] = str(e)
+        # Released even when the check failed, so the other processes don't hang
+        _write_text(marker, token if checked else token + _UNCHECKED)
+        return downloaded
+
+
+class _Syncer:
+    """
+    Lederens sync-tråd for alle husstande: besvarer de andre processers hent-anmodninger og
+    uploader hver MULTI_WORKER_PUSH_SEC de DB'er hvis fil-signatur er ændret siden sidste
+    upload/hent. Alt står i filer ved siden af DB'erne; tråden holder intet pr. husstand.
+    """
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.drive = None
+        self.folder_of: Optional[FolderOf] = None
+
+    def start(self, drive, folder_of: FolderOf) -> None:
+        with _LOCK:
+            self.drive = drive if drive is not None else self.drive  # a later session may have Drive
+            self.folder_of = folder_of
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="drive-sync", daemon=True)
+                self.thread.start()
+
+    def _loop(self) -> None:
+        next_push = time.time() + MULTI_WORKER_PUSH_SEC
+        while not self.stop.wait(_REQUEST_POLL_SEC):
+            self._answer_requests()
+            if self.drive is not None and time.time() >= next_push:
+                for tenant in tenancy.tenants().values():
+                    try:
+                        self._push(tenant)
+                        _STATS["last_push_error"] = None
+                    except Exception as e:  # network/Drive errors: retry next round
+                        _STATS["last_push_error"] = str(e)
+                next_push = time.time() + MULTI_WORKER_PUSH_SEC
+
+    def _answer_requests(self) -> None:
+        try:
+            names = os.listdir(_REQUESTS_DIR)
+        except OSError:
+            return
+        for name in names:
+            tenant = tenancy.get(name)
+            if tenant is not None:
+                _check(self.drive, self.folder_of, tenant)
+            try:
+                os.remove(os.path.join(_REQUESTS_DIR, name))
+            except OSError:
+                pass
+
+    def _push(self, tenant: tenancy.Tenant) -> None:
+        db_path = tenant.db_path
+        if not os.path.exists(db_path):
+            return
+        if _signature(db_path) == _read_text(_pushed_file(db_path)):
+            return
+        if _read_text(_pulled_marker(db_path)) != _leader_token():
+            # Changed but not (successfully) checked by this leader, e.g. unpushed changes from
+            # before a restart: never push a DB that may be older than Drive's
+            _check(self.drive, self.folder_of, tenant)
+            if _read_text(_pulled_marker(db_path)) != _leader_token():
+                return
+        signature = _signature(db_path)  # taken before the snapshot: later commits push next round
+        if signature == _read_text(_pushed_file(db_path)):
+            return  # the check just pulled it
+        push_snapshot(self.drive, self.folder_of(tenant), db_path)
+        _write_text(_pushed_file(db_path), signature)
+
+
+_SYNCER = _Syncer()
+
+
+def _wait_for_leader(tenant: tenancy.Tenant) -> bool:
+    # True when the current leader has checked the DB; False if we became leader or gave up
+    marker = _pulled_marker(tenant.db_path)
+    deadline = time.time() + MULTI_WORKER_PULL_WAIT_SEC
+    requested = False
+    while True:
+        if is_sync_leader():
+            return False
+        leader = _read_text(_LEADER_LOCK)
+        if leader and _read_text(marker).split(" ")[0] == leader:
+            return True
+        if not requested:
+            _write_text(os.path.join(_REQUESTS_DIR, tenant.id), "")
+            requested = True
+        if time.time() > deadline:
+            return False
+        time.sleep(0.2)
+
+
+def ensure_synced(drive, folder_of: FolderOf) -> bool:
+    """
+    Kaldes før den aktive husstands DB åbnes (app_state).
+    Lederen tjekker husstanden mod Drive (første gang siden start) og starter sync-tråden;
+    de andre processer beder lederen om det og venter på hent-markøren
+    (højst MULTI_WORKER_PULL_WAIT_SEC) og overtager, hvis lederen er væk.
+    Returnerer True hvis den aktive husstands DB blev hentet af dette kald.
+    """
+    if not enabled():
+        return False
+    tenant = tenancy.current()
+    if not is_sync_leader() and _wait_for_leader(tenant):
+        return False
+    _SYNCER.start(drive, folder_of)
+    return _check(drive, folder_of, tenant)
+
+
+def stats() -> Dict[str, object]:
+    out = dict(_STATS)
+    out["enabled"] = enabled()
+    out["leader"] = _IS_LEADER
+    out["sync_thread"] = _SYNCER.thread is not None and _SYNCER.thread.is_alive()
+    out["pid"] = os.getpid()
+    return out
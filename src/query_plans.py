@@ -0,0 +1,63 @@
+# src/query_plans.py
+# -*- coding: utf-8 -*-
+"""
+EXPLAIN QUERY PLAN-tjek af de varme forespørgsler i storage.py og storage_shopping.py.
+
+Hver forespørgsel i modulernes _HOT_QUERIES skal kunne besvares via et indeks:
+  - ingen "SCAN <tabel>" uden indeks (fuld tabel-scanning)
+  - ingen "USE TEMP B-TREE" (sortering/gruppering uden for indekset)
+Bruges fra Maintenance-siden og kan køres direkte (exit-kode 1 ved problemer):
+    python -m src.query_plans
+"""
+import re
+import sys
+from typing import Dict, List, Tuple
+
+from src import storage, storage_shopping
+
+_BARE_SCAN = re.compile(r"^SCAN (\w+)$")  # "SCAN t USING [COVERING] INDEX ..." is an ordered index walk
+
+
+def _hot_queries() -> Dict[str, Tuple[str, object]]:
+    queries = dict(storage._HOT_QUERIES)
+    queries.update(storage_shopping._HOT_QUERIES)
+    return queries
+
+
+def explain_hot_queries() -> Dict[str, List[str]]:
+    """name -> plan-linjer (detail-kolonnen fra EXPLAIN QUERY PLAN)."""
+    storage.init_db()
+    storage_shopping.init_shopping_tables()
+    plans: Dict[str, List[str]] = {}
+    with storage_shopping._using_conn() as con:
+        for name, (sql, params) in _hot_queries().items():
+            rows = con.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            plans[name] = [r[3] for r in rows]
+    return plans
+
+
+def plan_problems(plan: List[str]) -> List[str]:
+    # Scanning a materialized subquery/CTE reads its (small) result, not a table
+    materialized = {line.split()[1] for line in plan if line.startswith("MATERIALIZE ")}
+    problems = []
+    for line in plan:
+        m = _BARE_SCAN.match(line.strip())
+        if (m and m.group(1) not in materialized) or "USE TEMP B-TREE" in line:
+            problems.append(line)
+    return problems
+
+
+def check_query_plans() -> List[Tuple[str, str]]:
+    """Liste af (forespørgsel, plan-linje) der bryder reglerne. Tom liste = alt OK."""
+    problems: List[Tuple[str, str]] = []
+    for name, plan in explain_hot_queries().items():
+        problems.extend((name, line) for line in plan_problems(plan))
+    return problems
+
+
+if __name__ == "__main__":
+    bad = check_query_plans()
+    for name, line in bad:
+        print(f"{name}: {line}")
+    print("OK" if not bad else f"{len(bad)} problem(s)")
+    sys.exit(1 if bad else 0)
@@ -0,0 +1,91 @@
+# src/read_replica.py
+# -*- coding: utf-8 -*-
+"""
+Valgfri in-memory læse-replika af husstandens DB (slås til med HOMEAPP_READ_REPLICA=1).
+
+DB-filen kopieres til en :memory: SQLite via backup-API'et. fetch_*-funktionerne
+læser fra kopien, mens alle skrivninger stadig går til filen på disk.
+
+Kopien genopfriskes ved første læsning efter en ændring:
+  - lokale skrivninger sker på andre forbindelser end kildeforbindelsen her,
+    så PRAGMA data_version på kilden skifter efter hver commit (også fra andre processer)
+  - efter et Drive-pull (filen er udskiftet) kalder app_state invalidate()
+Flere skrivninger mellem to læsninger giver kun én kopiering.
+Én kopi pr. aktiv husstand (LRU-begrænset, se src/tenancy.py).
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from src import tenancy
+from src.config import READ_REPLICA
+
+
+class _Replica:
+    """Kilde og kopi for én DB-fil (én husstand)."""
+    __slots__ = ("path", "src", "mem", "synced_version")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.src: Optional[sqlite3.Connection] = None   # disk connection, only used as backup source
+        self.mem: Optional[sqlite3.Connection] = None   # the replica
+        self.synced_version: Optional[int] = None
+
+    def close(self) -> None:
+        with _LOCK:
+            for con in (self.src, self.mem):
+                if con is not None:
+                    try:
+                        con.close()
+                    except sqlite3.Error:
+                        pass
+            self.src = self.mem = None
+            self.synced_version = None
+
+
+_LOCK = threading.RLock()
+_REPLICAS: "tenancy.LRUPool[_Replica]" = tenancy.LRUPool(_Replica, _Replica.close)
+_STATS: Dict[str, int] = {"refreshes": 0, "reads": 0}
+
+
+def enabled() -> bool:
+    return READ_REPLICA
+
+
+def invalidate() -> None:
+    """Glem den aktive husstands kopi (filen er udskiftet); næste læsning kopierer hele DB'en igen."""
+    _REPLICAS.pop(tenancy.db_path())
+
+
+def _refresh_if_stale(rep: _Replica) -> None:
+    if rep.src is None:
+        rep.src = sqlite3.connect(rep.path, check_same_thread=False)
+    version = rep.src.execute("PRAGMA data_version").fetchone()[0]
+    if rep.mem is not None and version == rep.synced_version:
+        return
+    if rep.mem is None:
+        rep.mem = sqlite3.connect(":memory:", check_same_thread=False)
+    rep.src.backup(rep.mem)
+    rep.synced_version = version
+    _STATS["refreshes"] += 1
+
+
+@contextmanager
+def reading() -> Iterator[sqlite3.Connection]:
+    """
+    Giver replika-forbindelsen for den aktive husstand (opdateret hvis filen er ændret).
+    Låsen holdes under læsningen, så en opfriskning aldrig sker midt i en forespørgsel.
+    """
+    rep = _REPLICAS.get(tenancy.db_path())
+    with _LOCK:
+        _refresh_if_stale(rep)
+        _STATS["reads"] += 1
+        yield rep.mem
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        out = dict(_STATS)
+    out["replicas"] = len(_REPLICAS)
+    return out
@@ -1,20 +1,35 @@
 import os
+import re
 import uuid
 import sqlite3
 from datetime import datetime
 
-from .config import DB_PATH, PHOTOS_DIR, ALLOWED_EXTS
+from . import multiworker, read_replica, tenancy
+from .config import PHOTOS_DIR, ALLOWED_EXTS
 
 
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    # The active household's DB (src/tenancy.py)
+    return sqlite3.connect(tenancy.db_path(), check_same_thread=False)
+
+
+def _writing():
+    # Writes queue on the same file lock as storage_shopping.unit_of_work (multi-worker mode)
+    return multiworker.writer_lock()
+
+
+def _read_conn():
+    # Læsninger kan gå til in-memory replikaen; skrivninger bruger altid get_conn()
+    if read_replica.enabled():
+        return read_replica.reading()
+    return get_conn()
 
 
 def init_db() -> None:
     """
     Opret tabel + migrér gamle DB'er.
     """
-    with get_conn() as conn:
+    with _writing(), get_conn() as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS memories (
@@ -35,9 +50,153 @@ def init_db() -> None:
         if "photo_drive_name" not in cols:
             conn.execute("ALTER TABLE memories ADD COLUMN photo_drive_name TEXT")
 
+        # fetch_page/fetch_recent: newest first straight from the index, id breaks created_at ties
+        # (seconds resolution) so the keyset cursor is unique
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_created_id ON memories(created_at, id)")
+        conn.execute("DROP INDEX IF EXISTS idx_memories_created")
+
+        _init_fts(conn)
+        _init_tags(conn)
         conn.commit()
 
 
+# -----------------------------
+# Full-text search (FTS5)
+# -----------------------------
+# External content table: the index stores tokens only, text/tags are read from memories by rowid.
+# unicode61 keeps æ/ø/å as letters; remove_diacritics 2 lets "cafe" find "café" (and "a" find "å").
+# prefix='2 3' makes the short prefix queries of the search box index lookups.
+_FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE memories_fts USING fts5(
+        text, tags,
+        content='memories', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+"""
+
+_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memories_fts_insert AFTER INSERT ON memories BEGIN
+        INSERT INTO memories_fts(rowid, text, tags) VALUES (new.rowid, new.text, COALESCE(new.tags, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memories_fts_delete AFTER DELETE ON memories BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, text, tags)
+        VALUES ('delete', old.rowid, old.text, COALESCE(old.tags, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memories_fts_update AFTER UPDATE OF text, tags ON memories BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, text, tags)
+        VALUES ('delete', old.rowid, old.text, COALESCE(old.tags, ''));
+        INSERT INTO memories_fts(rowid, text, tags) VALUES (new.rowid, new.text, COALESCE(new.tags, ''));
+    END
+    """,
+)
+
+
+def _has_fts(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name='memories_fts'").fetchone() is not None
+
+
+def _init_fts(conn) -> None:
+    if not _has_fts(conn):
+        try:
+            conn.execute(_FTS_TABLE_SQL)
+        except sqlite3.OperationalError:
+            return  # SQLite built without FTS5: search_memories falls back to LIKE
+        # A hit in the text counts twice as much as one in the tags
+        conn.execute("INSERT INTO memories_fts(memories_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+        conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+    for sql in _FTS_TRIGGERS:
+        conn.execute(sql)
+
+
+def rebuild_fts(conn) -> bool:
+    """
+    Byg søgeindekset forfra fra memories. Nødvendigt efter VACUUM: memories har ingen
+    INTEGER PRIMARY KEY, så VACUUM kan give rækkerne nye rowid'er (src/db_maintenance.py).
+    """
+    if not _has_fts(conn):
+        return False
+    conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+    return True
+
+
+# -----------------------------
+# Tags (memory_tags + tag_counts)
+# -----------------------------
+# memories.tags stays the text the user typed; memory_tags holds one normalised row per tag.
+# PK (tag, created_at, memory_id): one tag's memories newest first straight from the key,
+# with the same keyset cursor as fetch_page. tag_counts is kept by triggers.
+_TAG_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS memory_tags (
+        tag TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        memory_id TEXT NOT NULL,
+        PRIMARY KEY (tag, created_at, memory_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_memory_tags_memory ON memory_tags(memory_id, tag)",
+    """
+    CREATE TABLE IF NOT EXISTS tag_counts (
+        tag TEXT PRIMARY KEY,
+        n INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tag_counts_n ON tag_counts(n DESC, tag)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memory_tags_insert AFTER INSERT ON memory_tags BEGIN
+        INSERT INTO tag_counts(tag, n) VALUES (new.tag, 1)
+        ON CONFLICT(tag) DO UPDATE SET n = n + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memory_tags_delete AFTER DELETE ON memory_tags BEGIN
+        UPDATE tag_counts SET n = n - 1 WHERE tag = old.tag;
+        DELETE FROM tag_counts WHERE tag = old.tag AND n <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_memories_tags_delete AFTER DELETE ON memories BEGIN
+        DELETE FROM memory_tags WHERE memory_id = old.id;
+    END
+    """,
+)
+
+
+def split_tags(tags: str):
+    """"Home, lighting ,home" -> ["home", "lighting"] (små bogstaver, uden dubletter)."""
+    out = []
+    for t in (tags or "").split(","):
+        t = t.strip().lstrip("#").strip().lower()
+        if t and t not in out:
+            out.append(t)
+    return out
+
+
+def _write_tags(conn, mem_id: str, created_at: str, tags: str) -> None:
+    conn.executemany(
+        "INSERT OR IGNORE INTO memory_tags (tag, created_at, memory_id) VALUES (?, ?, ?)",
+        [(t, created_at, mem_id) for t in split_tags(tags)],
+    )
+
+
+def _init_tags(conn) -> None:
+    backfill = conn.execute("SELECT 1 FROM sqlite_master WHERE name='memory_tags'").fetchone() is None
+    for sql in _TAG_SCHEMA:
+        conn.execute(sql)
+    if backfill:
+        # Existing memories: the triggers count them as they go in
+        for mem_id, created_at, tags in conn.execute(
+            "SELECT id, created_at, tags FROM memories WHERE COALESCE(tags,'') <> ''"
+        ).fetchall():
+            _write_tags(conn, mem_id, created_at, tags)
+
+
 def save_photo_locally(uploaded_file) -> str:
     """
     Gem foto lokalt og returner sti.
@@ -70,7 +229,7 @@ def add_memory(
     text = (text or "").strip()
     tags = (tags or "").strip()
 
-    with get_conn() as conn:
+    with _writing(), get_conn() as conn:
         conn.execute(
             """
             INSERT INTO memories (id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name)
@@ -78,24 +237,178 @@ def add_memory(
             """,
             (mem_id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name),
         )
+        _write_tags(conn, mem_id, created_at, tags)
         conn.commit()
 
 
+_SQL_RECENT = """
+    SELECT id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name
+    FROM memories
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+"""
+
+# Keyset pagination: continue below the last row shown, so any page costs one index
+# seek + `limit` rows, however far back it is (no OFFSET)
+_SQL_PAGE_AFTER = """
+    SELECT id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name
+    FROM memories
+    WHERE (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+"""
+
+
+# Tag filters page through memory_tags with the same cursor. {after} is empty on the first page.
+_TAG_AFTER = "AND (t.created_at, t.memory_id) < (?, ?)"
+
+# All tags: walk the rarest tag's rows in key order, probe the others on uq_memory_tags_memory
+_SQL_TAG_AND = """
+    SELECT t.created_at, t.memory_id
+    FROM memory_tags t
+    WHERE t.tag = ? {after} {probes}
+    ORDER BY t.created_at DESC, t.memory_id DESC
+    LIMIT ?
+"""
+_TAG_PROBE = "AND EXISTS (SELECT 1 FROM memory_tags x WHERE x.memory_id = t.memory_id AND x.tag = ?)"
+
+# Any tag: one ordered walk per tag, merged by the compound select (MERGE, no sort)
+_SQL_TAG_OR_ARM = """
+    SELECT t.created_at, t.memory_id
+    FROM memory_tags t
+    WHERE t.tag = ? {after}
+"""
+
+_SQL_BY_IDS = """
+    SELECT id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name
+    FROM memories
+    WHERE id IN ({marks})
+"""
+
+_SQL_TAG_COUNTS = "SELECT tag, n FROM tag_counts ORDER BY n DESC, tag"
+
+
+def _tag_and_sql(n_tags: int, after: bool) -> str:
+    return _SQL_TAG_AND.format(after=_TAG_AFTER if after else "", probes=" ".join([_TAG_PROBE] * (n_tags - 1)))
+
+
+def _tag_or_sql(n_tags: int, after: bool) -> str:
+    arms = " UNION ".join([_SQL_TAG_OR_ARM.format(after=_TAG_AFTER if after else "")] * n_tags)
+    return f"{arms} ORDER BY 1 DESC, 2 DESC LIMIT ?"
+
+
+def _tag_page(conn, tags, match_all: bool, cursor, n: int):
+    after = tuple(cursor) if cursor is not None else ()
+    if match_all:
+        marks = ",".join("?" * len(tags))
+        counts = dict(conn.execute(f"SELECT tag, n FROM tag_counts WHERE tag IN ({marks})", tags).fetchall())
+        if len(counts) < len(tags):
+            return []  # a tag nobody uses: nothing has them all
+        lead = min(tags, key=counts.get)
+        params = (lead, *after, *(t for t in tags if t != lead), n)
+        keys = conn.execute(_tag_and_sql(len(tags), bool(after)), params).fetchall()
+    else:
+        params = tuple(p for t in tags for p in (t, *after)) + (n,)
+        keys = conn.execute(_tag_or_sql(len(tags), bool(after)), params).fetchall()
+    if not keys:
+        return []
+    ids = [k[1] for k in keys]
+    by_id = {r[0]: r for r in conn.execute(_SQL_BY_IDS.format(marks=",".join("?" * len(ids))), ids).fetchall()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def fetch_page(cursor=None, limit: int = 30, tags=(), match_all: bool = True):
+    """
+    Én side memories, nyeste først.
+    cursor: None for første side, ellers next_cursor fra forrige side.
+    tags: kun memories med alle (match_all) eller mindst ét af disse tags (se split_tags).
+    Returnerer (rækker som fetch_recent, next_cursor); next_cursor er None på sidste side.
+    """
+    tags = split_tags(",".join(tags))
+    with _read_conn() as conn:
+        if tags:
+            rows = _tag_page(conn, tags, match_all, cursor, limit + 1)
+        elif cursor is None:
+            rows = conn.execute(_SQL_RECENT, (limit + 1,)).fetchall()
+        else:
+            rows = conn.execute(_SQL_PAGE_AFTER, (cursor[0], cursor[1], limit + 1)).fetchall()
+    # The extra row only tells whether there is a next page
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1][1], rows[-1][0])
+
+
 def fetch_recent(limit: int = 30):
-    with get_conn() as conn:
-        cur = conn.execute(
-            """
-            SELECT id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name
-            FROM memories
-            ORDER BY created_at DESC
-            LIMIT ?
-            """,
-            (limit,),
-        )
-        return cur.fetchall()
+    return fetch_page(None, limit)[0]
+
+
+def fetch_tag_counts():
+    """[(tag, antal memories)], mest brugte først."""
+    with _read_conn() as conn:
+        return conn.execute(_SQL_TAG_COUNTS).fetchall()
+
+
+_WORD = re.compile(r"\w+")
+
+# "Ranked" by bm25 (the rank configured in _init_fts); ORDER BY rank is answered inside FTS5
+_SQL_SEARCH = """
+    SELECT m.id, m.created_at, m.text, m.tags, m.photo_path, m.photo_drive_id, m.photo_drive_name,
+           highlight(memories_fts, 0, '**', '**'), highlight(memories_fts, 1, '**', '**')
+    FROM memories_fts
+    JOIN memories m ON m.rowid = memories_fts.rowid
+    WHERE memories_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+
+def _fts_query(words) -> str:
+    # Every word as a quoted prefix term: user input never becomes FTS5 syntax (AND, NEAR, "-", ...)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _search_like(conn, words, limit: int):
+    # Fallback without FTS5: every word in text or tags, newest first
+    where, params = [], []
+    for w in words:
+        pat = "%" + w.replace("_", "\\_") + "%"  # a \w+ word has no % or backslash
+        where.append("(text LIKE ? ESCAPE '\\' OR COALESCE(tags,'') LIKE ? ESCAPE '\\')")
+        params += [pat, pat]
+    rows = conn.execute(
+        "SELECT id, created_at, text, tags, photo_path, photo_drive_id, photo_drive_name FROM memories"
+        f" WHERE {' AND '.join(where)} ORDER BY created_at DESC LIMIT ?",
+        (*params, limit),
+    ).fetchall()
+    return [(*r, r[2], r[3] or "") for r in rows]
+
+
+def search_memories(query: str, limit: int = 30):
+    """
+    Fritekstsøgning i tekst og tags (ordpræfikser, alle ord skal med), bedste match først.
+    Rækker som fetch_recent + (tekst, tags) med fundne ord markeret som **fed**.
+    """
+    words = _WORD.findall(query or "")
+    if not words:
+        return []
+    with _read_conn() as conn:
+        if not _has_fts(conn):
+            return _search_like(conn, words, limit)
+        return conn.execute(_SQL_SEARCH, (_fts_query(words), limit)).fetchall()
 
 
 def delete_memory(mem_id: str) -> None:
-    with get_conn() as conn:
+    with _writing(), get_conn() as conn:
         conn.execute("DELETE FROM memories WHERE id = ?", (mem_id,))
         conn.commit()
+
+
+# Queries checked by src/query_plans.py (must be served from an index)
+_HOT_QUERIES = {
+    "fetch_recent": (_SQL_RECENT, (30,)),
+    "fetch_page": (_SQL_PAGE_AFTER, ("2024-01-01T00:00:00", "x", 30)),
+    "search_memories": (_SQL_SEARCH, ('"lampe"*', 30)),
+    "fetch_page tags (all)": (_tag_and_sql(2, True), ("home", "2024-01-01T00:00:00", "x", "lighting", 30)),
+    "fetch_page tags (any)": (_tag_or_sql(2, True), ("home", "2024-01-01T00:00:00", "x", "lighting", "2024-01-01T00:00:00", "x", 30)),
+    "fetch_tag_counts": (_SQL_TAG_COUNTS, ()),
+}
@@ -1,60 +1,310 @@
 # src/storage_shopping.py
 # -*- coding: utf-8 -*-
+import functools
+import itertools
 import sqlite3
+import threading
+import unicodedata
 import uuid
-from typing import List, Tuple, Optional, Dict
+import warnings
+from contextlib import contextmanager
+from datetime import date
+from types import MappingProxyType
+from typing import Callable, Iterable, Iterator, List, Mapping, NamedTuple, Tuple, Optional, Dict, Sequence
 
-from src.config import DB_PATH
+from src import multiworker, read_replica, tenancy
 
-_CONN: Optional[sqlite3.Connection] = None
-_COL_CACHE: Dict[str, set[str]] = {}  # cache PRAGMA table_info per table
 
+class _DbState:
+    """
+    Forbindelse og caches for én DB-fil (én husstand, se src/tenancy.py).
 
-def _conn() -> sqlite3.Connection:
-    global _CONN
-    if _CONN is None:
-        con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    Read cache for the fetch_* functions. An entry is valid while its token is unchanged:
+      (PRAGMA data_version, write counter per table read)
+    - write counters are bumped by _commit() after our own writes
+      (data_version does not change for commits on the same connection)
+    - data_version changes when another connection/process commits
+    - reset_connection() drops the whole state (e.g. DB replaced by a Drive pull)
+
+    users counts the blocks using the connection right now (_using_conn); a state dropped from
+    the pool (LRU eviction, reset_connection) is only closed when the last of them is done.
+    """
+    __slots__ = ("path", "conn", "write_counters", "read_cache", "col_cache", "schema_version", "users", "retired")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.write_counters: Dict[str, int] = {}
+        self.read_cache: Dict[tuple, tuple] = {}
+        self.col_cache: Dict[str, set[str]] = {}   # cache PRAGMA table_info per table
+        self.schema_version: Optional[int] = None  # schema_version col_cache was filled at
+        self.users = 0
+        self.retired = False
+
+    def close(self) -> None:
+        # Called by the pool. Under _LOCK: never close the connection in the middle of a transaction
+        with _LOCK:
+            self.retired = True
+            if self.users == 0:
+                self._close_conn()
+
+    def _close_conn(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+        self.conn = None
+
+
+# _LOCK: one transaction at a time on the shared connections (Streamlit runs sessions in threads)
+_LOCK = threading.RLock()
+_STATES: "tenancy.LRUPool[_DbState]" = tenancy.LRUPool(_DbState, _DbState.close)
+_READ_CACHE_MAX = 256
+
+
+def _state() -> _DbState:
+    return _STATES.get(tenancy.db_path())
+
+
+def _open(state: _DbState) -> sqlite3.Connection:
+    # Caller holds _LOCK
+    if state.conn is None:
+        con = sqlite3.connect(state.path, check_same_thread=False)
         # Speed pragmas (good defaults for Streamlit apps)
         con.execute("PRAGMA journal_mode=WAL;")         # better concurrency + faster writes
         con.execute("PRAGMA synchronous=NORMAL;")       # faster, still safe enough for most apps
         con.execute("PRAGMA temp_store=MEMORY;")        # speed
         con.execute("PRAGMA foreign_keys=OFF;")         # we don't rely on FK constraints here
         con.execute("PRAGMA cache_size=-20000;")        # ~20MB cache (negative = KB)
-        _CONN = con
-    return _CONN
+        state.conn = con
+    return state.conn
+
+
+@contextmanager
+def _using_conn() -> Iterator[sqlite3.Connection]:
+    """
+    Den aktive husstands forbindelse, holdt åben til blokken slutter: state og forbindelse
+    slås op under _LOCK, og en LRU-udsmidning af husstanden imens lukker den først bagefter.
+    """
+    with _LOCK:
+        state = _state()
+        state.users += 1
+        try:
+            con = _open(state)
+        except BaseException:
+            state.users -= 1
+            raise
+    try:
+        yield con
+    finally:
+        with _LOCK:
+            state.users -= 1
+            if state.retired and state.users == 0:
+                state._close_conn()
+
+
+def _conn() -> sqlite3.Connection:
+    # Not pinned: only for single-threaded use (tests, scripts); app code uses _using_conn()
+    with _LOCK:
+        return _open(_state())
+
+
+@contextmanager
+def _reading() -> Iterator[sqlite3.Connection]:
+    # fetch_* read from the in-memory replica when enabled; writes always use _using_conn()
+    if read_replica.enabled():
+        with read_replica.reading() as con:
+            yield con
+    else:
+        with _using_conn() as con:
+            yield con
+
+
+def reset_connection() -> None:
+    """
+    Luk den aktive husstands forbindelse og tøm dens caches.
+    Kaldes når DB-filen er blevet udskiftet (fx hentet fra Drive).
+    """
+    _STATES.pop(tenancy.db_path())
+
+
+def _commit(con: sqlite3.Connection, *tables: str) -> None:
+    # Bump AFTER commit: a reader that sees the new counter must also see the new rows.
+    con.commit()
+    counters = _state().write_counters
+    with _LOCK:
+        for t in tables:
+            counters[t] = counters.get(t, 0) + 1
+
+
+@contextmanager
+def unit_of_work(*tables: str) -> Iterator[sqlite3.Cursor]:
+    """
+    Én transaktion til flere trin: alle læsninger og skrivninger i blokken
+    committes samlet, eller rulles tilbage hvis noget fejler.
+    `tables` er de tabeller blokken ændrer (til read-cachen).
+
+        with unit_of_work("shopping_items", "pantry_items") as cur:
+            ...
+    """
+    # _LOCK: the connection is shared between Streamlit threads, one transaction at a time.
+    # writer_lock: the same across processes in multi-worker mode (no-op otherwise).
+    # IMMEDIATE: take the write lock up front so our reads can't go stale before the writes.
+    with _LOCK, _using_conn() as con, multiworker.writer_lock():
+        changes_before = con.total_changes
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+        except BaseException:
+            con.rollback()
+            raise
+        # A block that wrote nothing leaves the read cache valid
+        _commit(con, *(tables if con.total_changes != changes_before else ()))
+
+
+def _cache_token(con: sqlite3.Connection, tables: Tuple[str, ...]) -> tuple:
+    data_version = con.execute("PRAGMA data_version").fetchone()[0]
+    counters = _state().write_counters
+    with _LOCK:
+        return (data_version,) + tuple(counters.get(t, 0) for t in tables)
+
+
+def _cache_get(key: tuple) -> Optional[tuple]:
+    cache = _state().read_cache
+    with _LOCK:
+        return cache.get(key)
+
+
+def _cache_put(key: tuple, token: tuple, value) -> None:
+    cache = _state().read_cache
+    with _LOCK:
+        if len(cache) >= _READ_CACHE_MAX:
+            cache.clear()
+        cache[key] = (token, value)
+
+
+def _cached_value(key: tuple, tables: Tuple[str, ...], load: Callable[[sqlite3.Connection], object]):
+    """Return load(con), cached until one of `tables` changes. Only for immutable values."""
+    # _LOCK: never read (and cache) rows of another thread's open unit_of_work on the shared connection
+    with _LOCK, _using_conn() as con:
+        token = _cache_token(con, tables)
+        hit = _cache_get(key)
+        if hit is not None and hit[0] == token:
+            return hit[1]
+        with _reading() as con:
+            value = load(con)
+        _cache_put(key, token, value)
+        return value
+
+
+def _read_cached(*tables: str) -> Callable:
+    """
+    Cache a fetch_* function (returning a list) until one of `tables` changes.
+    Callers get a copy of the cached list.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            # As in _cached_value: token and read under _LOCK, so no uncommitted rows get cached
+            with _LOCK, _using_conn() as con:
+                token = _cache_token(con, tables)
+                hit = _cache_get(key)
+                if hit is not None and hit[0] == token:
+                    return list(hit[1])
+                rows = fn(*args, **kwargs)
+                _cache_put(key, token, rows)
+                return list(rows)
+        return wrapper
+    return decorator
 
 
 def _table_cols(con: sqlite3.Connection, table: str) -> set[str]:
-    # Cached (PRAGMA table_info is slow if called often)
-    if table in _COL_CACHE:
-        return _COL_CACHE[table]
+    # Cached (PRAGMA table_info is slow if called often). schema_version lives in the DB file,
+    # so a migration by another process (or a restored DB) also drops the cache.
+    state = _state()
+    schema_version = con.execute("PRAGMA schema_version").fetchone()[0]
+    if schema_version != state.schema_version:
+        state.col_cache.clear()
+        state.schema_version = schema_version
+    if table in state.col_cache:
+        return state.col_cache[table]
     rows = con.execute(f"PRAGMA table_info({table})").fetchall()
     cols = {r[1] for r in rows}
-    _COL_CACHE[table] = cols
+    state.col_cache[table] = cols
     return cols
 
 
 def _invalidate_cols(table: str) -> None:
-    _COL_CACHE.pop(table, None)
+    _state().col_cache.pop(table, None)
 
 
 def _key(text: str) -> str:
     return (text or "").strip().lower()
 
 
+# Dansk alfabetisk rækkefølge: ... x y z æ ø å.
+# Nøglerne gemmes i kolonner og sammenlignes binært (SQLite BINARY = UTF-8 bytes),
+# så æ/ø/å mappes til '{', '|', '}' (lige efter 'z'); ä/ö/ü sorteres som æ/ø/y,
+# og øvrige accenter fjernes (é -> e).
+_DA_SORT_MAP = str.maketrans({"æ": "{", "ä": "{", "ø": "|", "ö": "|", "å": "}", "ü": "y"})
+
+
+def _sort_key(text: str) -> str:
+    s = (text or "").strip().casefold().translate(_DA_SORT_MAP)
+    s = unicodedata.normalize("NFD", s)
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def _cat_sort(category: str) -> str:
+    # Ukategoriseret sidst; den rå kategori til sidst holder varianter (Mejeri/mejeri) adskilt
+    category = category or "Ukategoriseret"
+    rank = "1" if category == "Ukategoriseret" else "0"
+    return f"{rank}{_sort_key(category)}\x00{category}"
+
+
 def init_shopping_tables() -> None:
     """
-    shopping_items: uid, text, qty, category, is_standard, created_at
+    shopping_items: uid, text, qty, category, is_standard, created_at,
+                    gen_scope, gen_id, gen_qty, gen_sources (rows generated from the meal plan)
     pantry_items:   uid, text, qty, category, is_standard, created_at
-    standard_items: text_key, text, category, default_qty, created_at
+    standard_items: text_key, text, category, default_qty, created_at,
+                    min_qty, auto_rebuy (genkøbsregler, se _TRIGGERS)
 
-    recipes:        uid, name, is_done, created_at
+    recipes:        uid, name, is_done, created_at,
+                    ingredient_count (forskellige text_key i opskriften)
     recipe_items:   uid, recipe_uid, text, qty, category, is_standard, created_at
-
-    meal_plan:      uid, day_date, recipe_uid, title, servings, note, created_at
+    recipe_ingredients: text_key, recipe_uid, n (omvendt indeks: ingrediens -> opskrifter;
+                    n = antal recipe_items-rækker; vedligeholdes af triggere på recipe_items)
+
+    Sorteringsnøgler (dansk rækkefølge, beregnet ved skrivning, se _sort_key/_cat_sort):
+      cat_sort  på shopping_items, pantry_items, standard_items, recipe_items
+      sort_key  på standard_items, recipe_items, recipes
+    text_key (= _key(text)) på shopping_items, pantry_items, recipe_items.
+
+    is_standard på vare-tabellerne er en gammel kolonne og læses ikke længere:
+    status udledes af standard_items via text_key i views v_shopping_items,
+    v_pantry_items og v_recipe_items (se _VIEWS).
+
+    meal_plan:      uid, day_date, recipe_uid, title, servings, note, created_at,
+                    cooked_at (sat af cook_meal)
+                    (én række pr. dag: unikt indeks uq_meal_plan_day)
+
+    item_events:    id, text_key, text, category, kind ('buy'/'use'), qty, emptied, created_at
+                    (kun tilføjelser; købt fra listen / brugt hjemmefra)
+    item_stats:     text_key, text, category, buy_count, buy_qty, first_buy, last_buy, next_buy,
+                    use_count, use_qty, last_use, runouts (vedligeholdes af triggere på item_events)
     """
-    con = _conn()
+    # _LOCK: the DDL/migrations run on the shared connection, never inside another thread's transaction
+    with _LOCK, _using_conn() as con:
+        _init_tables(con)
+
+
+def _init_tables(con: sqlite3.Connection) -> None:
     cur = con.cursor()
+    changes_before = con.total_changes
 
     # Tables
     cur.execute("""
@@ -120,6 +370,47 @@ def init_shopping_tables() -> None:
     )
     """)
 
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_events (
+        id INTEGER PRIMARY KEY,
+        text_key TEXT NOT NULL,
+        text TEXT NOT NULL,
+        category TEXT NOT NULL DEFAULT 'Ukategoriseret',
+        kind TEXT NOT NULL,
+        qty REAL NOT NULL,
+        emptied INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT DEFAULT (datetime('now'))
+    )
+    """)
+
+    # Inverted index ingredient -> recipe; WITHOUT ROWID: the primary key is the whole row
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        text_key TEXT NOT NULL,
+        recipe_uid TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (text_key, recipe_uid)
+    ) WITHOUT ROWID
+    """)
+
+    # Times are julianday values (days as REAL) so intervals are plain subtraction
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_stats (
+        text_key TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        category TEXT NOT NULL DEFAULT 'Ukategoriseret',
+        buy_count INTEGER NOT NULL DEFAULT 0,
+        buy_qty REAL NOT NULL DEFAULT 0,
+        first_buy REAL,
+        last_buy REAL,
+        next_buy REAL,
+        use_count INTEGER NOT NULL DEFAULT 0,
+        use_qty REAL NOT NULL DEFAULT 0,
+        last_use REAL,
+        runouts INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
     con.commit()
     _invalidate_cols("shopping_items")
     _invalidate_cols("pantry_items")
@@ -137,6 +428,12 @@ def init_shopping_tables() -> None:
         cur.execute("ALTER TABLE shopping_items ADD COLUMN is_standard INTEGER NOT NULL DEFAULT 0")
         con.commit()
         _invalidate_cols("shopping_items")
+        cols_s = _table_cols(con, "shopping_items")
+    for col, decl in (("gen_scope", "TEXT"), ("gen_id", "TEXT"), ("gen_qty", "REAL"), ("gen_sources", "TEXT")):
+        if col not in cols_s:
+            cur.execute(f"ALTER TABLE shopping_items ADD COLUMN {col} {decl}")
+            con.commit()
+            _invalidate_cols("shopping_items")
 
     # Migrations pantry
     cols_p = _table_cols(con, "pantry_items")
@@ -147,7 +444,9 @@ def init_shopping_tables() -> None:
         cols_p = _table_cols(con, "pantry_items")
 
     if "location" in cols_p:
-        cur.execute("UPDATE pantry_items SET category = COALESCE(category, location, 'Ukategoriseret')")
+        cur.execute(
+            "UPDATE pantry_items SET category = COALESCE(category, location, 'Ukategoriseret') WHERE category IS NULL"
+        )
         con.commit()
 
     if "is_standard" not in cols_p:
@@ -155,12 +454,26 @@ def init_shopping_tables() -> None:
         con.commit()
         _invalidate_cols("pantry_items")
 
+    # Migrations standard_items (replenish rules)
+    _invalidate_cols("standard_items")
+    cols_std = _table_cols(con, "standard_items")
+    for col, decl in (("min_qty", "REAL"), ("auto_rebuy", "INTEGER NOT NULL DEFAULT 0")):
+        if col not in cols_std:
+            cur.execute(f"ALTER TABLE standard_items ADD COLUMN {col} {decl}")
+            con.commit()
+            _invalidate_cols("standard_items")
+
     # Migrations recipes
     cols_r = _table_cols(con, "recipes")
     if "is_done" not in cols_r:
         cur.execute("ALTER TABLE recipes ADD COLUMN is_done INTEGER NOT NULL DEFAULT 0")
         con.commit()
         _invalidate_cols("recipes")
+        cols_r = _table_cols(con, "recipes")
+    if "ingredient_count" not in cols_r:
+        cur.execute("ALTER TABLE recipes ADD COLUMN ingredient_count INTEGER NOT NULL DEFAULT 0")
+        con.commit()
+        _invalidate_cols("recipes")
 
     # Migrations meal_plan
     cols_mp = _table_cols(con, "meal_plan")
@@ -178,121 +491,598 @@ def init_shopping_tables() -> None:
         cur.execute("ALTER TABLE meal_plan ADD COLUMN title TEXT")
         con.commit()
         _invalidate_cols("meal_plan")
+        cols_mp = _table_cols(con, "meal_plan")
+    if "cooked_at" not in cols_mp:
+        cur.execute("ALTER TABLE meal_plan ADD COLUMN cooked_at TEXT")
+        con.commit()
+        _invalidate_cols("meal_plan")
 
     # Indexes (big speed-up on fetch/order/filter)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_shop_cat_created ON shopping_items(category, created_at)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_shop_text_lower ON shopping_items(LOWER(text))")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_pantry_cat_created ON pantry_items(category, created_at)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_pantry_text_lower ON pantry_items(LOWER(text))")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_items_ru_cat ON recipe_items(recipe_uid, category)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_items_text_lower ON recipe_items(recipe_uid, LOWER(text))")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_meal_plan_day ON meal_plan(day_date)")
+    # Each one backs a query in _HOT_QUERIES; src/query_plans.py checks that they are used.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shop_gen_scope_created ON shopping_items(gen_scope, created_at)")
+    _migrate_meal_plan_unique_day(con)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_item_events_key_created ON item_events(text_key, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_item_stats_next_buy ON item_stats(next_buy)")
+    # Replaced by the indexes above / the sort-key and text_key indexes (no query can use them any more)
+    for old_idx in (
+        "idx_shop_cat_created",
+        "idx_shop_gen_scope",
+        "idx_meal_plan_day",
+        "idx_shop_text_lower",
+        "idx_pantry_cat_created",
+        "idx_pantry_text_lower",
+        "idx_pantry_text_cat",
+        "idx_recipe_items_ru_cat",
+        "idx_recipe_items_text_lower",
+        "idx_recipe_items_text_cat",
+    ):
+        cur.execute(f"DROP INDEX IF EXISTS {old_idx}")
+    con.commit()
+
+    _migrate_derived_columns(con)
+    _migrate_recipe_ingredients(con)
+    _sync_schema_objects(con, "view", {name: f"CREATE VIEW {name} AS{body}" for name, body in _VIEWS.items()})
+    _sync_schema_objects(con, "trigger", _TRIGGERS)
+    # init runs on every page load: only drop cached reads if a migration actually rewrote rows
+    if con.total_changes != changes_before:
+        _commit(con, "shopping_items", "pantry_items", "standard_items", "recipes", "recipe_items", "meal_plan")
+
+
+def _migrate_meal_plan_unique_day(con: sqlite3.Connection) -> None:
+    """
+    Én række pr. dag (set_meal_for_date er en upsert på day_date).
+    Ældre DB'er kan have dubletter fra samtidige gem: den nyeste række beholdes
+    (det er også den menuen viste).
+    """
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_meal_plan_day'"
+    ).fetchone()
+    if exists:
+        return
+    # One transaction: no other writer can add a duplicate between the cleanup and the index
+    with unit_of_work("meal_plan") as cur:
+        cur.execute("DELETE FROM meal_plan WHERE rowid NOT IN (SELECT MAX(rowid) FROM meal_plan GROUP BY day_date)")
+        cur.execute("CREATE UNIQUE INDEX uq_meal_plan_day ON meal_plan(day_date)")
+
+
+def _migrate_recipe_ingredients(con: sqlite3.Connection) -> None:
+    """
+    Byg recipe_ingredients og recipes.ingredient_count ud fra recipe_items, første gang
+    (før triggerne fandtes). Triggerne oprettes i samme transaktion, så ingen skrivning
+    kan falde mellem genopbygningen og triggerne.
+    """
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_recipe_items_ingredient_insert'"
+    ).fetchone()
+    if exists:
+        return
+    with unit_of_work("recipe_ingredients", "recipes") as cur:
+        cur.execute("DELETE FROM recipe_ingredients")
+        cur.execute(
+            """
+            INSERT INTO recipe_ingredients (text_key, recipe_uid, n)
+            SELECT text_key, recipe_uid, COUNT(*)
+            FROM recipe_items
+            WHERE text_key <> ''
+            GROUP BY text_key, recipe_uid
+            """
+        )
+        cur.execute(
+            "UPDATE recipes SET ingredient_count = (SELECT COUNT(*) FROM recipe_ingredients ri WHERE ri.recipe_uid = recipes.uid)"
+        )
+        for name in _RECIPE_INGREDIENT_TRIGGERS:
+            cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cur.execute(_TRIGGERS[name])
+
+
+# Columns computed in Python at write time.
+# table -> ((column, source column, function), ...)
+_DERIVED_COLUMNS = {
+    "shopping_items": (("cat_sort", "category", _cat_sort), ("text_key", "text", _key)),
+    "pantry_items": (("cat_sort", "category", _cat_sort), ("text_key", "text", _key)),
+    "standard_items": (("cat_sort", "category", _cat_sort), ("sort_key", "text", _sort_key)),
+    "recipe_items": (
+        ("cat_sort", "category", _cat_sort),
+        ("sort_key", "text", _sort_key),
+        ("text_key", "text", _key),
+    ),
+    "recipes": (("sort_key", "name", _sort_key),),
+}
+
+
+def _migrate_derived_columns(con: sqlite3.Connection) -> None:
+    cur = con.cursor()
+    for table, specs in _DERIVED_COLUMNS.items():
+        cols = _table_cols(con, table)
+        for col, _src, _fn in specs:
+            if col not in cols:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
+                con.commit()
+                _invalidate_cols(table)
+
+        # Backfill rows written before the columns existed (or by other tools)
+        for col, src, fn in specs:
+            rows = cur.execute(f"SELECT rowid, {src} FROM {table} WHERE {col} IS NULL").fetchall()
+            if rows:
+                cur.executemany(
+                    f"UPDATE {table} SET {col}=? WHERE rowid=?",
+                    [(fn(v), rowid) for rowid, v in rows],
+                )
+                con.commit()
+
+    # Ordered reads walk these indexes instead of sorting in a temp B-tree
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shop_catsort_created ON shopping_items(cat_sort, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pantry_catsort_created ON pantry_items(cat_sort, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_std_catsort_sort ON standard_items(cat_sort, sort_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_done_sort ON recipes(is_done, sort_key)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipe_items_ru_sort ON recipe_items(recipe_uid, cat_sort, sort_key)"
+    )
+    # Merge lookups (same text + category -> one row) and the pantry netting in the meal-plan query;
+    # idx_shop_text_key + idx_pantry_key_cat also serve the replenish triggers
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shop_text_key ON shopping_items(text_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pantry_key_cat ON pantry_items(text_key, category)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipe_items_key_cat ON recipe_items(recipe_uid, text_key, category)"
+    )
+    con.commit()
+
+
+# is_standard is derived: a row is a standard item while standard_items has its text_key.
+# The LEFT JOIN hits the standard_items primary key, and SQLite drops it entirely
+# when a query does not select is_standard.
+_VIEWS = {
+    "v_shopping_items": """
+    SELECT i.uid, i.text, i.text_key, i.qty, i.category, i.cat_sort, i.created_at,
+           (s.text_key IS NOT NULL) AS is_standard
+    FROM shopping_items i
+    LEFT JOIN standard_items s ON s.text_key = i.text_key
+""",
+    "v_pantry_items": """
+    SELECT i.uid, i.text, i.text_key, i.qty, i.category, i.cat_sort, i.created_at,
+           (s.text_key IS NOT NULL) AS is_standard
+    FROM pantry_items i
+    LEFT JOIN standard_items s ON s.text_key = i.text_key
+""",
+    "v_recipe_items": """
+    SELECT i.uid, i.recipe_uid, i.text, i.text_key, i.qty, i.category, i.cat_sort, i.sort_key, i.created_at,
+           (s.text_key IS NOT NULL) AS is_standard
+    FROM recipe_items i
+    LEFT JOIN standard_items s ON s.text_key = i.text_key
+""",
+}
+
+
+# Replenish rules on standard_items:
+#   min_qty     put the item on the shopping list when the total at home drops below it
+#   auto_rebuy  put it on the list when it is used up
+# Only if the item is not on the list already; it is added with the standard's default qty.
+# {key} is the text_key to check: OLD.text_key in the triggers, :key from Python.
+# The uid has str(uuid.uuid4())'s format (version 4, variant 10xx), like the rows added from Python.
+_SQL_UUID4 = (
+    "lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || substr(lower(hex(randomblob(2))), 2)"
+    " || '-' || substr('89ab', 1 + (random() & 3), 1) || substr(lower(hex(randomblob(2))), 2)"
+    " || '-' || lower(hex(randomblob(6)))"
+)
+_REPLENISH_SQL = """
+    INSERT INTO shopping_items (uid, text, text_key, qty, category, cat_sort)
+    SELECT """ + _SQL_UUID4 + """, s.text, s.text_key, s.default_qty, s.category, s.cat_sort
+    FROM standard_items s,
+         (SELECT COALESCE(SUM(qty), 0) AS qty FROM pantry_items WHERE text_key = {key}) AS home
+    WHERE s.text_key = {key}
+      AND ((s.min_qty IS NOT NULL AND home.qty < s.min_qty) OR (s.auto_rebuy = 1 AND home.qty <= 0))
+      AND NOT EXISTS (SELECT 1 FROM shopping_items x WHERE x.text_key = s.text_key)
+"""
+
+# {row} is NEW or OLD. ingredient_count changes when a key appears in / disappears from a recipe.
+_INGREDIENT_ADD_SQL = """
+        INSERT INTO recipe_ingredients (text_key, recipe_uid, n)
+        SELECT {row}.text_key, {row}.recipe_uid, 1 WHERE {row}.text_key <> ''
+        ON CONFLICT(text_key, recipe_uid) DO UPDATE SET n = n + 1;
+        UPDATE recipes SET ingredient_count = ingredient_count + 1
+        WHERE uid = {row}.recipe_uid
+          AND (SELECT n FROM recipe_ingredients WHERE text_key = {row}.text_key AND recipe_uid = {row}.recipe_uid) = 1;
+"""
+_INGREDIENT_REMOVE_SQL = """
+        UPDATE recipes SET ingredient_count = ingredient_count - 1
+        WHERE uid = {row}.recipe_uid
+          AND (SELECT n FROM recipe_ingredients WHERE text_key = {row}.text_key AND recipe_uid = {row}.recipe_uid) = 1;
+        UPDATE recipe_ingredients SET n = n - 1 WHERE text_key = {row}.text_key AND recipe_uid = {row}.recipe_uid;
+        DELETE FROM recipe_ingredients WHERE text_key = {row}.text_key AND recipe_uid = {row}.recipe_uid AND n <= 0;
+"""
+
+# The triggers run inside the writing transaction, so a pantry write that falls below a rule
+# commits together with its shopping row. Any unit_of_work that lowers or deletes pantry rows
+# must therefore list shopping_items too (read cache).
+_TRIGGERS = {
+    "trg_pantry_replenish_update": f"""CREATE TRIGGER trg_pantry_replenish_update
+    AFTER UPDATE OF qty ON pantry_items
+    WHEN NEW.qty < OLD.qty
+    BEGIN
+        {_REPLENISH_SQL.format(key="OLD.text_key").strip()};
+    END""",
+    "trg_pantry_replenish_delete": f"""CREATE TRIGGER trg_pantry_replenish_delete
+    AFTER DELETE ON pantry_items
+    BEGIN
+        {_REPLENISH_SQL.format(key="OLD.text_key").strip()};
+    END""",
+    # Purchase/consumption statistics, updated per event instead of re-aggregating the history.
+    # In DO UPDATE the bare column names are the row before this event, so buy_count is the
+    # number of intervals: the mean interval telescopes to (last - first) / intervals.
+    # A purchase less than a day after the counted one (ticked off twice, split over two rows)
+    # only adds its quantity: it would otherwise add a ~0 day interval and pull next_buy forward.
+    "trg_item_events_buy": """CREATE TRIGGER trg_item_events_buy
+    AFTER INSERT ON item_events
+    WHEN NEW.kind = 'buy'
+    BEGIN
+        INSERT INTO item_stats (text_key, text, category, buy_count, buy_qty, first_buy, last_buy)
+        VALUES (NEW.text_key, NEW.text, NEW.category, 1, NEW.qty, julianday(NEW.created_at), julianday(NEW.created_at))
+        ON CONFLICT(text_key) DO UPDATE SET
+            text=excluded.text,
+            category=excluded.category,
+            buy_qty=buy_qty + excluded.buy_qty,
+            buy_count=CASE WHEN excluded.last_buy - last_buy < 1 THEN buy_count ELSE buy_count + 1 END,
+            first_buy=COALESCE(first_buy, excluded.first_buy),
+            next_buy=CASE WHEN excluded.last_buy - last_buy < 1 THEN next_buy
+                ELSE excluded.last_buy + (excluded.last_buy - COALESCE(first_buy, excluded.first_buy)) / NULLIF(buy_count, 0) END,
+            last_buy=CASE WHEN excluded.last_buy - last_buy < 1 THEN last_buy ELSE excluded.last_buy END;
+    END""",
+    "trg_item_events_use": """CREATE TRIGGER trg_item_events_use
+    AFTER INSERT ON item_events
+    WHEN NEW.kind = 'use'
+    BEGIN
+        INSERT INTO item_stats (text_key, text, category, use_count, use_qty, last_use, runouts)
+        VALUES (NEW.text_key, NEW.text, NEW.category, 1, NEW.qty, julianday(NEW.created_at), NEW.emptied)
+        ON CONFLICT(text_key) DO UPDATE SET
+            use_count=use_count + 1,
+            use_qty=use_qty + excluded.use_qty,
+            last_use=excluded.last_use,
+            runouts=runouts + excluded.runouts;
+    END""",
+    # Inverted index recipe_ingredients (text_key -> recipe_uid) and recipes.ingredient_count.
+    # Every write path to recipe_items (_recipe_merge, delete_recipe_item, delete_recipe, ...)
+    # goes through these, so the index cannot drift from the items.
+    "trg_recipe_items_ingredient_insert": f"""CREATE TRIGGER trg_recipe_items_ingredient_insert
+    AFTER INSERT ON recipe_items
+    BEGIN
+        {_INGREDIENT_ADD_SQL.format(row="NEW").strip()}
+    END""",
+    "trg_recipe_items_ingredient_delete": f"""CREATE TRIGGER trg_recipe_items_ingredient_delete
+    AFTER DELETE ON recipe_items
+    BEGIN
+        {_INGREDIENT_REMOVE_SQL.format(row="OLD").strip()}
+    END""",
+    "trg_recipe_items_ingredient_update": f"""CREATE TRIGGER trg_recipe_items_ingredient_update
+    AFTER UPDATE OF text_key, recipe_uid ON recipe_items
+    BEGIN
+        {_INGREDIENT_REMOVE_SQL.format(row="OLD").strip()}
+        {_INGREDIENT_ADD_SQL.format(row="NEW").strip()}
+    END""",
+    "trg_item_events_append_only": """CREATE TRIGGER trg_item_events_append_only
+    BEFORE UPDATE ON item_events
+    BEGIN
+        SELECT RAISE(ABORT, 'item_events is append-only');
+    END""",
+}
+
+
+_RECIPE_INGREDIENT_TRIGGERS = (
+    "trg_recipe_items_ingredient_insert",
+    "trg_recipe_items_ingredient_delete",
+    "trg_recipe_items_ingredient_update",
+)
+
+
+def _sync_schema_objects(con: sqlite3.Connection, kind: str, objects: Dict[str, str]) -> None:
+    # Recreate a view/trigger only when its definition changed (init runs on every page load)
+    existing = dict(con.execute("SELECT name, sql FROM sqlite_master WHERE type=?", (kind,)).fetchall())
+    for name, sql in objects.items():
+        if existing.get(name) != sql:
+            con.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+            con.execute(sql)
     con.commit()
 
 
 # -----------------------------
 # Standards
 # -----------------------------
-def upsert_standard(text: str, category: str, default_qty: float = 1.0) -> None:
+def _upsert_standard(cur: sqlite3.Cursor, text: str, category: str, default_qty: float = 1.0) -> None:
     text = (text or "").strip()
     if not text:
         return
     category = (category or "Ukategoriseret").strip() or "Ukategoriseret"
     default_qty = float(default_qty) if default_qty and default_qty > 0 else 1.0
-
-    con = _conn()
-    con.execute(
+    cur.execute(
         """
-        INSERT INTO standard_items (text_key, text, category, default_qty)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO standard_items (text_key, text, category, default_qty, cat_sort, sort_key)
+        VALUES (?, ?, ?, ?, ?, ?)
         ON CONFLICT(text_key) DO UPDATE SET
           text=excluded.text,
           category=excluded.category,
-          default_qty=excluded.default_qty
+          default_qty=excluded.default_qty,
+          cat_sort=excluded.cat_sort,
+          sort_key=excluded.sort_key
         """,
-        (_key(text), text, category, default_qty),
+        (_key(text), text, category, default_qty, _cat_sort(category), _sort_key(text)),
     )
-    con.commit()
+
+
+def upsert_standard(text: str, category: str, default_qty: float = 1.0) -> None:
+    if not (text or "").strip():
+        return
+    with unit_of_work("standard_items") as cur:
+        _upsert_standard(cur, text, category, default_qty)
+
+
+def _legacy_is_standard(
+    cur: sqlite3.Cursor, fn: str, is_standard: Optional[int], text: str, qty: float, category: str
+) -> None:
+    # Before is_standard was derived from standard_items, callers passed it per row.
+    # A true value still makes the item a standard (an existing standard is left as it is).
+    if is_standard is None:
+        return
+    warnings.warn(
+        f"{fn}(is_standard=...) er forældet: brug upsert_standard()/set_shopping_standard()",
+        DeprecationWarning,
+        stacklevel=3,
+    )
+    if is_standard and not cur.execute("SELECT 1 FROM standard_items WHERE text_key=?", (_key(text),)).fetchone():
+        _upsert_standard(cur, text, category, qty)
 
 
 def delete_standard(text: str) -> None:
     k = _key(text)
     if not k:
         return
-    con = _conn()
-    cur = con.cursor()
-    cur.execute("BEGIN")
-    cur.execute("DELETE FROM standard_items WHERE text_key=?", (k,))
-    cur.execute("UPDATE shopping_items SET is_standard=0 WHERE lower(text)=?", (k,))
-    cur.execute("UPDATE pantry_items SET is_standard=0 WHERE lower(text)=?", (k,))
-    cur.execute("UPDATE recipe_items SET is_standard=0 WHERE lower(text)=?", (k,))
-    con.commit()
+    # The ⭐ on shopping/pantry/recipe rows follows automatically (views v_*)
+    with unit_of_work("standard_items") as cur:
+        cur.execute("DELETE FROM standard_items WHERE text_key=?", (k,))
 
 
-def fetch_standards() -> List[Tuple[str, str, float]]:
-    con = _conn()
-    rows = con.execute(
-        """
-        SELECT text, COALESCE(category,'Ukategoriseret'), COALESCE(default_qty,1)
-        FROM standard_items
-        ORDER BY COALESCE(category,'Ukategoriseret') COLLATE NOCASE, text COLLATE NOCASE
-        """
-    ).fetchall()
+def _set_standard(cur: sqlite3.Cursor, table: str, uid: str, is_standard: int) -> Optional[Tuple[str, str, float]]:
+    row = cur.execute(f"SELECT text, category, qty FROM {table} WHERE uid=?", (uid,)).fetchone()
+    if not row:
+        return None
+    text, category, qty = row
+    if is_standard:
+        _upsert_standard(cur, text, category, qty)
+    else:
+        cur.execute("DELETE FROM standard_items WHERE text_key=?", (_key(text),))
+    return (text, category, float(qty))
+
+
+def set_standard_rule(text: str, min_qty: Optional[float], auto_rebuy: int) -> None:
+    """
+    Genkøbsregel for en standardvare (se _REPLENISH_SQL):
+      min_qty     sæt på indkøbslisten når der er mindre end dette hjemme (None/0 = ingen)
+      auto_rebuy  sæt på indkøbslisten når varen er brugt op
+    Reglen tjekkes med det samme, og derefter ved hver ændring af varen derhjemme.
+    """
+    k = _key(text)
+    if not k:
+        return
+    min_qty = float(min_qty) if min_qty and min_qty > 0 else None
+    with unit_of_work("standard_items", "shopping_items") as cur:
+        cur.execute(
+            "UPDATE standard_items SET min_qty=?, auto_rebuy=? WHERE text_key=?",
+            (min_qty, 1 if auto_rebuy else 0, k),
+        )
+        cur.execute(_REPLENISH_SQL.format(key=":key"), {"key": k})
+
+
+_SQL_STANDARDS = """
+    SELECT text, COALESCE(category,'Ukategoriseret'), COALESCE(default_qty,1)
+    FROM standard_items
+    ORDER BY cat_sort, sort_key
+"""
+
+
+def _q_standards(con: sqlite3.Connection) -> List[Tuple[str, str, float]]:
+    rows = con.execute(_SQL_STANDARDS).fetchall()
     return [(r[0], r[1] or "Ukategoriseret", float(r[2])) for r in rows]
 
 
+@_read_cached("standard_items")
+def fetch_standards() -> List[Tuple[str, str, float]]:
+    with _reading() as con:
+        return _q_standards(con)
+
+
+# Status of a standard item (StandardStatus.status)
+STD_HOME_AND_LISTED = "home_and_listed"
+STD_HOME = "home"
+STD_LISTED = "listed"
+STD_MISSING = "missing"
+
+
+class StandardStatus(NamedTuple):
+    text: str
+    category: str
+    default_qty: float
+    text_key: str
+    pantry_qty: float       # 0 if not at home
+    shopping_qty: float     # 0 if not on the list
+    status: str             # STD_*
+    min_qty: Optional[float]
+    auto_rebuy: int
+
+
+# Each standard with its pantry and shopping-list quantity, in display order.
+# home/listed only aggregate rows of standard items (text_key IN ..., indexed),
+# then join onto standard_items in idx_std_catsort_sort order.
+_SQL_STANDARDS_DASHBOARD = """
+    WITH home AS (
+        SELECT text_key AS tk, SUM(qty) AS qty
+        FROM pantry_items
+        WHERE text_key IN (SELECT text_key FROM standard_items)
+        GROUP BY text_key
+    ),
+    listed AS (
+        SELECT text_key AS tk, SUM(qty) AS qty
+        FROM shopping_items
+        WHERE text_key IN (SELECT text_key FROM standard_items)
+        GROUP BY text_key
+    )
+    SELECT st.text, COALESCE(st.category,'Ukategoriseret'), COALESCE(st.default_qty,1), st.text_key,
+           COALESCE(h.qty, 0), COALESCE(l.qty, 0),
+           CASE
+               WHEN h.tk IS NOT NULL AND l.tk IS NOT NULL THEN 'home_and_listed'
+               WHEN h.tk IS NOT NULL THEN 'home'
+               WHEN l.tk IS NOT NULL THEN 'listed'
+               ELSE 'missing'
+           END,
+           st.min_qty, COALESCE(st.auto_rebuy, 0)
+    FROM standard_items st
+    LEFT JOIN home h ON h.tk = st.text_key
+    LEFT JOIN listed l ON l.tk = st.text_key
+    ORDER BY st.cat_sort, st.sort_key
+"""
+
+
+def _q_standards_dashboard(con: sqlite3.Connection) -> List[StandardStatus]:
+    rows = con.execute(_SQL_STANDARDS_DASHBOARD).fetchall()
+    return [
+        StandardStatus(r[0], r[1] or "Ukategoriseret", float(r[2]), r[3], float(r[4]), float(r[5]), r[6], r[7], int(r[8]))
+        for r in rows
+    ]
+
+
+@_read_cached("standard_items", "pantry_items", "shopping_items")
+def fetch_standards_dashboard() -> List[StandardStatus]:
+    """Standardvarer med mængde hjemme, mængde på listen og status (STD_*), i visningsrækkefølge."""
+    with _reading() as con:
+        return _q_standards_dashboard(con)
+
+
+def add_missing_standards() -> int:
+    """Sæt alle manglende standardvarer (hverken hjemme eller på listen) på listen. Returnerer antal."""
+    with unit_of_work("shopping_items") as cur:
+        # Same transaction as the inserts: nothing can be added/bought in between
+        missing = [row for row in _q_standards_dashboard(cur.connection) if row.status == STD_MISSING]
+        for row in missing:
+            _add_shopping(cur, row.text, row.default_qty, row.category)
+    return len(missing)
+
+
 # -----------------------------
 # Fetch lists
 # -----------------------------
+_SQL_SHOPPING = """
+    SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), is_standard
+    FROM v_shopping_items
+    ORDER BY cat_sort, created_at ASC
+"""
+
+# category is NOT NULL and the init migration copies the legacy location column into it,
+# so pantry reads no longer need COALESCE(category, location, ...) (which blocked the index)
+_SQL_PANTRY = """
+    SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), is_standard
+    FROM v_pantry_items
+    ORDER BY cat_sort, created_at ASC
+"""
+
+
+def _q_shopping(con: sqlite3.Connection) -> List[Tuple[str, str, float, str, int]]:
+    rows = con.execute(_SQL_SHOPPING).fetchall()
+    return [(r[0], r[1], float(r[2]), r[3] or "Ukategoriseret", int(r[4] or 0)) for r in rows]
+
+
+@_read_cached("shopping_items", "standard_items")
 def fetch_shopping() -> List[Tuple[str, str, float, str, int]]:
-    con = _conn()
-    rows = con.execute(
-        """
-        SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0)
-        FROM shopping_items
-        ORDER BY COALESCE(category,'Ukategoriseret') COLLATE NOCASE, created_at ASC
-        """
-    ).fetchall()
+    with _reading() as con:
+        return _q_shopping(con)
+
+
+def _q_pantry(con: sqlite3.Connection) -> List[Tuple[str, str, float, str, int]]:
+    rows = con.execute(_SQL_PANTRY).fetchall()
     return [(r[0], r[1], float(r[2]), r[3] or "Ukategoriseret", int(r[4] or 0)) for r in rows]
 
 
+@_read_cached("pantry_items", "standard_items")
 def fetch_pantry() -> List[Tuple[str, str, float, str, int]]:
-    con = _conn()
-    cols = _table_cols(con, "pantry_items")
-    if "location" in cols:
-        q = """
-            SELECT uid, text, qty,
-                   COALESCE(category, location, 'Ukategoriseret') as cat,
-                   COALESCE(is_standard,0)
-            FROM pantry_items
-            ORDER BY cat COLLATE NOCASE, created_at ASC
-        """
-    else:
-        q = """
-            SELECT uid, text, qty,
-                   COALESCE(category, 'Ukategoriseret') as cat,
-                   COALESCE(is_standard,0)
-            FROM pantry_items
-            ORDER BY cat COLLATE NOCASE, created_at ASC
-        """
-    rows = con.execute(q).fetchall()
-    return [(r[0], r[1], float(r[2]), r[3] or "Ukategoriseret", int(r[4] or 0)) for r in rows]
+    with _reading() as con:
+        return _q_pantry(con)
+
+
+# -----------------------------
+# Grouped lists (category order as shown on the page)
+# -----------------------------
+class ItemRow(NamedTuple):
+    """Tuple-backed row (no per-row dict); unpacks like the plain fetch tuples."""
+    uid: str
+    text: str
+    qty: float
+    category: str
+    is_standard: int
+
+
+class CategoryGroups(NamedTuple):
+    """
+    rows:   all rows in display order
+    groups: ((category, rows), ...) - categories alphabetically, Ukategoriseret last
+    by_uid / by_key: read-only lookups (uid -> row, normalized text -> first row)
+    """
+    rows: Tuple[ItemRow, ...]
+    groups: Tuple[Tuple[str, Tuple[ItemRow, ...]], ...]
+    by_uid: Mapping[str, ItemRow]
+    by_key: Mapping[str, ItemRow]
+
+
+# Columns are NOT NULL with defaults, so rows come back typed -> no per-field conversion.
+# cat_sort is unique per category string, so each category is one contiguous run.
+_GROUPED_SQL = """
+    SELECT uid, text, qty, category, is_standard
+    FROM v_{table}
+    ORDER BY cat_sort, created_at ASC
+"""
+
+
+def _item_row(_cursor: sqlite3.Cursor, row: tuple) -> ItemRow:
+    return ItemRow._make(row)
+
+
+def _q_grouped(con: sqlite3.Connection, table: str) -> CategoryGroups:
+    cur = con.cursor()
+    cur.row_factory = _item_row
+    rows = tuple(cur.execute(_GROUPED_SQL.format(table=table)))
+
+    groups = tuple(
+        (cat, tuple(group))
+        for cat, group in itertools.groupby(rows, key=lambda r: r.category)
+    )
+    by_key: Dict[str, ItemRow] = {}
+    for r in rows:
+        by_key.setdefault(_key(r.text), r)
+    return CategoryGroups(
+        rows=rows,
+        groups=groups,
+        by_uid=MappingProxyType({r.uid: r for r in rows}),
+        by_key=MappingProxyType(by_key),
+    )
+
+
+def fetch_shopping_grouped() -> CategoryGroups:
+    return _cached_value(
+        ("fetch_shopping_grouped",),
+        ("shopping_items", "standard_items"),
+        lambda con: _q_grouped(con, "shopping_items"),
+    )
+
+
+def fetch_pantry_grouped() -> CategoryGroups:
+    return _cached_value(
+        ("fetch_pantry_grouped",),
+        ("pantry_items", "standard_items"),
+        lambda con: _q_grouped(con, "pantry_items"),
+    )
 
 
 def get_pantry_item(uid: str) -> Optional[Tuple[str, float, str, int]]:
-    con = _conn()
-    cols = _table_cols(con, "pantry_items")
-    if "location" in cols:
-        q = """
-        SELECT text, qty, COALESCE(category, location, 'Ukategoriseret'), COALESCE(is_standard,0)
-        FROM pantry_items WHERE uid=?
-        """
-    else:
-        q = """
-        SELECT text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0)
-        FROM pantry_items WHERE uid=?
-        """
-    row = con.execute(q, (uid,)).fetchone()
+    with _LOCK, _using_conn() as con:
+        row = con.execute(
+            "SELECT text, qty, COALESCE(category,'Ukategoriseret'), is_standard FROM v_pantry_items WHERE uid=?",
+            (uid,),
+        ).fetchone()
     if not row:
         return None
     return (row[0], float(row[1]), row[2] or "Ukategoriseret", int(row[3] or 0))
@@ -301,63 +1091,138 @@ def get_pantry_item(uid: str) -> Optional[Tuple[str, float, str, int]]:
 # -----------------------------
 # Shopping operations
 # -----------------------------
-def add_shopping(text: str, qty: float, category: str, is_standard: int = 0) -> None:
+def _add_shopping(cur: sqlite3.Cursor, text: str, qty: float, category: str) -> None:
     text = (text or "").strip()
     if not text:
         return
     qty = float(qty) if qty and qty > 0 else 1.0
     category = (category or "Ukategoriseret").strip() or "Ukategoriseret"
-    is_standard = 1 if is_standard else 0
+    cur.execute(
+        "INSERT INTO shopping_items (uid, text, text_key, qty, category, cat_sort) VALUES (?, ?, ?, ?, ?, ?)",
+        (str(uuid.uuid4()), text, _key(text), qty, category, _cat_sort(category)),
+    )
+
 
-    con = _conn()
-    con.execute(
-        "INSERT INTO shopping_items (uid, text, qty, category, is_standard) VALUES (?, ?, ?, ?, ?)",
-        (str(uuid.uuid4()), text, qty, category, is_standard),
+def add_shopping(text: str, qty: float, category: str, is_standard: Optional[int] = None) -> None:
+    """is_standard: forældet (se _legacy_is_standard); standard-status kommer fra standard_items."""
+    if not (text or "").strip():
+        return
+    tables = ("shopping_items",) if is_standard is None else ("shopping_items", "standard_items")
+    with unit_of_work(*tables) as cur:
+        _add_shopping(cur, text, qty, category)
+        _legacy_is_standard(cur, "add_shopping", is_standard, text, qty, category)
+
+
+# -----------------------------
+# Purchase history
+# -----------------------------
+EVENT_BUY = "buy"
+EVENT_USE = "use"
+
+# Tables a unit_of_work that logs an event writes (trigger-maintained stats included)
+_HISTORY_TABLES = ("item_events", "item_stats")
+
+
+def _log_event(cur: sqlite3.Cursor, kind: str, text: str, qty: float, category: str, emptied: int = 0) -> None:
+    cur.execute(
+        "INSERT INTO item_events (text_key, text, category, kind, qty, emptied) VALUES (?, ?, ?, ?, ?, ?)",
+        (_key(text), text, category, kind, float(qty), 1 if emptied else 0),
     )
-    con.commit()
+
+
+class PurchaseSuggestion(NamedTuple):
+    text: str
+    category: str
+    text_key: str
+    usual_qty: float        # mean qty per purchase
+    interval_days: float    # mean days between purchases
+    due_in_days: float      # < 0: overdue
+    home_qty: float
+    runouts: int            # times it was used up
+
+
+# Items whose next expected purchase (item_stats.next_buy, idx_item_stats_next_buy) falls
+# before the horizon and that are not on the list already. Reads only the summary table.
+_SQL_PURCHASE_SUGGESTIONS = """
+    SELECT s.text, s.category, s.text_key,
+           s.buy_qty / s.buy_count,
+           (s.last_buy - s.first_buy) / (s.buy_count - 1),
+           s.next_buy - julianday(:today),
+           (SELECT COALESCE(SUM(p.qty), 0) FROM pantry_items p WHERE p.text_key = s.text_key),
+           s.runouts
+    FROM item_stats s
+    WHERE s.next_buy <= julianday(:today) + :days
+      AND NOT EXISTS (SELECT 1 FROM shopping_items x WHERE x.text_key = s.text_key)
+    ORDER BY s.next_buy
+    LIMIT :limit
+"""
+
+
+@_read_cached("item_stats", "shopping_items", "pantry_items")
+def fetch_purchase_suggestions(today: str, days_ahead: int = 7, limit: int = 10) -> List[PurchaseSuggestion]:
+    """
+    "Skal nok købes snart": varer der plejer at blive købt og forventes købt inden
+    `today` + days_ahead (ud fra det gennemsnitlige interval mellem køb).
+    """
+    with _reading() as con:
+        return _q_purchase_suggestions(con, today, days_ahead, limit)
+
+
+def _q_purchase_suggestions(
+    con: sqlite3.Connection, today: str, days_ahead: int = 7, limit: int = 10
+) -> List[PurchaseSuggestion]:
+    rows = con.execute(_SQL_PURCHASE_SUGGESTIONS, {"today": today, "days": days_ahead, "limit": limit}).fetchall()
+    return [
+        PurchaseSuggestion(r[0], r[1], r[2], float(r[3]), float(r[4]), float(r[5]), float(r[6]), int(r[7]))
+        for r in rows
+    ]
 
 
 def delete_shopping(uid: str) -> None:
-    con = _conn()
-    con.execute("DELETE FROM shopping_items WHERE uid = ?", (uid,))
-    con.commit()
+    with unit_of_work("shopping_items") as cur:
+        cur.execute("DELETE FROM shopping_items WHERE uid = ?", (uid,))
 
 
-def pop_shopping(uid: str) -> Optional[Tuple[str, float, str, int]]:
-    con = _conn()
-    cur = con.cursor()
+def _pop_shopping(cur: sqlite3.Cursor, uid: str) -> Optional[Tuple[str, float, str, int]]:
     row = cur.execute(
-        "SELECT text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0) FROM shopping_items WHERE uid=?",
+        "SELECT text, qty, COALESCE(category,'Ukategoriseret'), is_standard FROM v_shopping_items WHERE uid=?",
         (uid,),
     ).fetchone()
     if not row:
         return None
-    cur.execute("BEGIN")
     cur.execute("DELETE FROM shopping_items WHERE uid=?", (uid,))
-    con.commit()
     text, qty, category, is_std = row
+    _log_event(cur, EVENT_BUY, text, qty, category or "Ukategoriseret")
     return (text, float(qty), category or "Ukategoriseret", int(is_std or 0))
 
 
+def pop_shopping(uid: str) -> Optional[Tuple[str, float, str, int]]:
+    """Fjern en købt vare fra listen (logges som køb). Returnerer (text, qty, category, is_standard)."""
+    with unit_of_work("shopping_items", *_HISTORY_TABLES) as cur:
+        return _pop_shopping(cur, uid)
+
+
 def set_shopping_standard(uid: str, is_standard: int) -> Optional[Tuple[str, str, float]]:
-    con = _conn()
-    cur = con.cursor()
-    row = cur.execute(
-        "SELECT text, COALESCE(category,'Ukategoriseret'), qty FROM shopping_items WHERE uid=?",
-        (uid,),
-    ).fetchone()
-    if not row:
-        return None
-    text, category, qty = row
-    cur.execute("UPDATE shopping_items SET is_standard=? WHERE uid=?", (1 if is_standard else 0, uid))
-    con.commit()
-    return (text, category, float(qty))
+    """
+    Gør varens tekst til standardvare (med rækkens kategori og mængde) eller fjern den.
+    Returnerer (text, category, qty) eller None hvis varen ikke findes.
+    """
+    with unit_of_work("standard_items") as cur:
+        return _set_standard(cur, "shopping_items", uid, is_standard)
 
 
 # -----------------------------
 # Pantry operations
 # -----------------------------
-def pantry_add_or_merge(text: str, qty: float, category: str, is_standard: int = 0) -> None:
+# Same text + category -> merge into one row (idx_pantry_key_cat)
+_SQL_PANTRY_MATCH = """
+    SELECT uid, qty
+    FROM pantry_items
+    WHERE text_key=? AND category=?
+"""
+
+
+def _pantry_merge(cur: sqlite3.Cursor, text: str, qty: float, category: str) -> None:
     text = (text or "").strip()
     if not text:
         return
@@ -365,246 +1230,413 @@ def pantry_add_or_merge(text: str, qty: float, category: str, is_standard: int =
     category = (category or "Ukategoriseret").strip() or "Ukategoriseret"
     if category.lower() == "ukategoret":
         category = "Ukategoriseret"
-    is_standard = 1 if is_standard else 0
-
-    con = _conn()
-    cur = con.cursor()
 
-    row = cur.execute(
-        """
-        SELECT uid, qty, COALESCE(is_standard,0)
-        FROM pantry_items
-        WHERE lower(text)=? AND COALESCE(category,'Ukategoriseret')=?
-        """,
-        (text.lower(), category),
-    ).fetchone()
-
-    cur.execute("BEGIN")
+    row = cur.execute(_SQL_PANTRY_MATCH, (_key(text), category)).fetchone()
     if row:
-        puid, old_qty, old_std = row
-        new_std = 1 if (int(old_std or 0) == 1 or is_standard == 1) else 0
-        cur.execute(
-            "UPDATE pantry_items SET qty=?, is_standard=? WHERE uid=?",
-            (float(old_qty) + qty, new_std, puid),
-        )
+        puid, old_qty = row
+        cur.execute("UPDATE pantry_items SET qty=? WHERE uid=?", (float(old_qty) + qty, puid))
     else:
         cur.execute(
-            "INSERT INTO pantry_items (uid, text, qty, category, is_standard) VALUES (?, ?, ?, ?, ?)",
-            (str(uuid.uuid4()), text, qty, category, is_standard),
+            "INSERT INTO pantry_items (uid, text, text_key, qty, category, cat_sort) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(uuid.uuid4()), text, _key(text), qty, category, _cat_sort(category)),
         )
-    con.commit()
 
 
-def pantry_consume(uid: str, qty_used: float) -> Optional[Tuple[str, str, int]]:
-    qty_used = float(qty_used) if qty_used and qty_used > 0 else 1.0
-    con = _conn()
-    cur = con.cursor()
+def pantry_add_or_merge(text: str, qty: float, category: str, is_standard: Optional[int] = None) -> None:
+    """is_standard: forældet (se _legacy_is_standard); standard-status kommer fra standard_items."""
+    if not (text or "").strip():
+        return
+    tables = ("pantry_items",) if is_standard is None else ("pantry_items", "standard_items")
+    with unit_of_work(*tables) as cur:
+        _pantry_merge(cur, text, qty, category)
+        _legacy_is_standard(cur, "pantry_add_or_merge", is_standard, text, qty, category)
+
 
+def _pantry_consume(cur: sqlite3.Cursor, uid: str, qty_used: float) -> Optional[Tuple[str, str, int]]:
+    qty_used = float(qty_used) if qty_used and qty_used > 0 else 1.0
     row = cur.execute(
-        "SELECT text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0) FROM pantry_items WHERE uid=?",
+        "SELECT text, qty, COALESCE(category,'Ukategoriseret'), is_standard, text_key FROM v_pantry_items WHERE uid=?",
         (uid,),
     ).fetchone()
     if not row:
         return None
 
-    text, qty, category, is_std = row
+    text, qty, category, is_std, tk = row
     remaining = float(qty) - qty_used
-
-    cur.execute("BEGIN")
     if remaining > 0:
         cur.execute("UPDATE pantry_items SET qty=? WHERE uid=?", (remaining, uid))
     else:
         cur.execute("DELETE FROM pantry_items WHERE uid=?", (uid,))
-    con.commit()
+    # Ran out = none of it left at home in any category
+    left = cur.execute("SELECT 1 FROM pantry_items WHERE text_key=? LIMIT 1", (tk,)).fetchone()
+    _log_event(cur, EVENT_USE, text, min(qty_used, float(qty)), category or "Ukategoriseret", emptied=left is None)
     return (text, category or "Ukategoriseret", int(is_std or 0))
 
 
+def pantry_consume(uid: str, qty_used: float) -> Optional[Tuple[str, str, int]]:
+    with unit_of_work("pantry_items", "shopping_items", *_HISTORY_TABLES) as cur:
+        return _pantry_consume(cur, uid, qty_used)
+
+
 def set_pantry_standard(uid: str, is_standard: int) -> Optional[Tuple[str, str, float]]:
-    con = _conn()
-    cur = con.cursor()
-    row = cur.execute(
-        "SELECT text, COALESCE(category,'Ukategoriseret'), qty FROM pantry_items WHERE uid=?",
-        (uid,),
-    ).fetchone()
-    if not row:
-        return None
-    text, category, qty = row
-    cur.execute("UPDATE pantry_items SET is_standard=? WHERE uid=?", (1 if is_standard else 0, uid))
-    con.commit()
-    return (text, category, float(qty))
+    """Som set_shopping_standard, for en vare derhjemme."""
+    with unit_of_work("standard_items") as cur:
+        return _set_standard(cur, "pantry_items", uid, is_standard)
 
 
 def pantry_move_category(uid: str, new_category: str) -> bool:
     new_category = (new_category or "Ukategoriseret").strip() or "Ukategoriseret"
 
-    con = _conn()
-    cur = con.cursor()
-    row = cur.execute(
-        "SELECT text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0) FROM pantry_items WHERE uid=?",
-        (uid,),
-    ).fetchone()
-    if not row:
-        return False
+    with unit_of_work("pantry_items", "shopping_items") as cur:
+        row = cur.execute(
+            "SELECT text_key, qty, COALESCE(category,'Ukategoriseret') FROM pantry_items WHERE uid=?",
+            (uid,),
+        ).fetchone()
+        if not row:
+            return False
+
+        tk, qty, old_cat = row
+        old_cat = old_cat or "Ukategoriseret"
+        if old_cat == new_category:
+            return False
+
+        row2 = cur.execute(_SQL_PANTRY_MATCH, (tk, new_category)).fetchone()
+        if row2:
+            uid2, qty2 = row2
+            cur.execute("UPDATE pantry_items SET qty=? WHERE uid=?", (float(qty2) + float(qty), uid2))
+            cur.execute("DELETE FROM pantry_items WHERE uid=?", (uid,))
+        else:
+            cur.execute(
+                "UPDATE pantry_items SET category=?, cat_sort=? WHERE uid=?",
+                (new_category, _cat_sort(new_category), uid),
+            )
+    return True
 
-    text, qty, old_cat, is_std = row
-    old_cat = old_cat or "Ukategoriseret"
-    if old_cat == new_category:
-        return False
 
-    row2 = cur.execute(
-        """
-        SELECT uid, qty, COALESCE(is_standard,0)
-        FROM pantry_items
-        WHERE lower(text)=? AND COALESCE(category,'Ukategoriseret')=?
-        """,
-        (text.strip().lower(), new_category),
-    ).fetchone()
+# -----------------------------
+# Composite operations (one transaction each)
+# -----------------------------
+def buy_item(uid: str) -> Optional[Tuple[str, float, str, int]]:
+    """
+    "Købt": flyt varen fra indkøbslisten til hjemme i én transaktion,
+    så den aldrig kan forsvinde fra begge lister.
+    Returnerer (text, qty, category, is_standard) eller None hvis varen ikke findes.
+    """
+    with unit_of_work("shopping_items", "pantry_items", *_HISTORY_TABLES) as cur:
+        popped = _pop_shopping(cur, uid)
+        if popped:
+            text, qty, category, _is_std = popped
+            _pantry_merge(cur, text, qty, category)
+    return popped
 
-    cur.execute("BEGIN")
-    if row2:
-        uid2, qty2, is_std2 = row2
-        new_qty = float(qty2) + float(qty)
-        new_std = 1 if (int(is_std or 0) == 1 or int(is_std2 or 0) == 1) else 0
-        cur.execute("UPDATE pantry_items SET qty=?, is_standard=? WHERE uid=?", (new_qty, new_std, uid2))
-        cur.execute("DELETE FROM pantry_items WHERE uid=?", (uid,))
-    else:
-        cur.execute("UPDATE pantry_items SET category=? WHERE uid=?", (new_category, uid))
-    con.commit()
-    return True
+
+def consume_and_rebuy(uid: str, qty_used: float, rebuy: bool = True) -> Optional[Tuple[str, str, int]]:
+    """
+    "Brugt": træk qty_used fra hjemme-varen og (rebuy) sæt samme mængde på
+    indkøbslisten; standardvarer får opdateret standardmængden. Én transaktion.
+    Returnerer (text, category, is_standard) eller None hvis varen ikke findes.
+    """
+    qty_used = float(qty_used) if qty_used and qty_used > 0 else 1.0
+    with unit_of_work("pantry_items", "shopping_items", "standard_items", *_HISTORY_TABLES) as cur:
+        row = cur.execute(
+            "SELECT text, COALESCE(category,'Ukategoriseret'), is_standard FROM v_pantry_items WHERE uid=?",
+            (uid,),
+        ).fetchone()
+        if not row:
+            return None
+        if rebuy:
+            # Add before consuming: the replenish triggers then find it on the list and add nothing
+            text, category, is_std = row
+            _add_shopping(cur, text, qty_used, category)
+            if is_std:
+                _upsert_standard(cur, text, category, qty_used)
+        return _pantry_consume(cur, uid, qty_used)
 
 
 # -----------------------------
 # Recipes
 # -----------------------------
+# Adding/removing recipe_items also writes the inverted index and recipes.ingredient_count (triggers)
+_RECIPE_ITEM_TABLES = ("recipe_items", "recipe_ingredients", "recipes")
+
+
 def add_recipe(name: str, is_done: int = 0) -> Optional[str]:
     name = (name or "").strip()
     if not name:
         return None
-    con = _conn()
     uid = str(uuid.uuid4())
-    con.execute("INSERT INTO recipes (uid, name, is_done) VALUES (?, ?, ?)", (uid, name, 1 if is_done else 0))
-    con.commit()
+    with unit_of_work("recipes") as cur:
+        cur.execute(
+            "INSERT INTO recipes (uid, name, is_done, sort_key) VALUES (?, ?, ?, ?)",
+            (uid, name, 1 if is_done else 0, _sort_key(name)),
+        )
     return uid
 
 
 def delete_recipe(recipe_uid: str) -> None:
-    con = _conn()
-    cur = con.cursor()
-    cur.execute("BEGIN")
-    cur.execute("DELETE FROM recipe_items WHERE recipe_uid=?", (recipe_uid,))
-    cur.execute("DELETE FROM recipes WHERE uid=?", (recipe_uid,))
-    cur.execute("UPDATE meal_plan SET recipe_uid=NULL WHERE recipe_uid=?", (recipe_uid,))
-    con.commit()
+    with unit_of_work(*_RECIPE_ITEM_TABLES, "meal_plan") as cur:
+        cur.execute("DELETE FROM recipe_items WHERE recipe_uid=?", (recipe_uid,))
+        cur.execute("DELETE FROM recipes WHERE uid=?", (recipe_uid,))
+        cur.execute("UPDATE meal_plan SET recipe_uid=NULL WHERE recipe_uid=?", (recipe_uid,))
 
 
 def set_recipe_done(recipe_uid: str, is_done: int) -> None:
-    con = _conn()
-    con.execute("UPDATE recipes SET is_done=? WHERE uid=?", (1 if is_done else 0, recipe_uid))
-    con.commit()
+    with unit_of_work("recipes") as cur:
+        cur.execute("UPDATE recipes SET is_done=? WHERE uid=?", (1 if is_done else 0, recipe_uid))
 
 
-def fetch_recipes(done: Optional[int] = None) -> List[Tuple[str, str, int]]:
-    con = _conn()
+_SQL_RECIPES_ALL = "SELECT uid, name, is_done FROM recipes ORDER BY is_done ASC, sort_key"
+_SQL_RECIPES_BY_DONE = "SELECT uid, name, is_done FROM recipes WHERE is_done=? ORDER BY sort_key"
+
+
+def _q_recipes(con: sqlite3.Connection, done: Optional[int] = None) -> List[Tuple[str, str, int]]:
     if done is None:
-        rows = con.execute(
-            "SELECT uid, name, COALESCE(is_done,0) FROM recipes ORDER BY COALESCE(is_done,0) ASC, name COLLATE NOCASE"
-        ).fetchall()
+        rows = con.execute(_SQL_RECIPES_ALL).fetchall()
     else:
-        rows = con.execute(
-            "SELECT uid, name, COALESCE(is_done,0) FROM recipes WHERE COALESCE(is_done,0)=? ORDER BY name COLLATE NOCASE",
-            (1 if done else 0,),
-        ).fetchall()
+        rows = con.execute(_SQL_RECIPES_BY_DONE, (1 if done else 0,)).fetchall()
     return [(r[0], r[1], int(r[2] or 0)) for r in rows]
 
 
+@_read_cached("recipes")
+def fetch_recipes(done: Optional[int] = None) -> List[Tuple[str, str, int]]:
+    with _reading() as con:
+        return _q_recipes(con, done)
+
+
+_SQL_RECIPE_ITEMS = """
+    SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), is_standard
+    FROM v_recipe_items
+    WHERE recipe_uid=?
+    ORDER BY cat_sort, sort_key
+"""
+
+
+def _recipe_item_row(r) -> Tuple[str, str, float, str, int]:
+    return (r[0], r[1], float(r[2]), r[3] or "Ukategoriseret", int(r[4] or 0))
+
+
+@_read_cached("recipe_items", "standard_items")
 def fetch_recipe_items(recipe_uid: str) -> List[Tuple[str, str, float, str, int]]:
-    con = _conn()
-    rows = con.execute(
-        """
-        SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0)
-        FROM recipe_items
-        WHERE recipe_uid=?
-        ORDER BY COALESCE(category,'Ukategoriseret') COLLATE NOCASE, text COLLATE NOCASE
-        """,
-        (recipe_uid,),
-    ).fetchall()
-    return [(r[0], r[1], float(r[2]), r[3] or "Ukategoriseret", int(r[4] or 0)) for r in rows]
+    with _reading() as con:
+        rows = con.execute(_SQL_RECIPE_ITEMS, (recipe_uid,)).fetchall()
+    return [_recipe_item_row(r) for r in rows]
+
+
+# Every recipe's items in one ordered walk of idx_recipe_items_ru_sort (page snapshot)
+_SQL_ALL_RECIPE_ITEMS = """
+    SELECT uid, text, qty, COALESCE(category,'Ukategoriseret'), is_standard, recipe_uid
+    FROM v_recipe_items
+    ORDER BY recipe_uid, cat_sort, sort_key
+"""
+
+
+def _q_all_recipe_items(con: sqlite3.Connection) -> Mapping[str, Tuple[Tuple[str, str, float, str, int], ...]]:
+    items: Dict[str, List[Tuple[str, str, float, str, int]]] = {}
+    for r in con.execute(_SQL_ALL_RECIPE_ITEMS):
+        items.setdefault(r[5], []).append(_recipe_item_row(r))
+    return MappingProxyType({uid: tuple(rows) for uid, rows in items.items()})
+
+
+# -----------------------------
+# What can we cook now (inverted index)
+# -----------------------------
+class CookableRecipe(NamedTuple):
+    uid: str
+    name: str
+    have: int                   # ingredients at home
+    total: int                  # distinct ingredients in the recipe
+    missing: Tuple[str, ...]    # texts of the ingredients not at home (display order)
+
+
+# Pantry keys (distinct, walking idx_pantry_key_cat) -> recipes using them (recipe_ingredients PK).
+# Work follows the pantry size and its matches, not the total number of recipe items.
+_SQL_PANTRY_RECIPE_MATCHES = """
+    SELECT ri.recipe_uid
+    FROM (SELECT DISTINCT text_key FROM pantry_items) h
+    JOIN recipe_ingredients ri ON ri.text_key = h.text_key
+"""
+
+_SQL_DONE_RECIPE_COUNTS = """
+    SELECT uid, name, ingredient_count
+    FROM recipes
+    WHERE is_done = 1 AND ingredient_count > 0
+    ORDER BY sort_key
+"""
+
+_SQL_MISSING_INGREDIENTS = """
+    SELECT ri.recipe_uid, ri.text
+    FROM recipe_items ri
+    WHERE ri.recipe_uid IN ({marks})
+      AND NOT EXISTS (SELECT 1 FROM pantry_items p WHERE p.text_key = ri.text_key)
+    ORDER BY ri.recipe_uid, ri.cat_sort, ri.sort_key
+"""
+
+
+@_read_cached("recipes", "recipe_ingredients", "recipe_items", "pantry_items")
+def fetch_cookable_recipes(limit: int = 10) -> List[CookableRecipe]:
+    """
+    Færdige opskrifter rangeret efter hvor stor en del af ingredienserne der er hjemme
+    (flest først, så færrest manglende), med de manglende ingredienser for de `limit` bedste.
+    """
+    # _LOCK as in load_shopping_snapshot: the read transaction is on the shared connection
+    with _LOCK, _reading() as con:
+        own_txn = not con.in_transaction
+        if own_txn:
+            con.execute("BEGIN")
+        try:
+            return _q_cookable_recipes(con, limit)
+        finally:
+            if own_txn:
+                con.commit()
+
+
+def _q_cookable_recipes(con: sqlite3.Connection, limit: int) -> List[CookableRecipe]:
+    # Several queries: the caller holds one read transaction around them
+    have: Dict[str, int] = {}
+    for (ruid,) in con.execute(_SQL_PANTRY_RECIPE_MATCHES):
+        have[ruid] = have.get(ruid, 0) + 1
+    recipes = con.execute(_SQL_DONE_RECIPE_COUNTS).fetchall()
+    # Stable sort: equal scores stay in name order
+    ranked = sorted(recipes, key=lambda r: (-have.get(r[0], 0) / r[2], r[2] - have.get(r[0], 0)))[:limit]
+
+    missing: Dict[str, List[str]] = {}
+    if ranked:
+        sql = _SQL_MISSING_INGREDIENTS.format(marks=",".join("?" * len(ranked)))
+        for ruid, text in con.execute(sql, [r[0] for r in ranked]):
+            missing.setdefault(ruid, []).append(text)
+    return [
+        CookableRecipe(uid, name, have.get(uid, 0), int(total), tuple(missing.get(uid, ())))
+        for uid, name, total in ranked
+    ]
 
 
 def delete_recipe_item(item_uid: str) -> None:
-    con = _conn()
-    con.execute("DELETE FROM recipe_items WHERE uid=?", (item_uid,))
-    con.commit()
+    with unit_of_work(*_RECIPE_ITEM_TABLES) as cur:
+        cur.execute("DELETE FROM recipe_items WHERE uid=?", (item_uid,))
 
 
 def update_recipe_item_qty(item_uid: str, qty: float) -> None:
     qty = float(qty) if qty and qty > 0 else 1.0
-    con = _conn()
-    con.execute("UPDATE recipe_items SET qty=? WHERE uid=?", (qty, item_uid))
-    con.commit()
+    with unit_of_work("recipe_items") as cur:
+        cur.execute("UPDATE recipe_items SET qty=? WHERE uid=?", (qty, item_uid))
+
 
+_SQL_RECIPE_ITEM_MATCH = """
+    SELECT uid, qty
+    FROM recipe_items
+    WHERE recipe_uid=? AND text_key=? AND category=?
+"""
 
-def recipe_add_or_merge(recipe_uid: str, text: str, qty: float, category: str, is_standard: int = 0) -> None:
+
+def _recipe_merge(cur: sqlite3.Cursor, recipe_uid: str, text: str, qty: float, category: str) -> None:
     text = (text or "").strip()
     if not text or not recipe_uid:
         return
     qty = float(qty) if qty and qty > 0 else 1.0
     category = (category or "Ukategoriseret").strip() or "Ukategoriseret"
-    is_standard = 1 if is_standard else 0
 
-    con = _conn()
-    cur = con.cursor()
-
-    row = cur.execute(
-        """
-        SELECT uid, qty, COALESCE(is_standard,0)
-        FROM recipe_items
-        WHERE recipe_uid=? AND lower(text)=? AND COALESCE(category,'Ukategoriseret')=?
-        """,
-        (recipe_uid, text.strip().lower(), category),
-    ).fetchone()
-
-    cur.execute("BEGIN")
+    row = cur.execute(_SQL_RECIPE_ITEM_MATCH, (recipe_uid, _key(text), category)).fetchone()
     if row:
-        uid, old_qty, old_std = row
-        new_qty = float(old_qty) + qty
-        new_std = 1 if (int(old_std or 0) == 1 or is_standard == 1) else 0
-        cur.execute("UPDATE recipe_items SET qty=?, is_standard=? WHERE uid=?", (new_qty, new_std, uid))
+        uid, old_qty = row
+        cur.execute("UPDATE recipe_items SET qty=? WHERE uid=?", (float(old_qty) + qty, uid))
     else:
         cur.execute(
             """
-            INSERT INTO recipe_items (uid, recipe_uid, text, qty, category, is_standard)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO recipe_items (uid, recipe_uid, text, text_key, qty, category, cat_sort, sort_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (str(uuid.uuid4()), recipe_uid, text, qty, category, is_standard),
+            (str(uuid.uuid4()), recipe_uid, text, _key(text), qty, category, _cat_sort(category), _sort_key(text)),
         )
-    con.commit()
+
+
+def recipe_add_or_merge(recipe_uid: str, text: str, qty: float, category: str) -> None:
+    if not (text or "").strip() or not recipe_uid:
+        return
+    with unit_of_work(*_RECIPE_ITEM_TABLES) as cur:
+        _recipe_merge(cur, recipe_uid, text, qty, category)
+
+
+def recipe_add_many(recipe_uid: str, items: Iterable[Tuple[str, float, str]]) -> int:
+    """
+    Flere ingredienser (text, qty, category) i én transaktion, fx fra en indsat liste.
+    Samme tekst + kategori lægges sammen som i recipe_add_or_merge. Returnerer antal linjer.
+    """
+    items = [(t, q, c) for t, q, c in items if (t or "").strip()]
+    if not items or not recipe_uid:
+        return 0
+    with unit_of_work(*_RECIPE_ITEM_TABLES) as cur:
+        for text, qty, category in items:
+            _recipe_merge(cur, recipe_uid, text, qty, category)
+    return len(items)
+
+
+# Known category per text_key, best source first: standards, purchase history, at home, on the list
+_SQL_KNOWN_CATEGORIES = """
+    SELECT text_key, category, 0 FROM standard_items WHERE text_key IN ({marks})
+    UNION ALL
+    SELECT text_key, category, 1 FROM item_stats WHERE text_key IN ({marks})
+    UNION ALL
+    SELECT text_key, category, 2 FROM pantry_items WHERE text_key IN ({marks})
+    UNION ALL
+    SELECT text_key, category, 3 FROM shopping_items WHERE text_key IN ({marks})
+"""
+
+
+def guess_categories(texts: Iterable[str]) -> Dict[str, str]:
+    """text -> kendt kategori (ukendte tekster er ikke med). Ét opslag for alle tekster."""
+    by_key: Dict[str, List[str]] = {}
+    for t in texts:
+        if _key(t):
+            by_key.setdefault(_key(t), []).append(t)
+    if not by_key:
+        return {}
+    keys = list(by_key)
+    sql = _SQL_KNOWN_CATEGORIES.format(marks=",".join("?" * len(keys)))
+    best: Dict[str, Tuple[int, str]] = {}
+    with _LOCK, _reading() as con:
+        for tk, category, rank in con.execute(sql, keys * 4):
+            if category and (tk not in best or rank < best[tk][0]):
+                best[tk] = (rank, category)
+    return {t: best[k][1] for k, ts in by_key.items() if k in best for t in ts}
 
 
 def add_shopping_from_recipe(recipe_uid: str, multiplier: float = 1.0, check_pantry_first: bool = True) -> Dict[str, int]:
     multiplier = float(multiplier) if multiplier and float(multiplier) > 0 else 1.0
 
-    pantry_keys = set()
-    if check_pantry_first:
-        pantry_rows = fetch_pantry()
-        pantry_keys = {_key(t) for (_uid, t, _q, _c, _s) in pantry_rows if _key(t)}
-
-    items = fetch_recipe_items(recipe_uid)
     added = 0
     skipped = 0
-    for _uid, text, qty, cat, is_std in items:
-        tk = _key(text)
-        if check_pantry_first and tk in pantry_keys:
-            skipped += 1
-            continue
-        add_shopping(text=text, qty=float(qty) * multiplier, category=cat, is_standard=int(is_std or 0))
-        added += 1
+    with unit_of_work("shopping_items") as cur:
+        pantry_keys = set()
+        if check_pantry_first:
+            pantry_keys = {tk for (tk,) in cur.execute("SELECT DISTINCT text_key FROM pantry_items")}
+
+        items = cur.execute(_SQL_RECIPE_ITEMS, (recipe_uid,)).fetchall()
+        for _uid, text, qty, cat, _is_std in items:
+            if check_pantry_first and _key(text) in pantry_keys:
+                skipped += 1
+                continue
+            _add_shopping(cur, text=text, qty=float(qty) * multiplier, category=cat)
+            added += 1
     return {"added": added, "skipped_home": skipped}
 
 
 # -----------------------------
 # Meal plan
 # -----------------------------
+# One statement on uq_meal_plan_day: two saves of the same day cannot both insert.
+# Another recipe on the day = not cooked yet.
+_SQL_MEAL_UPSERT = """
+    INSERT INTO meal_plan (uid, day_date, recipe_uid, title, servings, note)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(day_date) DO UPDATE SET
+        recipe_uid=excluded.recipe_uid,
+        title=excluded.title,
+        servings=excluded.servings,
+        note=excluded.note,
+        cooked_at=CASE WHEN recipe_uid IS excluded.recipe_uid THEN cooked_at END
+"""
+
+
 def set_meal_for_date(day_date: str, recipe_uid: Optional[str], title: str, servings: float = 1.0, note: str = "") -> None:
     day_date = (day_date or "").strip()
     if not day_date:
@@ -613,111 +1645,551 @@ def set_meal_for_date(day_date: str, recipe_uid: Optional[str], title: str, serv
     servings = float(servings) if servings and float(servings) > 0 else 1.0
     note = (note or "").strip()
 
-    con = _conn()
-    cur = con.cursor()
-    existing = cur.execute("SELECT uid FROM meal_plan WHERE day_date=?", (day_date,)).fetchone()
+    with unit_of_work("meal_plan") as cur:
+        cur.execute(_SQL_MEAL_UPSERT, (str(uuid.uuid4()), day_date, recipe_uid, title, servings, note))
 
-    cur.execute("BEGIN")
-    if existing:
-        uid = existing[0]
-        cur.execute(
-            "UPDATE meal_plan SET recipe_uid=?, title=?, servings=?, note=? WHERE uid=?",
-            (recipe_uid, title, servings, note, uid),
-        )
-    else:
-        cur.execute(
-            """
-            INSERT INTO meal_plan (uid, day_date, recipe_uid, title, servings, note)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (str(uuid.uuid4()), day_date, recipe_uid, title, servings, note),
-        )
-    con.commit()
+
+def set_meals(meals: Iterable[Tuple[str, Optional[str], str, float, str]]) -> int:
+    """
+    Flere dage på én gang (fx et menuforslag) i én transaktion.
+    meals = (day_date, recipe_uid, title, servings, note). Returnerer antal gemte dage.
+    """
+    rows = [
+        (str(uuid.uuid4()), day.strip(), ruid, (title or "").strip(),
+         float(servings) if servings and float(servings) > 0 else 1.0, (note or "").strip())
+        for day, ruid, title, servings, note in meals
+        if (day or "").strip()
+    ]
+    if not rows:
+        return 0
+    with unit_of_work("meal_plan") as cur:
+        cur.executemany(_SQL_MEAL_UPSERT, rows)
+    return len(rows)
 
 
 def clear_meal_for_date(day_date: str) -> None:
-    con = _conn()
-    con.execute("DELETE FROM meal_plan WHERE day_date=?", (day_date,))
-    con.commit()
+    with unit_of_work("meal_plan") as cur:
+        cur.execute("DELETE FROM meal_plan WHERE day_date=?", (day_date,))
+
+
+_SQL_MEAL_PLAN = """
+    SELECT day_date, recipe_uid, COALESCE(title,''), COALESCE(servings,1), COALESCE(note,'')
+    FROM meal_plan
+    WHERE day_date >= ? AND day_date <= ?
+    ORDER BY day_date ASC
+"""
 
 
+@_read_cached("meal_plan")
 def fetch_meal_plan(date_from: str, date_to: str) -> List[Tuple[str, Optional[str], str, float, str]]:
-    con = _conn()
-    rows = con.execute(
-        """
-        SELECT day_date, recipe_uid, COALESCE(title,''), COALESCE(servings,1), COALESCE(note,'')
-        FROM meal_plan
-        WHERE day_date >= ? AND day_date <= ?
-        ORDER BY day_date ASC
-        """,
-        (date_from, date_to),
-    ).fetchall()
+    with _reading() as con:
+        rows = con.execute(_SQL_MEAL_PLAN, (date_from, date_to)).fetchall()
     return [(r[0], r[1], r[2] or "", float(r[3] or 1), r[4] or "") for r in rows]
 
 
-def generate_shopping_from_mealplan(date_from: str, date_to: str, check_pantry_first: bool = True) -> Dict[str, int]:
-    pantry_keys = set()
-    if check_pantry_first:
-        pantry_rows = fetch_pantry()
-        pantry_keys = {_key(t) for (_, t, _, _, _) in pantry_rows if _key(t)}
+class PlannedMeal(NamedTuple):
+    day_date: str
+    recipe_uid: Optional[str]
+    recipe_name: str    # "" without a recipe (or if it was deleted)
+    title: str
+    servings: float
+    note: str
+    cooked: bool        # "Lavet" (cook_meal) has been done
 
-    plan_rows = fetch_meal_plan(date_from, date_to)
 
-    recipe_servings: Dict[str, float] = {}
-    for _day_date, recipe_uid, _title, servings, _note in plan_rows:
-        if recipe_uid:
-            recipe_servings[recipe_uid] = recipe_servings.get(recipe_uid, 0.0) + float(servings or 1.0)
+_SQL_MEAL_CALENDAR = """
+    SELECT mp.day_date, mp.recipe_uid, COALESCE(r.name,''), COALESCE(mp.title,''),
+           COALESCE(mp.servings,1), COALESCE(mp.note,''), mp.cooked_at IS NOT NULL
+    FROM meal_plan mp
+    LEFT JOIN recipes r ON r.uid = mp.recipe_uid
+    WHERE mp.day_date >= ? AND mp.day_date <= ?
+    ORDER BY mp.day_date ASC
+"""
 
-    if not recipe_servings:
-        return {"added": 0, "skipped_home": 0, "merged_items": 0}
 
-    merged: Dict[Tuple[str, str], Dict[str, object]] = {}
-    con = _conn()
-    cur = con.cursor()
+@_read_cached("meal_plan", "recipes")
+def fetch_meal_calendar(date_from: str, date_to: str) -> List[PlannedMeal]:
+    """Menuen for en periode (uge, måned, ...) med opskriftsnavne, i én forespørgsel."""
+    with _reading() as con:
+        return _q_meal_calendar(con, date_from, date_to)
 
-    for ruid, total_servings in recipe_servings.items():
-        items = cur.execute(
-            """
-            SELECT text, qty, COALESCE(category,'Ukategoriseret'), COALESCE(is_standard,0)
-            FROM recipe_items
-            WHERE recipe_uid=?
-            """,
-            (ruid,),
+
+def _q_meal_calendar(con: sqlite3.Connection, date_from: str, date_to: str) -> List[PlannedMeal]:
+    rows = con.execute(_SQL_MEAL_CALENDAR, (date_from, date_to)).fetchall()
+    return [PlannedMeal(r[0], r[1], r[2] or "", r[3] or "", float(r[4] or 1), r[5] or "", bool(r[6])) for r in rows]
+
+
+class CookResult(NamedTuple):
+    found: bool                             # the day has a recipe
+    already_cooked: bool                    # nothing was consumed again
+    used: int                               # ingredients taken from the pantry
+    shortfalls: Tuple[Tuple[str, float], ...]   # (text, qty missing at home)
+    rebought: int                           # standard items put on the list
+
+
+# Need per ingredient for one recipe (idx_recipe_items_key_cat), and the pantry rows of one key
+_SQL_COOK_NEED = """
+    SELECT text_key, MIN(text), SUM(COALESCE(qty, 1))
+    FROM recipe_items
+    WHERE recipe_uid=? AND text_key <> ''
+    GROUP BY text_key
+"""
+
+_SQL_PANTRY_BY_KEY = """
+    SELECT uid, qty
+    FROM pantry_items
+    WHERE text_key=?
+    ORDER BY category
+"""
+
+_SQL_STANDARD_REBUY = """
+    SELECT s.text, s.category, s.default_qty
+    FROM standard_items s
+    WHERE s.text_key=?
+      AND NOT EXISTS (SELECT 1 FROM shopping_items x WHERE x.text_key = s.text_key)
+"""
+
+
+def cook_meal(day_date: str, rebuy_standards: bool = False) -> CookResult:
+    """
+    "Lavet": træk dagens opskrift (x antal) fra hjemme i én transaktion.
+    Mangler der noget hjemme, trækkes det der er, og resten rapporteres som manko.
+    rebuy_standards: brugte standardvarer sættes på listen (standardmængden), hvis de ikke står der.
+    Dagen markeres som lavet (cooked_at); en lavet dag trækkes ikke igen.
+    """
+    with unit_of_work("meal_plan", "pantry_items", "shopping_items", *_HISTORY_TABLES) as cur:
+        meal = cur.execute(
+            "SELECT recipe_uid, COALESCE(servings, 1), cooked_at FROM meal_plan WHERE day_date=?",
+            (day_date,),
+        ).fetchone()
+        if not meal or not meal[0]:
+            return CookResult(False, False, 0, (), 0)
+        recipe_uid, servings, cooked_at = meal
+        if cooked_at:
+            return CookResult(True, True, 0, (), 0)
+
+        used = rebought = 0
+        shortfalls: List[Tuple[str, float]] = []
+        for tk, text, qty in cur.execute(_SQL_COOK_NEED, (recipe_uid,)).fetchall():
+            need = float(qty) * float(servings)
+            took = False
+            for puid, have in cur.execute(_SQL_PANTRY_BY_KEY, (tk,)).fetchall():
+                if need <= _QTY_EPS:
+                    break
+                if float(have) <= _QTY_EPS:
+                    continue  # empty row: _pantry_consume would treat 0 as "1 used" and delete it
+                take = min(float(have), need)
+                _pantry_consume(cur, puid, take)
+                need -= take
+                took = True
+            if took:
+                used += 1
+                if rebuy_standards:
+                    std = cur.execute(_SQL_STANDARD_REBUY, (tk,)).fetchone()
+                    if std:
+                        _add_shopping(cur, std[0], float(std[2] or 1), std[1])
+                        rebought += 1
+            if need > _QTY_EPS:
+                shortfalls.append((text, need))
+
+        cur.execute("UPDATE meal_plan SET cooked_at=datetime('now') WHERE day_date=?", (day_date,))
+    return CookResult(True, False, used, tuple(shortfalls), rebought)
+
+
+# Menu planner input (src/meal_planner.py): the items of every finished recipe (the planner
+# sums rows with the same key itself) and the total at home per key
+_SQL_PLANNER_ITEMS = """
+    SELECT ri.recipe_uid, ri.text_key, COALESCE(ri.qty, 1)
+    FROM recipes r
+    JOIN recipe_items ri ON ri.recipe_uid = r.uid
+    WHERE r.is_done = 1 AND ri.text_key <> ''
+"""
+
+_SQL_PANTRY_TOTALS = """
+    SELECT text_key, SUM(qty)
+    FROM pantry_items
+    GROUP BY text_key
+"""
+
+
+@_read_cached("recipes", "recipe_items")
+def fetch_planner_items() -> List[Tuple[str, str, float]]:
+    """(recipe_uid, text_key, qty) for alle færdige opskrifters ingredienser (samme nøgle kan gå igen)."""
+    with _reading() as con:
+        rows = con.execute(_SQL_PLANNER_ITEMS).fetchall()
+    return [(r[0], r[1], float(r[2])) for r in rows]
+
+
+@_read_cached("pantry_items")
+def fetch_pantry_totals() -> List[Tuple[str, float]]:
+    """(text_key, samlet mængde hjemme)."""
+    with _reading() as con:
+        rows = con.execute(_SQL_PANTRY_TOTALS).fetchall()
+    return [(r[0], float(r[1] or 0)) for r in rows]
+
+
+# Net shortfall for a date range in one round-trip:
+#   need   = recipe_items x servings, grouped by (normalized text, category)
+#   home   = pantry qty per normalized text (only when check_pantry_first)
+#   netted = home qty is spent across the categories of the same text in order,
+#            so an item needed in two categories is not subtracted twice
+# src lists the "day:recipe_uid" pairs each row comes from.
+_MEALPLAN_NEED_SQL = """
+    WITH need AS (
+        SELECT ri.text_key AS tk,
+               COALESCE(ri.category, 'Ukategoriseret') AS cat,
+               MIN(trim(ri.text)) AS text,
+               SUM(COALESCE(ri.qty, 1) * COALESCE(mp.servings, 1)) AS qty,
+               group_concat(DISTINCT mp.day_date || ':' || mp.recipe_uid) AS src
+        FROM meal_plan mp
+        JOIN recipe_items ri ON ri.recipe_uid = mp.recipe_uid
+        WHERE mp.day_date >= ? AND mp.day_date <= ?
+          AND ri.text_key <> ''
+        GROUP BY tk, cat
+    ),
+    home AS (
+        SELECT text_key AS tk, SUM(qty) AS qty
+        FROM pantry_items
+        WHERE ? = 1 AND text_key IN (SELECT tk FROM need)
+        GROUP BY text_key
+    ),
+    netted AS (
+        SELECT n.tk, n.cat, n.text, n.qty, n.src,
+               COALESCE(h.qty, 0) AS home_qty,
+               COALESCE(SUM(n.qty) OVER (
+                   PARTITION BY n.tk ORDER BY n.cat
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ), 0) AS need_before
+        FROM need n
+        LEFT JOIN home h ON h.tk = n.tk
+    )
+    SELECT tk, cat, text, src, qty,
+           max(qty - max(home_qty - need_before, 0), 0) AS short
+    FROM netted
+    ORDER BY cat, tk
+"""
+
+# Rows generated for one period (idx_shop_gen_scope_created)
+_SQL_GENERATED_ROWS = """
+    SELECT uid, text_key, category, qty, COALESCE(gen_qty, 0), COALESCE(gen_sources, '')
+    FROM shopping_items
+    WHERE gen_scope=?
+    ORDER BY created_at ASC
+"""
+
+# Oldest hand-added row of one item (idx_shop_text_key; MIN() picks the row, no sort)
+_SQL_MANUAL_ROW = """
+    SELECT uid, qty, MIN(created_at)
+    FROM shopping_items
+    WHERE text_key=? AND COALESCE(category,'Ukategoriseret')=? AND gen_scope IS NULL
+"""
+
+_QTY_EPS = 1e-9
+
+
+def _sources(src: Optional[str]) -> str:
+    # group_concat has no guaranteed order -> sort so equal sources compare equal
+    return ",".join(sorted(p for p in (src or "").split(",") if p))
+
+
+def generate_shopping_from_mealplan(date_from: str, date_to: str, check_pantry_first: bool = True) -> Dict[str, int]:
+    """
+    Bringer indkøbslisten i trit med menuen for perioden.
+    Genererede rækker er mærket med periode (gen_scope), kørsel (gen_id),
+    den genererede mængde (gen_qty) og kilder (dag:opskrift). Ved gen-kørsel
+    beregnes forskellen mod det tidligere genererede, og kun ændringerne skrives:
+    nye varer tilføjes, mængder justeres op/ned, og varer der ikke længere
+    behøves fjernes. Manuelle rettelser af mængden bevares som et tillæg.
+    Står varen (samme kategori) allerede på listen fra hånden, lægges menuens mængde
+    oven i den række i stedet for en ny; den manuelle mængde er tillægget, og den er
+    hvad der bliver tilbage, hvis menuen ikke længere behøver varen.
+    Uændret menu = ingen skrivninger.
+
+    Returnerer:
+      added, increased, decreased, removed, unchanged
+      merged_manual lagt oven i en manuel række (ikke talt i added)
+      written       rækker der blev skrevet (også "unchanged" hvor kun kilderne flyttede);
+                    > 0 betyder at DB'en skal sync'es
+      merged_items  unikke (vare, kategori) i menuen
+      skipped_home  varer der er helt dækket hjemme
+      reduced_home  varer hvor en del er hjemme (kun resten tilføjes)
+    """
+    scope = f"mealplan:{date_from}..{date_to}"
+    # One transaction: the diff is computed against exactly what gets written
+    with unit_of_work("shopping_items") as cur:
+        rows = cur.execute(
+            _MEALPLAN_NEED_SQL,
+            (date_from, date_to, 1 if check_pantry_first else 0),
         ).fetchall()
 
-        for text, qty, cat, is_std in items:
-            t = (text or "").strip()
-            if not t:
+        desired: Dict[Tuple[str, str], Tuple[str, float, str]] = {}
+        skipped_home = 0
+        reduced_home = 0
+        for tk, cat, text, src, qty, short in rows:
+            if short <= _QTY_EPS:
+                skipped_home += 1
+                continue
+            if short < qty - _QTY_EPS:
+                reduced_home += 1
+            desired[(tk, cat or "Ukategoriseret")] = (text, float(short), _sources(src))
+
+        existing = cur.execute(_SQL_GENERATED_ROWS, (scope,)).fetchall()
+
+        gen_id = uuid.uuid4().hex
+        inserts = []
+        adopts = []    # (qty, gen_scope, gen_id, gen_qty, gen_sources, uid) - a manual row takes the need
+        updates = []   # (qty, gen_id, gen_qty, gen_sources, uid)
+        untag = []     # (qty, uid) - user's extra on top of a row no longer needed
+        deletes = []   # (uid,)
+        stats = {"added": 0, "increased": 0, "decreased": 0, "removed": 0, "unchanged": 0, "merged_manual": 0}
+
+        seen = set()
+        for uid, tk, cat, qty, gen_qty, gen_sources in existing:
+            key = (tk, cat)
+            want = desired.get(key) if key not in seen else None
+            seen.add(key)
+            if want is None:
+                extra = float(qty) - float(gen_qty)
+                if extra > _QTY_EPS:
+                    untag.append((extra, uid))
+                else:
+                    deletes.append((uid,))
+                stats["removed"] += 1
                 continue
-            tk = _key(t)
-            cat = (cat or "Ukategoriseret").strip() or "Ukategoriseret"
 
-            if check_pantry_first and tk in pantry_keys:
+            _text, short, sources = want
+            delta = short - float(gen_qty)
+            if abs(delta) <= _QTY_EPS and sources == gen_sources:
+                stats["unchanged"] += 1
+                continue
+            new_qty = float(qty) + delta
+            if new_qty <= _QTY_EPS:
+                deletes.append((uid,))
+                stats["removed"] += 1
                 continue
+            updates.append((new_qty, gen_id, short, sources, uid))
+            if delta > _QTY_EPS:
+                stats["increased"] += 1
+            elif delta < -_QTY_EPS:
+                stats["decreased"] += 1
+            else:
+                stats["unchanged"] += 1  # only the sources moved (e.g. swapped days)
 
-            key = (tk, cat)
-            q = float(qty or 1.0) * float(total_servings or 1.0)
+        for key, (text, short, sources) in desired.items():
+            if key in seen:
+                continue
+            manual_uid, manual_qty, _created = cur.execute(_SQL_MANUAL_ROW, key).fetchone()
+            if manual_uid is not None:
+                adopts.append((float(manual_qty) + short, scope, gen_id, short, sources, manual_uid))
+                stats["merged_manual"] += 1
+                continue
+            inserts.append((str(uuid.uuid4()), text, key[0], short, key[1], scope, gen_id, short, sources, _cat_sort(key[1])))
+            stats["added"] += 1
+
+        if inserts:
+            cur.executemany(
+                """
+                INSERT INTO shopping_items
+                    (uid, text, text_key, qty, category, gen_scope, gen_id, gen_qty, gen_sources, cat_sort)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                inserts,
+            )
+        if adopts:
+            cur.executemany(
+                "UPDATE shopping_items SET qty=?, gen_scope=?, gen_id=?, gen_qty=?, gen_sources=? WHERE uid=?",
+                adopts,
+            )
+        if updates:
+            cur.executemany(
+                "UPDATE shopping_items SET qty=?, gen_id=?, gen_qty=?, gen_sources=? WHERE uid=?",
+                updates,
+            )
+        if untag:
+            cur.executemany(
+                """
+                UPDATE shopping_items
+                SET qty=?, gen_scope=NULL, gen_id=NULL, gen_qty=NULL, gen_sources=NULL
+                WHERE uid=?
+                """,
+                untag,
+            )
+        if deletes:
+            cur.executemany("DELETE FROM shopping_items WHERE uid=?", deletes)
+
+    stats.update({
+        "written": len(inserts) + len(adopts) + len(updates) + len(untag) + len(deletes),
+        "skipped_home": skipped_home,
+        "reduced_home": reduced_home,
+        "merged_items": len(rows),
+    })
+    return stats
 
-            if key not in merged:
-                merged[key] = {"text": t, "qty": q, "category": cat, "is_standard": int(is_std or 0)}
-            else:
-                merged[key]["qty"] = float(merged[key]["qty"]) + q
-                merged[key]["is_standard"] = 1 if (int(merged[key]["is_standard"]) == 1 or int(is_std or 0) == 1) else 0
 
-    added = 0
-    for (_tk, _cat), v in merged.items():
-        add_shopping(text=str(v["text"]), qty=float(v["qty"]), category=str(v["category"]), is_standard=int(v["is_standard"]))
-        added += 1
-
-    skipped_home = 0
-    if check_pantry_first:
-        all_keys = set()
-        for ruid in recipe_servings.keys():
-            rows = cur.execute("SELECT text FROM recipe_items WHERE recipe_uid=?", (ruid,)).fetchall()
-            for (t,) in rows:
-                k = _key(t or "")
-                if k:
-                    all_keys.add(k)
-        skipped_home = sum(1 for k in all_keys if k in pantry_keys)
-
-    return {"added": added, "skipped_home": skipped_home, "merged_items": len(merged)}
+# -----------------------------
+# Page snapshot
+# -----------------------------
+class ShoppingSnapshot(NamedTuple):
+    """
+    Alt Shopping-siden læser pr. rerun, hentet i én læsetransaktion,
+    så alle faner ser samme (konsistente) tilstand. Uforanderlig: kun tuples.
+    """
+    shopping: CategoryGroups
+    pantry: CategoryGroups
+    standards: Tuple[StandardStatus, ...]               # with rules and status (display order)
+    suggestions: Tuple[PurchaseSuggestion, ...]         # "skal nok købes snart" as of `today`
+    recipes_draft: Tuple[Tuple[str, str, int], ...]     # (uid, name, is_done)
+    recipes_done: Tuple[Tuple[str, str, int], ...]
+    recipe_items: Mapping[str, Tuple[Tuple[str, str, float, str, int], ...]]  # recipe uid -> items
+    cookable: Tuple[CookableRecipe, ...]                # the best SNAPSHOT_COOKABLE done recipes
+    meal_calendar: Tuple[PlannedMeal, ...]              # menu_from..menu_to
+
+
+SNAPSHOT_COOKABLE = 5
+
+_SNAPSHOT_TABLES = (
+    "shopping_items", "pantry_items", "standard_items", "recipes", "recipe_items", "recipe_ingredients",
+    "item_stats", "meal_plan",
+)
+
+
+def load_shopping_snapshot(
+    today: Optional[str] = None, menu_from: Optional[str] = None, menu_to: Optional[str] = None
+) -> ShoppingSnapshot:
+    """
+    Shopping-sidens data for `today` (forslag) og menuen menu_from..menu_to
+    (standard: i dag og kun den dag).
+    """
+    today = today or date.today().isoformat()
+    menu_from = menu_from or today
+    menu_to = menu_to or menu_from
+    key = ("load_shopping_snapshot", today, menu_from, menu_to)
+    with _LOCK, _using_conn() as con:
+        token = _cache_token(con, _SNAPSHOT_TABLES)
+        hit = _cache_get(key)
+        if hit is not None and hit[0] == token:
+            return hit[1]
+
+        # One read transaction -> one consistent view across all queries (WAL snapshot)
+        with _reading() as con:
+            own_txn = not con.in_transaction
+            if own_txn:
+                con.execute("BEGIN")
+            try:
+                shopping = _q_grouped(con, "shopping_items")
+                pantry = _q_grouped(con, "pantry_items")
+                standards = tuple(_q_standards_dashboard(con))
+                suggestions = tuple(_q_purchase_suggestions(con, today))
+                recipes = _q_recipes(con)  # drafts first, then done (name order within each)
+                recipe_items = _q_all_recipe_items(con)
+                cookable = tuple(_q_cookable_recipes(con, SNAPSHOT_COOKABLE))
+                meal_calendar = tuple(_q_meal_calendar(con, menu_from, menu_to))
+            finally:
+                if own_txn:
+                    con.commit()
+
+        snap = ShoppingSnapshot(
+            shopping=shopping,
+            pantry=pantry,
+            standards=standards,
+            suggestions=suggestions,
+            recipes_draft=tuple(r for r in recipes if not r[2]),
+            recipes_done=tuple(r for r in recipes if r[2]),
+            recipe_items=recipe_items,
+            cookable=cookable,
+            meal_calendar=meal_calendar,
+        )
+        _cache_put(key, token, snap)
+        return snap
+
+
+# -----------------------------
+# Dangling recipe references (src/gc_orphans.py)
+# -----------------------------
+# Maintenance only (full anti-join), so not in _HOT_QUERIES
+_SQL_DANGLING_RECIPE_ITEMS = """
+    SELECT ri.uid, ri.text
+    FROM recipe_items ri
+    WHERE NOT EXISTS (SELECT 1 FROM recipes r WHERE r.uid = ri.recipe_uid)
+"""
+
+_SQL_DANGLING_MEALS = """
+    SELECT mp.uid, mp.day_date
+    FROM meal_plan mp
+    WHERE mp.recipe_uid IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM recipes r WHERE r.uid = mp.recipe_uid)
+"""
+
+
+def fetch_dangling_recipe_refs() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """(opskriftsvarer, menudage) der peger på en opskrift der ikke findes: [(uid, tekst/dato)]."""
+    with _LOCK, _using_conn() as con:
+        items = con.execute(_SQL_DANGLING_RECIPE_ITEMS).fetchall()
+        meals = con.execute(_SQL_DANGLING_MEALS).fetchall()
+    return [(r[0], r[1]) for r in items], [(r[0], r[1]) for r in meals]
+
+
+def delete_dangling_recipe_refs(item_uids: Sequence[str], meal_uids: Sequence[str]) -> int:
+    """
+    Ryd de rækker fetch_dangling_recipe_refs fandt (tjekkes igen i transaktionen).
+    Menudage behandles som i delete_recipe: opskriften fjernes, titlen bliver; dage uden titel slettes.
+    Returnerer antal ændrede rækker.
+    """
+    n = 0
+    with unit_of_work(*_RECIPE_ITEM_TABLES, "meal_plan") as cur:
+        for uid in item_uids:
+            cur.execute(
+                "DELETE FROM recipe_items WHERE uid=? AND NOT EXISTS (SELECT 1 FROM recipes r WHERE r.uid = recipe_uid)",
+                (uid,),
+            )
+            n += cur.rowcount
+        for uid in meal_uids:
+            cur.execute(
+                "DELETE FROM meal_plan WHERE uid=? AND COALESCE(title,'') = ''"
+                " AND NOT EXISTS (SELECT 1 FROM recipes r WHERE r.uid = recipe_uid)",
+                (uid,),
+            )
+            n += cur.rowcount
+            cur.execute(
+                "UPDATE meal_plan SET recipe_uid=NULL WHERE uid=?"
+                " AND NOT EXISTS (SELECT 1 FROM recipes r WHERE r.uid = recipe_uid)",
+                (uid,),
+            )
+            n += cur.rowcount
+    return n
+
+
+# -----------------------------
+# Hot queries (checked by src/query_plans.py)
+# -----------------------------
+# name -> (sql, example params). Every query here must be answered from an index:
+# no bare table scan and no temp B-tree for ORDER BY / GROUP BY.
+_HOT_QUERIES: Dict[str, Tuple[str, object]] = {
+    "fetch_shopping": (_SQL_SHOPPING, ()),
+    "fetch_pantry": (_SQL_PANTRY, ()),
+    "fetch_shopping_grouped": (_GROUPED_SQL.format(table="shopping_items"), ()),
+    "fetch_pantry_grouped": (_GROUPED_SQL.format(table="pantry_items"), ()),
+    "fetch_standards": (_SQL_STANDARDS, ()),
+    "fetch_standards_dashboard": (_SQL_STANDARDS_DASHBOARD, ()),
+    "fetch_recipes": (_SQL_RECIPES_ALL, ()),
+    "fetch_recipes(done)": (_SQL_RECIPES_BY_DONE, (1,)),
+    "fetch_recipe_items": (_SQL_RECIPE_ITEMS, ("r",)),
+    "snapshot recipe items": (_SQL_ALL_RECIPE_ITEMS, ()),
+    "fetch_meal_plan": (_SQL_MEAL_PLAN, ("2000-01-01", "2000-01-07")),
+    "fetch_meal_calendar": (_SQL_MEAL_CALENDAR, ("2000-01-01", "2000-02-11")),
+    "pantry merge lookup": (_SQL_PANTRY_MATCH, ("x", "Ukategoriseret")),
+    "recipe item merge lookup": (_SQL_RECIPE_ITEM_MATCH, ("r", "x", "Ukategoriseret")),
+    "generated rows": (_SQL_GENERATED_ROWS, ("mealplan:2000-01-01..2000-01-07",)),
+    "manual row lookup": (_SQL_MANUAL_ROW, ("x", "Ukategoriseret")),
+    "replenish rule": (_REPLENISH_SQL.format(key=":key"), {"key": "x"}),
+    "cookable pantry matches": (_SQL_PANTRY_RECIPE_MATCHES, ()),
+    "cookable done recipes": (_SQL_DONE_RECIPE_COUNTS, ()),
+    "cookable missing ingredients": (_SQL_MISSING_INGREDIENTS.format(marks="?,?"), ("a", "b")),
+    "guess_categories": (_SQL_KNOWN_CATEGORIES.format(marks="?"), ("x",) * 4),
+    "cook need": (_SQL_COOK_NEED, ("r",)),
+    "cook pantry rows": (_SQL_PANTRY_BY_KEY, ("x",)),
+    "cook standard rebuy": (_SQL_STANDARD_REBUY, ("x",)),
+    "fetch_planner_items": (_SQL_PLANNER_ITEMS, ()),
+    "fetch_pantry_totals": (_SQL_PANTRY_TOTALS, ()),
+    "fetch_purchase_suggestions": (_SQL_PURCHASE_SUGGESTIONS, {"today": "2000-01-01", "days": 7, "limit": 10}),
+}
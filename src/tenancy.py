@@ -0,0 +1,182 @@
+# src/tenancy.py
+# -*- coding: utf-8 -*-
+"""
+Husstande (tenants): hver husstand har sin egen SQLite-fil og sin egen Drive-mappe.
+
+Husstandene står i en JSON-fil (HOMEAPP_TENANTS_FILE):
+    {
+      "knudsen": {"name": "Knudsen", "folder_id": "<Drive-mappe>", "key_sha256": "<hash>"},
+      "jensen":  {"name": "Jensen",  "folder_id": "<Drive-mappe>", "key_sha256": "<hash>"}
+    }
+DB-filen bliver data/tenants/<id>/memories.db (kan sættes med "db_path").
+Hver husstand skal have en nøgle; filen gemmer kun dens SHA-256 (python -m src.tenancy <nøgle>).
+app_state beder om nøglen én gang pr. session, før husstandens data åbnes.
+Uden fil er der én husstand, "default", med de gamle stier (DB_PATH, drive_sync.FOLDER_ID)
+og uden nøgle.
+
+Den aktive husstand er en ContextVar: app_state sætter den i starten af hver kørsel
+(Streamlit kører hver kørsel i sin egen tråd), og DB-modulerne slår deres forbindelse
+og caches op under current().db_path. Den tilstand ligger i LRUPool'er med plads til
+TENANT_POOL_MAX husstande: den mindst brugte lukkes, så hukommelsen følger antallet af
+aktive husstande, ikke det samlede antal.
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Generic, Iterator, List, NamedTuple, Optional, TypeVar
+
+from src.config import DB_PATH, TENANT_POOL_MAX, TENANTS_DIR, TENANTS_FILE
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_-]+$")  # used in file paths
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class Tenant(NamedTuple):
+    id: str
+    name: str
+    db_path: str
+    folder_id: Optional[str]  # None = drive_sync.FOLDER_ID
+    key_sha256: Optional[str] = None  # None = no key (only the default household)
+
+
+DEFAULT = Tenant(id="default", name="", db_path=DB_PATH, folder_id=None)
+
+_REGISTRY: Optional[Dict[str, Tenant]] = None
+_CURRENT: ContextVar[Optional[Tenant]] = ContextVar("tenant", default=None)
+
+
+def _load() -> Dict[str, Tenant]:
+    if not TENANTS_FILE:
+        return {DEFAULT.id: DEFAULT}
+    with open(TENANTS_FILE, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    tenants: Dict[str, Tenant] = {}
+    for tid, spec in raw.items():
+        if not _TENANT_ID.match(tid):
+            raise ValueError(f"Ugyldigt husstands-id i {TENANTS_FILE}: {tid!r}")
+        spec = spec or {}
+        key_sha256 = (spec.get("key_sha256") or "").strip().lower()
+        if not _SHA256.match(key_sha256):
+            raise ValueError(f"Husstand {tid!r} i {TENANTS_FILE} mangler en gyldig key_sha256")
+        tenants[tid] = Tenant(
+            id=tid,
+            name=spec.get("name") or tid,
+            db_path=spec.get("db_path") or os.path.join(TENANTS_DIR, tid, os.path.basename(DB_PATH)),
+            folder_id=spec.get("folder_id"),
+            key_sha256=key_sha256,
+        )
+    return tenants or {DEFAULT.id: DEFAULT}
+
+
+def tenants() -> Dict[str, Tenant]:
+    """id -> Tenant (læses én gang pr. proces)."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = _load()
+    return _REGISTRY
+
+
+def get(tenant_id: Optional[str]) -> Optional[Tenant]:
+    return tenants().get(tenant_id or "")
+
+
+def default() -> Tenant:
+    return next(iter(tenants().values()))
+
+
+def hash_key(key: str) -> str:
+    return hashlib.sha256((key or "").encode("utf-8")).hexdigest()
+
+
+def check_key(tenant: Tenant, key: str) -> bool:
+    """Passer nøglen til husstanden? (Altid True for en husstand uden nøgle.)"""
+    if tenant.key_sha256 is None:
+        return True
+    return hmac.compare_digest(hash_key(key), tenant.key_sha256)
+
+
+def current() -> Tenant:
+    return _CURRENT.get() or default()
+
+
+def db_path() -> str:
+    return current().db_path
+
+
+def activate(tenant: Tenant) -> None:
+    """Gør `tenant` aktiv for resten af denne kørsel (tråd/kontekst)."""
+    os.makedirs(os.path.dirname(tenant.db_path) or ".", exist_ok=True)
+    _CURRENT.set(tenant)
+
+
+@contextmanager
+def using(tenant: Tenant) -> Iterator[Tenant]:
+    """Midlertidigt en anden husstand (baggrundsjob, scripts)."""
+    os.makedirs(os.path.dirname(tenant.db_path) or ".", exist_ok=True)
+    token = _CURRENT.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _CURRENT.reset(token)
+
+
+V = TypeVar("V")
+
+
+class LRUPool(Generic[V]):
+    """
+    Pr.-DB-tilstand (forbindelser, caches, tråde) for de senest brugte husstande.
+    get() opretter efter behov; overskrides maxsize, lukkes den mindst brugte.
+    """
+
+    def __init__(self, create: Callable[[str], V], close: Callable[[V], None], maxsize: int = TENANT_POOL_MAX):
+        self._create = create
+        self._close = close
+        self._maxsize = max(1, maxsize)
+        self._items: "OrderedDict[str, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> V:
+        evicted: List[V] = []
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                return value
+            value = self._items[key] = self._create(key)
+            while len(self._items) > self._maxsize:
+                evicted.append(self._items.popitem(last=False)[1])
+        for old in evicted:
+            self._close(old)
+        return value
+
+    def peek(self, key: str) -> Optional[V]:
+        with self._lock:
+            return self._items.get(key)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            value = self._items.pop(key, None)
+        if value is not None:
+            self._close(value)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+if __name__ == "__main__":
+    # key_sha256 for HOMEAPP_TENANTS_FILE
+    if len(sys.argv) != 2:
+        sys.exit("Brug: python -m src.tenancy <nøgle>")
+    print(hash_key(sys.argv[1]))
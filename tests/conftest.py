@@ -0,0 +1,21 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HOMEAPP_MAINT_INTERVAL_SEC", "0")
+
+from src import storage, storage_shopping, tenancy  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh household DB (memories + shopping tables) in tmp_path, active for the test."""
+    monkeypatch.chdir(tmp_path)
+    tenant = tenancy.Tenant(id="test", name="", db_path=str(tmp_path / "memories.db"), folder_id=None)
+    with tenancy.using(tenant):
+        storage.init_db()
+        storage_shopping.init_shopping_tables()
+        yield storage_shopping._conn()
@@ -0,0 +1,37 @@
+# tests/test_cookable_recipes.py
+from src import storage_shopping as s
+
+
+def _ingredients(con, recipe_uid):
+    rows = con.execute("SELECT text_key, n FROM recipe_ingredients WHERE recipe_uid=? ORDER BY text_key", (recipe_uid,))
+    count = con.execute("SELECT ingredient_count FROM recipes WHERE uid=?", (recipe_uid,)).fetchone()[0]
+    return rows.fetchall(), count
+
+
+def test_recipe_ingredient_index_follows_items(db):
+    r = s.add_recipe("Pandekager", 1)
+    s.recipe_add_or_merge(r, "Mel", 1, "Kolonial")
+    s.recipe_add_or_merge(r, "Æg", 3, "Mejeri")
+    s.recipe_add_or_merge(r, "æg", 1, "Køl")   # same ingredient, other category
+    assert _ingredients(db, r) == ([("mel", 1), ("æg", 2)], 2)
+
+    egg_rows = [uid for uid, text, *_ in s.fetch_recipe_items(r) if text.lower() == "æg"]
+    s.delete_recipe_item(egg_rows[0])
+    assert _ingredients(db, r) == ([("mel", 1), ("æg", 1)], 2)
+    s.delete_recipe_item(egg_rows[1])
+    assert _ingredients(db, r) == ([("mel", 1)], 1)
+
+
+def test_cookable_recipes_ranked_by_share_at_home(db):
+    pancakes = s.add_recipe("Pandekager", 1)
+    for text in ("Mel", "Æg", "Mælk"):
+        s.recipe_add_or_merge(pancakes, text, 1, "Kolonial")
+    omelet = s.add_recipe("Omelet", 1)
+    s.recipe_add_or_merge(omelet, "Æg", 2, "Mejeri")
+    draft = s.add_recipe("Kladde", 0)
+    s.recipe_add_or_merge(draft, "Æg", 1, "Mejeri")
+    s.pantry_add_or_merge("æg", 6, "Køl")
+
+    ranked = s.fetch_cookable_recipes()
+    assert [(r.uid, r.have, r.total) for r in ranked] == [(omelet, 1, 1), (pancakes, 1, 3)]
+    assert sorted(ranked[1].missing) == ["Mel", "Mælk"]
@@ -0,0 +1,46 @@
+# tests/test_gc_orphans.py
+import os
+import time
+
+import pytest
+
+from src import gc_orphans, storage, tenancy
+
+
+@pytest.fixture
+def only_household(db, monkeypatch):
+    # References are read from every registered household: register just the test one
+    monkeypatch.setattr(tenancy, "_REGISTRY", {"test": tenancy.current()})
+
+
+def _old_photo(name):
+    os.makedirs("photos", exist_ok=True)
+    path = os.path.join("photos", name)
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    os.utime(path, (time.time() - 48 * 3600,) * 2)
+    return path
+
+
+def test_only_confirmed_dry_run_finds_are_deleted(only_household):
+    a = _old_photo("a.jpg")
+    shown = gc_orphans.collect(dry_run=True, grace_hours=1)
+    b = _old_photo("b.jpg")  # found later, never shown
+
+    assert gc_orphans.collect(dry_run=False, grace_hours=1).removed == 0
+    assert os.path.exists(a)
+
+    rep = gc_orphans.collect(dry_run=False, grace_hours=1, confirmed=shown.orphans)
+    assert rep.removed == 1
+    assert not os.path.exists(a) and os.path.exists(b)
+
+
+def test_file_referenced_after_the_dry_run_is_kept(only_household):
+    a = _old_photo("a.jpg")
+    shown = gc_orphans.collect(dry_run=True, grace_hours=1)
+    assert [o.name for o in shown.orphans] == ["a.jpg"]
+
+    storage.add_memory("saved meanwhile", "", a)
+    removed, _freed, errors = gc_orphans._remove(None, list(shown.orphans), grace_hours=1)
+    assert (removed, errors) == (0, [])
+    assert os.path.exists(a)
@@ -0,0 +1,42 @@
+# tests/test_ingredient_import.py
+import pytest
+
+from src import storage_shopping as s
+from src.ingredient_import import parse_ingredients, parse_line
+
+
+@pytest.mark.parametrize(
+    "line, text, qty, measure",
+    [
+        ("2 dl mælk", "mælk", 1.0, "2 dl"),
+        ("3 løg, hakkede", "løg", 3.0, ""),
+        ("½ tsk salt", "salt", 1.0, "½ tsk"),
+        ("1 1/2 kg kartofler", "kartofler", 1.0, "1 1/2 kg"),
+        ("- 2-3 fed hvidløg", "hvidløg", 3.0, ""),
+        ("1½ dåse hakkede tomater (400 g)", "hakkede tomater", 1.5, ""),
+        ("1/2 citron", "citron", 0.5, ""),
+        ("ca. 500 g hakket oksekød", "hakket oksekød", 1.0, "500 g"),
+        ("3. 4 æg", "æg", 4.0, ""),
+        ("salt og peber", "salt og peber", 1.0, ""),
+    ],
+)
+def test_parse_line(line, text, qty, measure):
+    p = parse_line(line)
+    assert (p.text, p.measure) == (text, measure)
+    assert p.qty == pytest.approx(qty)
+
+
+@pytest.mark.parametrize("line", ["", "   ", "Dej:", "- ", "(til servering)"])
+def test_parse_line_skips_headers_and_blanks(line):
+    assert parse_line(line) is None
+
+
+def test_parse_ingredients_guesses_categories(db):
+    s.upsert_standard("Mælk", "Mejeri", 1)
+    s.pantry_add_or_merge("Salt", 1, "Kolonial")
+    items = parse_ingredients("Dej:\n2 dl mælk\n\n½ tsk salt\n2 gulerødder\n")
+    assert [(p.text, p.category) for p in items] == [
+        ("mælk", "Mejeri"),
+        ("salt", "Kolonial"),
+        ("gulerødder", "Ukategoriseret"),
+    ]
@@ -0,0 +1,50 @@
+# tests/test_item_stats.py
+import sqlite3
+
+import pytest
+
+from src import storage_shopping as s
+
+_BUY = "INSERT INTO item_events (text_key, text, category, kind, qty, created_at) VALUES ('mælk', 'Mælk', 'Mejeri', 'buy', ?, ?)"
+
+
+def _buy(*events):
+    with s.unit_of_work(*s._HISTORY_TABLES) as cur:
+        cur.executemany(_BUY, [(qty, at) for at, qty in events])
+
+
+def _stats(con, key="mælk"):
+    return con.execute(
+        "SELECT buy_count, buy_qty, date(first_buy), date(last_buy), date(next_buy) FROM item_stats WHERE text_key=?",
+        (key,),
+    ).fetchone()
+
+
+def test_item_stats_mean_interval(db):
+    _buy(("2026-10-01 10:00:00", 2), ("2026-10-08 10:00:00", 2), ("2026-10-15 10:00:00", 2))
+    assert _stats(db) == (3, 6.0, "2026-10-01", "2026-10-15", "2026-10-22")
+
+
+def test_item_stats_counts_one_purchase_per_day(db):
+    _buy(
+        ("2026-10-01 10:00:00", 2),
+        ("2026-10-08 10:00:00", 2),
+        ("2026-10-08 10:05:00", 1),   # ticked off twice
+        ("2026-10-08 20:00:00", 1),
+        ("2026-10-15 09:00:00", 2),
+    )
+    assert _stats(db) == (3, 8.0, "2026-10-01", "2026-10-15", "2026-10-22")
+
+
+def test_buy_item_logs_a_purchase(db):
+    s.add_shopping("Mælk", 2, "Mejeri")
+    s.buy_item(s.load_shopping_snapshot().shopping.rows[0].uid)
+    assert db.execute("SELECT kind, qty FROM item_events").fetchall() == [("buy", 2.0)]
+    assert _stats(db)[:2] == (1, 2.0)
+
+
+def test_item_events_is_append_only(db):
+    _buy(("2026-10-01 10:00:00", 1))
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("UPDATE item_events SET qty=5")
+    db.rollback()
@@ -0,0 +1,60 @@
+# tests/test_meal_planner.py
+from src import storage_shopping as s
+from src.meal_planner import suggest_week
+
+
+def _recipe(name, *items, done=1):
+    uid = s.add_recipe(name, done)
+    for text, qty in items:
+        s.recipe_add_or_merge(uid, text, qty, "Kolonial")
+    return uid
+
+
+def test_picks_what_is_at_home(db):
+    pasta = _recipe("Pasta", ("pasta", 1), ("tomat", 1))
+    _recipe("Suppe", ("porre", 1), ("kartofler", 1))
+    _recipe("Kladde", ("pasta", 1), done=0)
+    s.pantry_add_or_merge("pasta", 1, "Kolonial")
+    s.pantry_add_or_merge("tomat", 1, "Kolonial")
+
+    plan = suggest_week(1, seed=1)
+    assert plan.picks == (pasta,)
+    assert (plan.items_to_buy, plan.qty_to_buy) == (0, 0.0)
+
+
+def test_no_repeats_and_fixed_days_are_kept_out(db):
+    uids = [_recipe(f"R{i}", (f"vare{i}", 1)) for i in range(4)]
+    plan = suggest_week(3, fixed=[(uids[0], 1.0), (None, 1.0)], seed=2)
+    assert sorted(plan.picks) == sorted(uids[1:])
+    assert plan.items_to_buy == 4   # the fixed day counts towards the week's need
+
+
+def test_fixed_days_count_their_servings(db):
+    fixed = _recipe("Fast", ("mel", 1))
+    _recipe("Mel-ret", ("mel", 1))
+    rice = _recipe("Ris-ret", ("ris", 1))
+    s.pantry_add_or_merge("mel", 2, "Kolonial")
+    s.pantry_add_or_merge("ris", 1, "Kolonial")
+
+    assert suggest_week(1, fixed=[(fixed, 1.0)], seed=0).items_to_buy == 0
+    plan = suggest_week(1, fixed=[(fixed, 2.0)], seed=0)
+    assert plan.picks == (rice,)
+    assert plan.items_to_buy == 0
+
+
+def test_free_day_servings_decide_the_day(db):
+    flour = _recipe("Mel-ret", ("mel", 1))
+    rice = _recipe("Ris-ret", ("ris", 1))
+    s.pantry_add_or_merge("mel", 2, "Kolonial")
+    s.pantry_add_or_merge("ris", 3, "Kolonial")
+
+    for seed in range(5):
+        plan = suggest_week(2, servings=[1.0, 3.0], seed=seed)
+        assert plan.picks == (flour, rice)
+        assert plan.items_to_buy == 0
+
+
+def test_more_days_than_recipes(db):
+    only = _recipe("Eneste", ("mel", 1))
+    assert suggest_week(3, seed=0).picks == (only,)
+    assert suggest_week(0).picks == ()
@@ -0,0 +1,24 @@
+# tests/test_mealplan_shopping.py
+from src import storage_shopping as s
+
+WEEK = ("2030-01-07", "2030-01-13")
+
+
+def _rows(db):
+    return db.execute("SELECT text, qty, gen_scope IS NOT NULL FROM shopping_items ORDER BY created_at").fetchall()
+
+
+def test_menu_need_goes_onto_the_manual_row_and_back(db):
+    r = s.add_recipe("Omelet", 1)
+    s.recipe_add_or_merge(r, "Æg", 2, "Mejeri")
+    s.add_shopping("æg", 6, "Mejeri")
+    s.set_meal_for_date("2030-01-08", r, "Omelet")
+
+    summary = s.generate_shopping_from_mealplan(*WEEK, check_pantry_first=False)
+    assert (summary["added"], summary["merged_manual"]) == (0, 1)
+    assert _rows(db) == [("æg", 8.0, 1)]
+    assert s.generate_shopping_from_mealplan(*WEEK, check_pantry_first=False)["written"] == 0
+
+    s.clear_meal_for_date("2030-01-08")
+    s.generate_shopping_from_mealplan(*WEEK, check_pantry_first=False)
+    assert _rows(db) == [("æg", 6.0, 0)]
@@ -0,0 +1,25 @@
+# tests/test_memory_tags.py
+from src import storage
+
+
+def test_tag_counts_follow_memories(db):
+    storage.add_memory("Lampe i gangen", "Home, lighting ,home", "p1")
+    storage.add_memory("Roser", "garden, #home", "p2")
+    assert dict(storage.fetch_tag_counts()) == {"home": 2, "lighting": 1, "garden": 1}
+
+    rose = storage.fetch_page(None, 10, tags=["garden"])[0][0][0]
+    storage.delete_memory(rose)
+    assert dict(storage.fetch_tag_counts()) == {"home": 1, "lighting": 1}
+
+
+def test_tag_filter_all_or_any(db):
+    storage.add_memory("Lampe", "home, lighting", "p1")
+    storage.add_memory("Roser", "home, garden", "p2")
+    storage.add_memory("Pære", "lighting", "p3")
+
+    def texts(**kw):
+        return sorted(r[2] for r in storage.fetch_page(None, 10, **kw)[0])
+
+    assert texts(tags=["home", "lighting"]) == ["Lampe"]
+    assert texts(tags=["home", "lighting"], match_all=False) == ["Lampe", "Pære", "Roser"]
+    assert texts(tags=["Garden"]) == ["Roser"]
@@ -0,0 +1,23 @@
+# tests/test_query_plans.py
+from src.query_plans import explain_hot_queries, plan_problems
+
+
+def test_hot_queries_use_indexes(db):
+    plans = explain_hot_queries()
+    assert plans
+    problems = {name: plan_problems(plan) for name, plan in plans.items()}
+    assert {name: lines for name, lines in problems.items() if lines} == {}
+
+
+def test_plan_problems_flags_scans_and_temp_btrees():
+    plan = [
+        "SCAN memories",
+        "SCAN m USING INDEX idx_memories_created",
+        "SEARCH s USING INDEX idx_shop_text_key (text_key=?)",
+        "USE TEMP B-TREE FOR ORDER BY",
+    ]
+    assert plan_problems(plan) == ["SCAN memories", "USE TEMP B-TREE FOR ORDER BY"]
+
+
+def test_plan_problems_allows_scanning_materialized_ctes():
+    assert plan_problems(["MATERIALIZE need", "SCAN need", "SEARCH p USING INDEX idx_pantry_key_cat (text_key=?)"]) == []
@@ -0,0 +1,27 @@
+# tests/test_replenish.py
+import uuid
+
+import pytest
+
+from src import storage_shopping as s
+
+
+def test_rebuy_trigger_adds_a_uuid4_row(db):
+    s.upsert_standard("Mælk", "Mejeri", 2)
+    s.set_standard_rule("Mælk", None, 1)
+    s.pantry_add_or_merge("Mælk", 1, "Mejeri")
+    uid = db.execute("SELECT uid FROM pantry_items").fetchone()[0]
+    s.pantry_consume(uid, 1)
+
+    (row_uid, qty), = db.execute("SELECT uid, qty FROM shopping_items").fetchall()
+    assert qty == 2
+    assert str(uuid.UUID(row_uid)) == row_uid and uuid.UUID(row_uid).version == 4
+
+
+def test_deprecated_is_standard_keyword_marks_a_standard(db):
+    with pytest.deprecated_call():
+        s.add_shopping("Smør", 1, "Mejeri", is_standard=1)
+    with pytest.deprecated_call():
+        s.pantry_add_or_merge("Ost", 1, "Mejeri", is_standard=0)
+    assert [row.text for row in s.fetch_standards_dashboard()] == ["Smør"]
+    assert s.fetch_shopping()[0][4] == 1
@@ -0,0 +1,31 @@
+# tests/test_shopping_snapshot.py
+from src import storage_shopping as s
+
+
+def test_snapshot_holds_every_read_of_the_page(db):
+    r = s.add_recipe("Omelet", 1)
+    s.recipe_add_or_merge(r, "Æg", 2, "Mejeri")
+    s.upsert_standard("Mælk", "Mejeri", 2)
+    s.set_standard_rule("Mælk", 1, 0)
+    s.set_meal_for_date("2030-01-07", r, "Omelet")
+
+    snap = s.load_shopping_snapshot("2030-01-07", "2030-01-07", "2030-01-13")
+    assert list(snap.standards) == s.fetch_standards_dashboard()
+    assert snap.standards[0].min_qty == 1
+    assert list(snap.suggestions) == s.fetch_purchase_suggestions("2030-01-07")
+    assert list(snap.cookable) == s.fetch_cookable_recipes(limit=s.SNAPSHOT_COOKABLE)
+    assert list(snap.meal_calendar) == s.fetch_meal_calendar("2030-01-07", "2030-01-13")
+    assert list(snap.recipe_items[r]) == s.fetch_recipe_items(r)
+
+
+def test_snapshot_follows_meal_plan_and_recipe_items(db):
+    r = s.add_recipe("Omelet", 1)
+    week = ("2030-01-07", "2030-01-07", "2030-01-13")
+    assert s.load_shopping_snapshot(*week).meal_calendar == ()
+
+    s.set_meal_for_date("2030-01-08", r, "Omelet")
+    s.recipe_add_or_merge(r, "Æg", 2, "Mejeri")
+    snap = s.load_shopping_snapshot(*week)
+    assert [m.day_date for m in snap.meal_calendar] == ["2030-01-08"]
+    assert [text for _uid, text, *_ in snap.recipe_items[r]] == ["Æg"]
+    assert s.load_shopping_snapshot("2030-01-14", "2030-01-14", "2030-01-20").meal_calendar == ()
@@ -0,0 +1,53 @@
+# tests/test_tenancy.py
+import json
+
+import pytest
+
+from src import tenancy
+
+
+@pytest.fixture
+def tenants_file(tmp_path, monkeypatch):
+    def write(spec):
+        path = tmp_path / "tenants.json"
+        path.write_text(json.dumps(spec), encoding="utf-8")
+        monkeypatch.setattr(tenancy, "TENANTS_FILE", str(path))
+        monkeypatch.setattr(tenancy, "_REGISTRY", None)
+    return write
+
+
+def test_household_key_is_checked(tenants_file):
+    tenants_file({"knudsen": {"name": "Knudsen", "key_sha256": tenancy.hash_key("hemmelig")}})
+    t = tenancy.get("knudsen")
+    assert tenancy.check_key(t, "hemmelig")
+    assert not tenancy.check_key(t, "forkert")
+    assert not tenancy.check_key(t, "")
+    assert tenancy.get("jensen") is None
+
+
+def test_every_household_needs_a_key(tenants_file):
+    tenants_file({"knudsen": {"name": "Knudsen"}})
+    with pytest.raises(ValueError):
+        tenancy.tenants()
+
+
+def test_default_household_has_no_key(monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANTS_FILE", "")
+    monkeypatch.setattr(tenancy, "_REGISTRY", None)
+    assert tenancy.default().key_sha256 is None
+    assert tenancy.check_key(tenancy.default(), "")
+
+
+def test_evicted_household_stays_open_while_in_use(tmp_path, monkeypatch):
+    from src import storage_shopping as s
+
+    monkeypatch.setattr(s, "_STATES", tenancy.LRUPool(s._DbState, s._DbState.close, maxsize=1))
+    a = tenancy.Tenant("a", "", str(tmp_path / "a.db"), None)
+    b = tenancy.Tenant("b", "", str(tmp_path / "b.db"), None)
+    with tenancy.using(a):
+        s.init_shopping_tables()
+        with s.unit_of_work("shopping_items") as cur:
+            with tenancy.using(b):
+                s.init_shopping_tables()   # evicts a from the pool of one
+            cur.execute("INSERT INTO shopping_items (uid, text, qty, category) VALUES ('1', 'Mælk', 1, 'Mejeri')")
+        assert [r[1] for r in s.fetch_shopping()] == ["Mælk"]